@@ -20,37 +20,11 @@ except RuntimeError:
     print("Failed to initialize logger. Exiting...")
     sys.exit(1)
 
-# INIT Database connection
+# Database connection
 # ----------------------
-try:
-    from shared.services.get_redis_client import get_redis_client
-
-    db_client = get_redis_client(config)
-except RuntimeError:
-    logger.critical(exc_info=True, msg="Failed to initialize db client. Exiting...")
-    sys.exit(1)
-
-# Repository initialisation
-# ----------------------
-try:
-    from shared.repositories.params_repository import ParamsRepository
-
-    params_repository = ParamsRepository(db_client)
-except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize params repositories. Exiting..."
-    )
-    sys.exit(1)
-
-try:
-    from shared.repositories.update_queues import UpdateQueues
-
-    update_article_queue = UpdateQueues(db_client)
-except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize update articles queue. Exiting..."
-    )
-    sys.exit(1)
+# The API uses an asyncio Redis client, so its connection pool is
+# created in the event loop of each worker, by the lifespan of the
+# app (see api/main.py).
 
 # FastAPI intialization
 # ----------------------
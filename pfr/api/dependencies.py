@@ -0,0 +1,16 @@
+"""
+Dependencies giving the routers the services created in the
+lifespan of the API.
+"""
+from fastapi import Request
+
+from api.services.answer_waiter import AnswerWaiter
+from shared.repositories.async_ask_repository import AsyncAskRepository
+
+
+def get_ask_repository(request: Request) -> AsyncAskRepository:
+    return request.app.state.ask_repository
+
+
+def get_answer_waiter(request: Request) -> AnswerWaiter:
+    return request.app.state.answer_waiter
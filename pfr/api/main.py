@@ -1,16 +1,66 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from datetime import datetime
+import time
+
+from api.boot import config
+from api.routers import ask, articles, health, metrics
+from api.services.answer_waiter import AnswerWaiter
+from shared.repositories.async_ask_repository import AsyncAskRepository
+from shared.services.get_async_redis_client import get_async_redis_client
+from shared.services.metrics import register_redis_pool_stats
+from shared.services.metrics import set_boot_timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the Redis connection pools of the worker and the services
+    using them, in the event loop of the worker, and close them on
+    shutdown. The worker is ready once they are created, see /health/ready.
+
+    The blocking reads of the answer streams and the subscription of the
+    answer waiter hold their connection : they have their own pool, so
+    the streaming clients can't take the connections of POST /ask/ and
+    of the health checks.
+    """
+    app.state.ready = False
+    app.state.boot_timings = {}
+
+    start = time.perf_counter()
+    db_client = get_async_redis_client(config)
+    await db_client.ping()
+    app.state.boot_timings["db_client"] = round(time.perf_counter() - start, 3)
+    blocking_db_client = get_async_redis_client(config, blocking=True)
+
+    start = time.perf_counter()
+    app.state.ask_repository = AsyncAskRepository(db_client, config, blocking_db_client)
+    app.state.answer_waiter = AnswerWaiter(config, app.state.ask_repository)
+    app.state.answer_waiter.start()
+    app.state.boot_timings["answer_waiter"] = round(time.perf_counter() - start, 3)
+    set_boot_timings(app.state.boot_timings)
+    register_redis_pool_stats({"commands": db_client, "blocking": blocking_db_client})
+    app.state.ready = True
+
+    yield
+
+    app.state.ready = False
+    await app.state.answer_waiter.stop()
+    await blocking_db_client.aclose()
+    await db_client.aclose()
 
-from api.routers import ask, articles
 
 app = FastAPI(
     title="PFR API",
     description="API docs for our 'projet fil rouge' 🚀. Don't forget the schemas are at the BOTTOM of the page.",
     summary="Made during 2023-2024 school year at CentraleSupélec",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(ask.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 # app.include_router(articles.router)
 
 
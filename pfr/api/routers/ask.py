@@ -1,14 +1,39 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from typing import List, Literal
 from uuid import uuid4
 from datetime import datetime
+import hashlib
+import json
+import time
 
 from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
 from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
 from shared.models.get_ask_input import GetAskInput
+from shared.models.output_api_ask_stats import OutputApiAskStats
+from shared.models.output_api_ask_batch import OutputApiAskBatch
+from shared.models.post_output_api_ask_batch import (
+    PostOutputApiAskBatch,
+    PostOutputApiAskBatchItem,
+)
+from shared.repositories.params_repository import ASK_FINAL_STATES
+from shared.repositories.answer_stream_repository import (
+    STREAM_END,
+    STREAM_ERROR,
+    STREAM_TOKEN,
+)
+
+from shared.repositories.async_ask_repository import (
+    ADMITTED,
+    REJECTED_QUEUE_FULL,
+    AsyncAskRepository,
+)
+
+from shared.services.get_redis_pool_stats import get_redis_pool_stats
 
-from api.boot import update_article_queue
-from api.boot import params_repository
+from api.dependencies import get_answer_waiter, get_ask_repository
+from api.services.answer_waiter import AnswerWaiter
 
 router = APIRouter(
     prefix="/ask",
@@ -24,13 +49,72 @@ class PostAskInput(BaseModel):
     ----------
     content : str
         The content of the question.
+    priority : str
+        The lane of the question, "interactive" or "batch".
     """
 
     content: str = Field(min_length=5, description="The question you want to ask")
+    priority: Literal["interactive", "batch"] = Field(
+        default="interactive",
+        description="interactive for a user waiting for the answer, batch for "
+        "bulk submissions, answered with a lower share of the askers",
+    )
+
+
+class PostAskBatchInput(BaseModel):
+    """
+    Schema for the input data required for posting several questions.
+
+    Attributes
+    ----------
+    questions : list of PostAskInput
+        The questions, at most ASK_BATCH_MAX_SIZE.
+    """
+
+    questions: List[PostAskInput] = Field(
+        min_length=1, description="The questions you want to ask"
+    )
+
+
+def check_batch_size(size: int, ask_repository: AsyncAskRepository) -> None:
+    """
+    Reject a batch bigger than ASK_BATCH_MAX_SIZE.
+    """
+    if size > ask_repository.admission_parameters.batch_max_size:
+        raise HTTPException(
+            status_code=422,
+            detail="A batch holds at most "
+            f"{ask_repository.admission_parameters.batch_max_size} questions",
+        )
+
+
+def rate_limited_client(request: Request, ask_repository: AsyncAskRepository) -> str:
+    """
+    Get the client whose token bucket a question is taken from, set by
+    ASK_CLIENT_KEY : its address, the address added by the trusted proxy
+    in front of the API to the last entry of ASK_CLIENT_FORWARDED_HEADER,
+    or a hash of its ASK_CLIENT_API_KEY_HEADER. Without the header, the
+    address is used.
+    """
+    parameters = ask_repository.admission_parameters
+    if parameters.client_key == "forwarded":
+        forwarded = request.headers.get(parameters.client_forwarded_header)
+        if forwarded and forwarded.split(",")[-1].strip():
+            return forwarded.split(",")[-1].strip()
+    elif parameters.client_key == "api_key":
+        api_key = request.headers.get(parameters.client_api_key_header)
+        if api_key:
+            # Not kept in clear in the key names
+            return "key:" + hashlib.sha256(api_key.encode()).hexdigest()
+    return request.client.host if request.client else "unknown"
 
 
 @router.post("/")
-async def post_question(input_data: PostAskInput) -> PostOutputApiAskQuestion:
+async def post_question(
+    input_data: PostAskInput,
+    request: Request,
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+) -> PostOutputApiAskQuestion:
     """
     Endpoint to post a question.
 
@@ -43,14 +127,20 @@ async def post_question(input_data: PostAskInput) -> PostOutputApiAskQuestion:
     -------
     OutputApiAskQuestion
         The response containing the token, state, and question content.
+
+    Raises
+    ------
+    HTTPException
+        429 with a Retry-After header when the question queue is full,
+        or when the client sent too many questions.
     """
 
     # Will check weither what the user sent conform
     question_content = PostOutputApiAskQuestion(
         token=uuid4(),
         question_content=input_data.content,
+        priority=input_data.priority,
     )
-    update_article_queue.api_lpush_question(question_content)
 
     # Will send a key value to redis to be later changed
     # by the code when an answer will be found
@@ -60,13 +150,146 @@ async def post_question(input_data: PostAskInput) -> PostOutputApiAskQuestion:
         start_date=datetime.now(),
     )
 
-    params_repository.set_key_value_api_ask_question(key_value_ask_question_redis)
+    admission, retry_after_s = await ask_repository.push_question(
+        question_content,
+        key_value_ask_question_redis,
+        client=rate_limited_client(request, ask_repository),
+    )
+    if admission != ADMITTED:
+        raise HTTPException(
+            status_code=429,
+            detail=(
+                "Too many questions are waiting, retry later"
+                if admission == REJECTED_QUEUE_FULL
+                else "Too many questions sent, retry later"
+            ),
+            headers={"Retry-After": str(retry_after_s)},
+        )
 
     return question_content
 
 
+@router.post("/batch")
+async def post_questions(
+    input_data: PostAskBatchInput,
+    request: Request,
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+) -> PostOutputApiAskBatch:
+    """
+    Endpoint to post several questions at once. They are admitted and
+    enqueued with a single Redis round-trip.
+
+    Parameters
+    ----------
+    input_data : PostAskBatchInput
+        The questions to post.
+
+    Returns
+    -------
+    PostOutputApiAskBatch
+        The token of each admitted question, or why it was rejected,
+        in the order of the questions.
+
+    Raises
+    ------
+    HTTPException
+        422 if the batch is too big, 429 with a Retry-After header if
+        every question was rejected.
+    """
+    check_batch_size(len(input_data.questions), ask_repository)
+
+    start_date = datetime.now()
+    questions = []
+    for question_input in input_data.questions:
+        question_content = PostOutputApiAskQuestion(
+            token=uuid4(),
+            question_content=question_input.content,
+            priority=question_input.priority,
+        )
+        questions.append(
+            (
+                question_content,
+                OutputRedisApiAskQuestion(
+                    token=question_content.token,
+                    question_content=question_input.content,
+                    start_date=start_date,
+                ),
+            )
+        )
+
+    admissions = await ask_repository.push_questions(
+        questions, client=rate_limited_client(request, ask_repository)
+    )
+
+    if all(admission != ADMITTED for admission, _ in admissions):
+        raise HTTPException(
+            status_code=429,
+            detail="No question of the batch was admitted, retry later",
+            headers={
+                "Retry-After": str(min(retry_after_s for _, retry_after_s in admissions))
+            },
+        )
+
+    return PostOutputApiAskBatch(
+        questions=[
+            PostOutputApiAskBatchItem(question=question_content)
+            if admission == ADMITTED
+            else PostOutputApiAskBatchItem(
+                rejection=admission, retry_after_s=retry_after_s
+            )
+            for (question_content, _), (admission, retry_after_s) in zip(
+                questions, admissions
+            )
+        ]
+    )
+
+
+@router.get("/batch")
+async def get_responses(
+    tokens: List[str] = Query(
+        default=[], description="The tokens given when you asked the questions"
+    ),
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+) -> OutputApiAskBatch:
+    """
+    Endpoint to get the responses to several questions, read with a
+    single Redis round-trip.
+
+    Parameters
+    ----------
+    tokens : list of str
+        The tokens of the questions, as repeated query parameters
+        (?tokens=...&tokens=...).
+
+    Returns
+    -------
+    OutputApiAskBatch
+        The state of each question, in the order of the tokens.
+    """
+    # Checked here : the validation error of a missing required list
+    # can't be serialized by FastAPI, and answers a 500
+    if not tokens:
+        raise HTTPException(status_code=422, detail="Give at least one token")
+    check_batch_size(len(tokens), ask_repository)
+
+    return OutputApiAskBatch(
+        questions=await ask_repository.get_questions(
+            [GetAskInput(token=token) for token in tokens]
+        )
+    )
+
+
 @router.get("/<token>")
-async def get_response(token: GetAskInput = Depends()) -> OutputRedisApiAskQuestion:
+async def get_response(
+    token: GetAskInput = Depends(),
+    wait: int = Query(
+        default=0,
+        ge=0,
+        description="Seconds to wait for the answer before returning a pending question",
+    ),
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+    answer_waiter: AnswerWaiter = Depends(get_answer_waiter),
+) -> OutputRedisApiAskQuestion:
     """
     Endpoint to get a response to a question.
 
@@ -74,12 +297,170 @@ async def get_response(token: GetAskInput = Depends()) -> OutputRedisApiAskQuest
     ----------
     input_data : GetAskInput
         The input data containing the token associated with the question.
+    wait : int
+        If the question is still pending, the response is delayed until
+        it is answered or failed, for at most wait seconds (capped by
+        ASK_WAIT_MAX_S). 0 returns at once.
 
     Returns
     -------
     OutputApiAskQuestion : OutputRedisApiAskQuestion
         The state of your question
     """
-    value_of_token = params_repository.get_key_value_api_ask_question(token)
+    if wait == 0:
+        return await ask_repository.get_question(token)
+
+    answered = answer_waiter.register(token.token)
+    try:
+        value_of_token = await ask_repository.get_question(token)
+        if value_of_token.state in ASK_FINAL_STATES:
+            return value_of_token
+
+        if not await answer_waiter.wait(answered, wait):
+            return value_of_token
+    finally:
+        answer_waiter.unregister(token.token, answered)
+
+    value_of_token = await ask_repository.get_question(token)
 
     return value_of_token
+
+
+def format_event(event_type: str, content: str = "") -> str:
+    """
+    Format a Server-Sent Event. The content is JSON encoded so the
+    line breaks of the answer are kept.
+    """
+    return f"event: {event_type}\ndata: {json.dumps(content)}\n\n"
+
+
+async def answer_events(token: GetAskInput, ask_repository: AsyncAskRepository):
+    """
+    Relay the answer stream of a question as Server-Sent Events, until
+    its end or error event.
+
+    When nothing was streamed, the state of the question is checked
+    between two reads : an answer given without a stream (streams
+    disabled on the asker) is then sent at once. A question failed, or
+    dead lettered after its retries, is in the ERROR state.
+
+    The stream is closed by an error event after ANSWER_STREAM_MAX_S
+    seconds, if the question is still not answered.
+    """
+    deadline = time.monotonic() + ask_repository.stream_parameters.max_s
+    last_id = "0"
+    answer_done = False
+    while True:
+        if time.monotonic() >= deadline:
+            yield format_event(STREAM_ERROR)
+            return
+
+        try:
+            events = await ask_repository.read_answer_stream(token.token, last_id)
+
+            if not events:
+                question = await ask_repository.get_question(token)
+                if question.state == "ERROR":
+                    yield format_event(STREAM_ERROR)
+                    return
+                if question.state == "Done":
+                    if last_id == "0":
+                        yield format_event(STREAM_TOKEN, question.question_answer)
+                        yield format_event(STREAM_END)
+                        return
+                    # The last parts may have been appended after the read :
+                    # wait for one more read before closing the stream
+                    if answer_done:
+                        yield format_event(STREAM_END)
+                        return
+                    answer_done = True
+                    continue
+                # Comment line keeping the connection alive
+                yield ": waiting\n\n"
+                continue
+        except RuntimeError:
+            yield format_event(STREAM_ERROR)
+            return
+
+        for event_id, event in events:
+            last_id = event_id
+            yield format_event(event["type"], event["content"])
+            if event["type"] in (STREAM_END, STREAM_ERROR):
+                return
+
+
+@router.get("/stream")
+async def stream_response(
+    token: GetAskInput = Depends(),
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+) -> StreamingResponse:
+    """
+    Endpoint to get the answer to a question while it is generated,
+    as Server-Sent Events.
+
+    Parameters
+    ----------
+    input_data : GetAskInput
+        The input data containing the token associated with the question.
+
+    Returns
+    -------
+    StreamingResponse
+        A text/event-stream of "token" events, each one with the next
+        part of the answer as a JSON string, closed by an "end" event,
+        or by an "error" event if the question failed. A "reset" event
+        is sent when the question failed and is retried : the parts
+        received before are dropped.
+    """
+    # Raise on an unknown token before the stream starts
+    await ask_repository.get_question(token)
+
+    return StreamingResponse(
+        answer_events(token, ask_repository),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def get_stats(
+    ask_repository: AsyncAskRepository = Depends(get_ask_repository),
+) -> OutputApiAskStats:
+    """
+    Endpoint to get the statistics of the question answering service.
+
+    Returns
+    -------
+    OutputApiAskStats
+        The hits, misses and hit rate of the answer caches, and the
+        memory used by the question records, the length of the question
+        queue, the admission counters and the usage of the Redis connection
+        pools of the API worker answering.
+    """
+    answer_cache_stats = await ask_repository.get_answer_cache_stats()
+    record_stats = await ask_repository.get_record_stats()
+    admission_stats = await ask_repository.get_admission_stats()
+    pool_stats = get_redis_pool_stats(ask_repository.db)
+    blocking_pool_stats = get_redis_pool_stats(ask_repository.blocking_db)
+
+    return OutputApiAskStats(
+        answer_cache_hits=answer_cache_stats["hits"],
+        answer_cache_misses=answer_cache_stats["misses"],
+        answer_cache_hit_rate=answer_cache_stats["hit_rate"],
+        answer_cache_epoch=answer_cache_stats["epoch"],
+        semantic_cache_hits=answer_cache_stats["semantic_hits"],
+        semantic_cache_misses=answer_cache_stats["semantic_misses"],
+        answered_records=record_stats["records"],
+        answered_record_mean_bytes=record_stats["mean_bytes"],
+        queue_length=admission_stats["queue_length"],
+        batch_queue_length=admission_stats["batch_queue_length"],
+        queue_pending=admission_stats["queue_pending"],
+        admitted_questions=admission_stats["admitted"],
+        rejected_queue_full=admission_stats["rejected_queue_full"],
+        rejected_rate_limited=admission_stats["rejected_rate_limited"],
+        redis_pool_max_connections=pool_stats["max_connections"],
+        redis_pool_in_use=pool_stats["in_use"],
+        redis_pool_idle=pool_stats["idle"],
+        redis_blocking_pool_max_connections=blocking_pool_stats["max_connections"],
+        redis_blocking_pool_in_use=blocking_pool_stats["in_use"],
+    )
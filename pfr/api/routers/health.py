@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+)
+
+
+@router.get("/live")
+async def live() -> dict:
+    """
+    Liveness probe : the worker answers requests.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready(request: Request) -> JSONResponse:
+    """
+    Readiness probe : the services of the worker are created and Redis
+    answers. Answers 503 otherwise, so the orchestrator doesn't send it
+    requests yet.
+
+    Returns
+    -------
+    JSONResponse
+        The readiness and the initialization timings in seconds of the
+        services.
+    """
+    state = request.app.state
+    is_ready = getattr(state, "ready", False)
+    if is_ready:
+        try:
+            await state.ask_repository.ping()
+        except RuntimeError:
+            is_ready = False
+
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "timings": getattr(state, "boot_timings", {}),
+        },
+    )
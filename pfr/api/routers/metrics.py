@@ -0,0 +1,36 @@
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import REGISTRY
+from prometheus_client import CollectorRegistry
+from prometheus_client import generate_latest
+from prometheus_client import multiprocess
+
+from shared.services.metrics import CALLBACK_COLLECTORS
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+
+@router.get("/metrics")
+def metrics() -> Response:
+    """
+    Prometheus metrics of the API, in the text exposition format.
+
+    Each uvicorn worker has its own metrics : with WORKERS > 1, set
+    PROMETHEUS_MULTIPROC_DIR to an empty folder, so any worker serves
+    the metrics of all of them. The gauges read on scrape, e.g. the
+    Redis pool usage, are then the ones of the worker answering.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in CALLBACK_COLLECTORS:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
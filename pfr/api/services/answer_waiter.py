@@ -0,0 +1,170 @@
+"""
+Wait for the answers of the questions without polling Redis.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from pydantic import ValidationError
+from redis import RedisError
+
+from shared.models.answer_waiter_parameters import AnswerWaiterParameters
+from shared.repositories.async_ask_repository import AsyncAskRepository
+from shared.repositories.params_repository import ParamsRepository
+
+# Pause before subscribing again after a lost connection
+RESUBSCRIBE_DELAY_S = 1
+# Wait for a notification, shorter than REDIS_SOCKET_TIMEOUT_MS so an
+# idle subscription isn't taken for a lost connection
+NOTIFICATION_WAIT_S = 1
+
+
+class AnswerWaiter:
+    """
+    Wake up the requests waiting for the answer of a question.
+
+    Note
+    ----
+    A single subscription per API worker receives the notifications
+    published by the asker when a question is answered or failed. It
+    is read by a background task, started and stopped with the API,
+    which sets the events of the requests waiting for this token. A
+    waiting request costs no Redis call.
+
+    Attributes
+    ----------
+    parameters : AnswerWaiterParameters
+        The maximum wait allowed to a request.
+
+    _logger : Logger
+        The service logger.
+    """
+
+    def __init__(self, app_config: dict, ask_repository: AsyncAskRepository) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the service is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        if not isinstance(ask_repository, AsyncAskRepository):
+            self._logger.critical(
+                msg="The ask repository given to the service is not of the right type."
+            )
+            raise RuntimeError("Bad Ask Repository Type")
+
+        try:
+            self.parameters = AnswerWaiterParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the answer waiter's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self.ask_repository = ask_repository
+        # token -> events of the waiting requests
+        self._waiters = defaultdict(list)
+        self._listener = None
+
+    def start(self) -> None:
+        """
+        Start the subscription task, in the running event loop.
+        """
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stop the subscription task.
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def register(self, token: str) -> asyncio.Event:
+        """
+        Register a request waiting for a question. Register before
+        reading the question, so an answer given in between is not missed.
+
+        Parameters
+        ----------
+        token: str
+            The token of the question.
+
+        Returns
+        -------
+        asyncio.Event
+            The event set when the question is answered or failed.
+        """
+        event = asyncio.Event()
+        self._waiters[token].append(event)
+        return event
+
+    def unregister(self, token: str, event: asyncio.Event) -> None:
+        """
+        Remove a request registered with register.
+        """
+        waiters = self._waiters.get(token, [])
+        if event in waiters:
+            waiters.remove(event)
+        if not waiters:
+            self._waiters.pop(token, None)
+
+    async def wait(self, event: asyncio.Event, timeout_s: int) -> bool:
+        """
+        Wait for a registered event, at most timeout_s and ASK_WAIT_MAX_S.
+
+        Returns
+        -------
+        bool
+            True if the question was answered or failed in time.
+        """
+        try:
+            await asyncio.wait_for(
+                event.wait(), timeout=min(timeout_s, self.parameters.max_wait_s)
+            )
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _listen(self) -> None:
+        """
+        Read the notifications and wake the waiting requests up,
+        subscribing again when the connection is lost.
+        """
+        while True:
+            try:
+                pubsub = await self.ask_repository.subscribe_answered_questions()
+            except RuntimeError:
+                await asyncio.sleep(RESUBSCRIBE_DELAY_S)
+                continue
+
+            try:
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=NOTIFICATION_WAIT_S
+                    )
+                    if message is not None and message["type"] == "pmessage":
+                        self._notify(ParamsRepository.answered_token(message["channel"]))
+            except RedisError as e:
+                self._logger.warning(
+                    "Answered questions subscription lost, subscribing again : %s.", e
+                )
+            finally:
+                await pubsub.aclose()
+
+            # Wake every request up, they read the questions again and
+            # don't miss an answer given while the subscription was lost
+            for token in list(self._waiters.keys()):
+                self._notify(token)
+            await asyncio.sleep(RESUBSCRIBE_DELAY_S)
+
+    def _notify(self, token: str) -> None:
+        for event in self._waiters.pop(token, []):
+            event.set()
@@ -4,6 +4,8 @@ FastApi entrypoint
 Will launch a univcorn instance with parameters specified inside .env
 """
 
+import time
+
 import uvicorn
 
 # App services & repositories
@@ -15,6 +17,8 @@ from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoin
 from starlette.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from shared.services.metrics import HTTP_SECONDS
+
 
 # ----------------------
 # LAUNCH APP
@@ -33,8 +37,29 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         return response
 
 
+# Observe the latency of the requests by route
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The template of the route, e.g. /ask/{token}, not the path :
+            # one series per route, whatever the tokens
+            route = request.scope.get("route")
+            HTTP_SECONDS.labels(
+                request.method,
+                route.path if route is not None else "unmatched",
+                status,
+            ).observe(time.perf_counter() - start)
+
+
 # Add the middleware to the FastAPI app
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Add CORS middleware if needed
 app.add_middleware(
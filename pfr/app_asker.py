@@ -1,134 +1,335 @@
 """
 """
 
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from logging import exception
-import time
+from typing import Callable, Tuple
 
 from pydantic import ValidationError
 
 # App services & repositories
+from asker import boot
 from asker.boot import logger
-from asker.boot import ontology_qa
-from asker.boot import update_article_queue
-from asker.boot import params_repository
-from asker.boot import vector_store
 from asker.boot import config
-from asker.boot import chatgpt_vector_graphdb_qa
+from asker.boot import retriever_parameters
 
 from shared.models.get_ask_input import GetAskInput
+from shared.models.redis_popped_api_ask_question import RedisPoppedApiAskQuestion
+from shared.repositories.answer_stream_repository import (
+    STREAM_END,
+    STREAM_ERROR,
+    STREAM_TOKEN,
+)
+from shared.services.get_redis_pool_stats import get_redis_pool_stats
+from shared.services.metrics import ANSWER_CACHE_LOOKUPS
+from shared.services.metrics import QUESTION_SECONDS
 
 # ----------------------
-# LAUNCH APP
+# QUESTION ANSWERING
 # ----------------------
 
-if __name__ == "__main__":
-    logger.info("=== Start Asker ===")
 
-    if "TIME_SLEEP_ERROR" not in config:
-        logger.critical("TIME_SLEEP_ERROR is not present if .env file config")
-        exit(1)
+def answer_question(
+    question: str, on_token: Callable[[str], None] = None
+) -> Tuple[str, bool]:
+    """
+    Build the answer of a question from the vector store, the
+    ontology and ChatGPT. The vector store and the ontology are
+    queried concurrently. on_token is given each part of the answer
+    as soon as ChatGPT generates it.
 
-    while True:
-        try:
-            popped_question = update_article_queue.api_pop_question()
-        except Exception as e:
-            logger.info("Can't pop question %s !!!", e)
-            time.sleep(config["TIME_SLEEP_ERROR"])
-            continue
+    Returns the answer, and whether it is degraded : built without the
+    branch which timed out or failed.
+    """
+    try:
+        (
+            neo4j_similarity_article,
+            question_answer_graphdb,
+            degraded,
+        ) = boot.parallel_retriever.retrieve(question)
+    except RuntimeError as e:
+        logger.error(
+            "Something went wrong when looking for the answer of a question: %s.",
+            e,
+        )
+        raise RuntimeError from e  # Raise the exception to propagate it
 
-        try:
-            # If no article is present in the queue, we wait a few seconds
-            # then we jump to the next loop
-            if popped_question is None:
-                time.sleep(1)
-                continue
+    try:
+        full_answer = boot.chatgpt_vector_graphdb_qa.answer_question(
+            question=question,
+            vector_answer=boot.chatgpt_vector_graphdb_qa.build_context(
+                neo4j_similarity_article
+            ),
+            graphdb_answer=question_answer_graphdb,
+            on_token=on_token,
+        )
+    except Exception as e:
+        logger.error(
+            "Error occurred when processing the question, the answer of graphdb as well as neo4J: %s.",
+            e,
+            exc_info=True,
+        )
+        raise e  # Raise the exception to propagate it
 
-            logger.info(f"Popped question : {popped_question}")
+    return full_answer, degraded
 
-            try:
-                neo4j_similarity_article = vector_store.similarity_search_with_score(
-                    query=popped_question.question_content
-                )
-            except RuntimeError as e:
-                logger.error(
-                    "Something went wrong when looking for the answer of a question: %s.",
-                    e,
-                )
-                raise RuntimeError from e  # Raise the exception to propagate it
 
-            # logger.info(f"###############{neo4j_similarity_article}###############")
+def stream_answer(token: str, event_type: str, content: str = "") -> None:
+    """
+    Append to the answer stream of a question. The stream is only a
+    preview of the answer : a failure is logged and the question goes on.
+    """
+    try:
+        boot.answer_stream_repository.append(token, event_type, content)
+    except RuntimeError as e:
+        logger.warning("Failed to stream the answer of %s : %s.", token, e)
 
-            try:
-                question_answer_graphdb = ontology_qa.answer_question(
-                    popped_question.question_content
-                )
 
-                # logger.info(f"###############{question_answer_graphdb}###############")
-                #
-            except RuntimeError as e:
-                logger.error(
-                    "Something went wrong when looking for the answer of a question: %s.",
-                    e,
-                )
-                raise RuntimeError from e  # Raise the exception to propagate it
+def reset_answer_stream(token: str) -> None:
+    """
+    Drop the answer streamed for a question which failed. As the stream,
+    the reset is best effort : a failure is logged.
+    """
+    try:
+        boot.answer_stream_repository.reset(token)
+    except RuntimeError as e:
+        logger.warning("Failed to reset the answer stream of %s : %s.", token, e)
 
-            try:
-                full_answer = chatgpt_vector_graphdb_qa.answer_question(
-                    question=popped_question.question_content,
-                    vector_answer=str(neo4j_similarity_article),
-                    graphdb_answer=question_answer_graphdb,
-                )
-            except Exception as e:
-                logger.error(
-                    "Error occurred when processing the question, the answer of graphdb as well as neo4J: %s.",
-                    e,
-                    exc_info=True,
-                )
-                raise e  # Raise the exception to propagate it
 
-            # logger.info(f"###############{full_answer}###############")
+def handle_question(popped_question: RedisPoppedApiAskQuestion) -> None:
+    """
+    Answer a popped question and save its answer, or its error state.
+    Run in a worker thread : the services it uses are thread-safe.
+    """
+    start = time.perf_counter()
+    try:
+        logger.info(f"Popped question : {popped_question}")
+
+        try:
+            cached_answer, cache_epoch = boot.answer_cache_repository.get_answer(
+                popped_question.question_content
+            )
+        except RuntimeError as e:
+            # The cache is an optimisation : answer the question anyway
+            logger.warning("Answer cache unavailable : %s.", e)
+            cached_answer, cache_epoch = None, None
+        else:
+            ANSWER_CACHE_LOOKUPS.labels(
+                "exact", "miss" if cached_answer is None else "hit"
+            ).inc()
 
+        # Look for a question asked with other words
+        question_vector = None
+        if cached_answer is None and cache_epoch is not None:
             try:
-                full_popped_question = params_repository.get_key_value_api_ask_question(
-                    GetAskInput(token=str(popped_question.token))
+                cached_answer, question_vector = boot.semantic_answer_cache.lookup(
+                    popped_question.question_content, cache_epoch
                 )
+                if boot.semantic_answer_cache.enabled:
+                    boot.answer_cache_repository.count_semantic_lookup(
+                        cached_answer is not None
+                    )
+                    ANSWER_CACHE_LOOKUPS.labels(
+                        "semantic", "miss" if cached_answer is None else "hit"
+                    ).inc()
             except RuntimeError as e:
-                logger.error(
-                    "Something went wrong when retrieving the contentvalue of the question %s.",
-                    e,
-                    exc_info=True,
-                )
-                raise e  # Raise the exception to propagate it
+                logger.warning("Semantic answer cache unavailable : %s.", e)
 
-            try:
-                full_popped_question.question_answer = full_answer
-                full_popped_question.finish_date = datetime.now()
-                full_popped_question.state = "Done"
-            except (ValidationError, ValueError) as e:
-                logger.error(
-                    "Error occurred when processing the question data: %s.",
-                    e,
-                    exc_info=True,
-                )
-                raise e  # Raise the exception to propagate it
+        if cached_answer is not None:
+            logger.info(
+                f"Question of token {str(popped_question.token)} found in the answer cache."
+            )
+            full_answer = cached_answer
+            stream_answer(str(popped_question.token), STREAM_TOKEN, full_answer)
+        else:
+            full_answer, degraded = answer_question(
+                popped_question.question_content,
+                on_token=(
+                    partial(stream_answer, str(popped_question.token), STREAM_TOKEN)
+                    if boot.answer_stream_repository.enabled
+                    else None
+                ),
+            )
 
-            try:
-                params_repository.set_key_value_api_ask_question(full_popped_question)
+            # A degraded answer isn't cached : it would be given for the
+            # whole TTL after the branch is back
+            if degraded:
                 logger.info(
-                    f"Question of token {str(popped_question.token)} was successfully answered !"
+                    "Degraded answer of the question %s not cached.",
+                    popped_question.token,
                 )
-            except Exception as e:
-                logger.error(
-                    "Something went wrong when updating a question with an answer %s.",
-                    e,
-                    exc_info=True,
+            elif cache_epoch is not None:
+                try:
+                    boot.answer_cache_repository.set_answer(
+                        popped_question.question_content, full_answer, cache_epoch
+                    )
+                except RuntimeError as e:
+                    logger.warning("Failed to cache the answer : %s.", e)
+
+                boot.semantic_answer_cache.add(
+                    popped_question.question_content,
+                    question_vector,
+                    full_answer,
+                    cache_epoch,
                 )
-                raise e  # Raise the exception to propagate it
 
+        # logger.info(f"###############{full_answer}###############")
+
+        try:
+            params_repository = boot.params_repository
+            full_popped_question = params_repository.get_key_value_api_ask_question(
+                GetAskInput(token=str(popped_question.token))
+            )
+        except RuntimeError as e:
+            logger.error(
+                "Something went wrong when retrieving the contentvalue of the question %s.",
+                e,
+                exc_info=True,
+            )
+            raise e  # Raise the exception to propagate it
+
+        try:
+            full_popped_question.question_answer = full_answer
+            full_popped_question.finish_date = datetime.now()
+            full_popped_question.state = "Done"
+        except (ValidationError, ValueError) as e:
+            logger.error(
+                "Error occurred when processing the question data: %s.",
+                e,
+                exc_info=True,
+            )
+            raise e  # Raise the exception to propagate it
+
+        try:
+            boot.params_repository.set_key_value_api_ask_question(full_popped_question)
+            logger.info(
+                f"Question of token {str(popped_question.token)} was successfully answered !"
+            )
+            stream_answer(str(popped_question.token), STREAM_END)
+            QUESTION_SECONDS.labels("done").observe(time.perf_counter() - start)
         except Exception as e:
-            logger.error("An unexpected error occurred: %s", e)
-            try:
-                params_repository.set_key_value_error_qa_question(popped_question)
-            except Exception as e:
-                logger.critical("A critical error happened %s", e)
+            logger.error(
+                "Something went wrong when updating a question with an answer %s.",
+                e,
+                exc_info=True,
+            )
+            raise e  # Raise the exception to propagate it
+
+    except Exception as e:
+        logger.error("An unexpected error occurred: %s", e)
+        # Reset before the retry can start, so its answer isn't streamed
+        # after the one of the failed attempt
+        reset_answer_stream(str(popped_question.token))
+        try:
+            # Pushed back to its queue : stays pending until its retry
+            if boot.update_article_queue.fail(popped_question, repr(e)):
+                QUESTION_SECONDS.labels("retry").observe(time.perf_counter() - start)
+                return
+        except RuntimeError as fail_error:
+            logger.error("Failed to retry a question : %s.", fail_error)
+        try:
+            boot.params_repository.set_key_value_error_qa_question(popped_question)
+        except Exception as e:
+            logger.critical("A critical error happened %s", e)
+        stream_answer(str(popped_question.token), STREAM_ERROR)
+        QUESTION_SECONDS.labels("error").observe(time.perf_counter() - start)
+
+
+async def handle_question_task(
+    popped_question: RedisPoppedApiAskQuestion, slots: asyncio.Semaphore
+) -> None:
+    """
+    Answer a question in a worker thread, then free its slot. The
+    question is acknowledged once answered or dead lettered : read from
+    a stream, it is delivered again if the asker stops before.
+    """
+    try:
+        await asyncio.to_thread(handle_question, popped_question)
+        await asyncio.to_thread(boot.update_article_queue.ack, popped_question)
+    except RuntimeError as e:
+        logger.error("Failed to acknowledge a question : %s.", e)
+    finally:
+        slots.release()
+
+
+async def main() -> None:
+    """
+    Pop the questions and answer up to ASKER_CONCURRENCY of them at once.
+    """
+    concurrency = retriever_parameters.concurrency
+    # asyncio.to_thread runs on the default executor : one thread per question
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="question")
+    )
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    while True:
+        # Wait for a free slot before popping, so the questions we can't
+        # handle yet stay in the queue
+        await slots.acquire()
+
+        try:
+            popped_question = await asyncio.to_thread(
+                boot.update_article_queue.api_pop_question
+            )
+        except Exception as e:
+            slots.release()
+            logger.info(
+                "Can't pop question %s !!! Redis pool : %s",
+                e,
+                get_redis_pool_stats(boot.update_article_queue.db),
+            )
+            await asyncio.sleep(int(config["TIME_SLEEP_ERROR"]))
+            continue
+
+        # If no question is present in the queue, we wait a second
+        # then we jump to the next loop
+        if popped_question is None:
+            slots.release()
+            await asyncio.sleep(1)
+            continue
+
+        task = asyncio.create_task(handle_question_task(popped_question, slots))
+        # Keep a reference on the running tasks, asyncio only keeps weak ones
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+def save_semantic_answer_cache() -> None:
+    """
+    Save the questions added to the semantic answer cache since its last
+    periodic save. It isn't built for nothing when no question was asked.
+    """
+    if boot.registry.built("semantic_answer_cache"):
+        boot.semantic_answer_cache.save()
+
+
+# ----------------------
+# LAUNCH APP
+# ----------------------
+
+if __name__ == "__main__":
+    logger.info("=== Start Asker ===")
+
+    if "TIME_SLEEP_ERROR" not in config:
+        logger.critical("TIME_SLEEP_ERROR is not present if .env file config")
+        exit(1)
+
+    logger.info(
+        "Answering up to %s questions concurrently.",
+        retriever_parameters.concurrency,
+    )
+    # Stop on SIGTERM, sent by docker stop, as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("=== Stop Asker ===")
+    finally:
+        save_semantic_answer_cache()
@@ -0,0 +1,102 @@
+"""
+Dead letters entry point
+
+The articles and questions which failed after their retries, or could not
+be read, are moved with their error to the dead letters of their queue.
+This command lists them, pushes them back to their queue once the cause
+is fixed, or deletes them.
+
+Usage (from the pfr folder) :
+    python app_dead_letter.py list --queue task_update_article --limit 20
+    python app_dead_letter.py replay --queue task_update_article
+    python app_dead_letter.py purge --queue api_ask_question
+"""
+
+import argparse
+import json
+import sys
+
+from shared.repositories.update_queues import API_ASK_QUESTION_QUEUES
+from shared.repositories.update_queues import UPDATE_ARTICLE_QUEUE
+
+QUEUES = [UPDATE_ARTICLE_QUEUE, *API_ASK_QUESTION_QUEUES.values()]
+
+#----------------------
+# LAUNCH APP
+#----------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "command",
+        choices=["list", "replay", "purge"],
+        help="List, push back to their queue or delete the dead letters"
+    )
+    parser.add_argument(
+        "--queue",
+        choices=QUEUES,
+        action="append",
+        help="Queue of the dead letters, every queue by default"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Dead letters listed (20 by default) or replayed (all by default)"
+    )
+    parser.add_argument(
+        "--config",
+        default="updater",
+        help="Application whose configuration is used, to reach Redis"
+    )
+    args = parser.parse_args()
+
+    # APP CONFIGURATION & LOGGER
+    #----------------------
+    try:
+        from shared.services.get_config import get_config
+        config = get_config(args.config)
+    except RuntimeError as e:
+        print("Failed to initialize application configuration :"
+              f" {e}. Exiting...")
+        sys.exit(1)
+
+    try:
+        import logging
+        from shared.services.app_logger import AppLogger
+        AppLogger(config)
+        logger = logging.getLogger(__name__)
+    except RuntimeError:
+        print("Failed to initialize logger. Exiting...")
+        sys.exit(1)
+
+    try:
+        from shared.services.get_redis_client import get_redis_client
+        from shared.repositories.update_queues import UpdateQueues
+        update_article_queue = UpdateQueues(get_redis_client(config), config)
+    except RuntimeError:
+        logger.critical(
+            exc_info=True,
+            msg="Failed to initialize update queues. Exiting..."
+        )
+        sys.exit(1)
+
+    try:
+        for queue in args.queue or QUEUES:
+            if args.command == "list":
+                dead_letters = update_article_queue.get_dead_letters(
+                    queue, count=args.limit or 20
+                )
+                print(f"=== {queue} : {len(dead_letters)} dead letters listed ===")
+                for dead_letter in dead_letters:
+                    print(json.dumps(dead_letter, ensure_ascii=False))
+            elif args.command == "replay":
+                replayed = update_article_queue.replay_dead_letters(queue, args.limit)
+                print(f"=== {queue} : {replayed} dead letters replayed ===")
+            else:
+                purged = update_article_queue.purge_dead_letters(queue)
+                print(f"=== {queue} : {purged} dead letters purged ===")
+    except RuntimeError as e:
+        logger.critical("Failed to %s the dead letters : %s.", args.command, e)
+        sys.exit(1)
@@ -27,6 +27,9 @@ from retriever.boot import record_fetcher
 from retriever.boot import params_repository
 from retriever.boot import update_article_queue
 
+from shared.services.metrics import ARTICLES_RETRIEVED
+from shared.services.metrics import RETRIEVER_SECONDS
+
 #----------------------
 # LAUNCH APP
 #----------------------
@@ -68,6 +71,9 @@ if __name__ == "__main__":
                    record_fetcher.metrics_fetch_time,
                    record_fetcher.metrics_convert_time)
             )
+            RETRIEVER_SECONDS.labels("fetch").observe(record_fetcher.metrics_fetch_time)
+            RETRIEVER_SECONDS.labels("convert").observe(record_fetcher.metrics_convert_time)
+            ARTICLES_RETRIEVED.inc(len(records_response.records))
             
             for article in records_response.records:
                 update_article_queue.push_task_update_article(article)
@@ -4,14 +4,36 @@ import time
 import re
 
 # App services & repositories
-from requests import Request
-
+from updater import boot
 from updater.boot import logger
-from updater.boot import update_article_queue
-from updater.boot import article_repository
-from updater.boot import vector_store
+from updater.boot import config
+
+#----------------------
+# ARTICLE QUEUE
+#----------------------
+
+def acknowledge(article) -> None:
+    """
+    Acknowledge a handled article. Read from a stream, an article not
+    acknowledged is delivered again when the updater stops before.
+    In bulk mode, it's acknowledged once written in the bulk file.
+    """
+    try:
+        boot.update_article_queue.ack(article)
+    except RuntimeError as e:
+        logger.error("Failed to acknowledge an article : %s.", e)
+
+
+def fail(article, error: str) -> None:
+    """
+    Push a failed article back to the queue, to be retried after a
+    backoff, or moved to its dead letters once its retries are exhausted.
+    """
+    try:
+        boot.update_article_queue.fail(article, error)
+    except RuntimeError as e:
+        logger.error("Failed to retry an article : %s.", e)
 
-from langchain.text_splitter import SpacyTextSplitter
 
 #----------------------
 # LAUNCH APP
@@ -21,39 +43,99 @@ if __name__ == "__main__":
     
     logger.info("=== Start Updater main loop ===")
 
+    if config.get("UPDATER_GRAPH_MODE") not in ("online", "bulk"):
+        logger.critical("UPDATER_GRAPH_MODE must be 'online' or 'bulk' in .env file config")
+        exit(1)
+
+    logger.info("- Knowledge graph mode : %s." % config["UPDATER_GRAPH_MODE"])
+
+    # Imported here : LangChain and spaCy take seconds to import
+    from langchain.text_splitter import SpacyTextSplitter
+
     text_splitter = SpacyTextSplitter(
           chunk_size = 200,
           chunk_overlap  = 20
         )
 
+    # Number of articles written since the answer cache was invalidated
+    ingested_articles = 0
+
     while True :
-        popped_article = update_article_queue.pop_task_update_article()
+        popped_article = boot.update_article_queue.pop_task_update_article()
 
         # If no article is present in the queue, we wait a few seconds
         # then we jump to the next loop
         if popped_article is None:
+            # The queue is drained : load what the bulk file holds
+            if boot.bulk_loader is not None:
+                boot.bulk_loader.flush()
+
+            # The answers cached before these articles may be outdated
+            if ingested_articles > 0:
+                try:
+                    boot.answer_cache_repository.bump_epoch()
+                    ingested_articles = 0
+                except RuntimeError as e:
+                    logger.error(
+                        "Failed to invalidate the answer cache : %s.",
+                        e,
+                        exc_info=True
+                    )
+
             time.sleep(1)
             continue
 
+        # Reason of the failure of the article, retried when set
+        error = None
+
         try:
             logger.info(f"Popped article : {popped_article.id}")
 
             # Insert into KG
-            article_repository.insert_article(popped_article)
-        except RuntimeError as e:
+            if boot.bulk_loader is not None:
+                boot.bulk_loader.add_article(popped_article)
+            elif not boot.article_repository.upsert_article(popped_article):
+                # Harvested again without modification : nothing to update,
+                # unless it's retried after its vectorization failed
+                if boot.update_article_queue.attempts(popped_article) == 0:
+                    logger.info(f"Article {popped_article.id} is up to date, skipped.")
+                    acknowledge(popped_article)
+                    continue
+            ingested_articles += 1
+        except (RuntimeError, OSError) as e:
                 logger.error(
                     "Failed to insert an article in the KG : %s.",
                     e,
                     exc_info=True
                 )
+                error = f"KG : {e!r}"
 
         try:
             # Vectorisation
-            texts = text_splitter.create_documents([popped_article.description])
-            vector_store.add_documents(texts)
-        except RuntimeError as e:
+            # The article is kept with its chunks, so the asker can
+            # group the chunks of an article
+            texts = text_splitter.create_documents(
+                [popped_article.description],
+                metadatas=[{
+                    "article_id": popped_article.id,
+                    "title": popped_article.title
+                }]
+            )
+            # Ids from the article : a retried article replaces its
+            # chunks instead of adding them again
+            boot.vector_store.add_documents(
+                texts,
+                ids=[f"{popped_article.id}-{index}" for index in range(len(texts))]
+            )
+        except Exception as e:
                 logger.error(
                     "Failed to vectorize an article abstract : %s.",
                     e,
                     exc_info=True
                 )
+                error = error or f"Vectorization : {e!r}"
+
+        if error is None:
+            acknowledge(popped_article)
+        else:
+            fail(popped_article, error)
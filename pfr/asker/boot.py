@@ -20,71 +20,194 @@ except RuntimeError:
     print("Failed to initialize logger. Exiting...")
     sys.exit(1)
 
-# INIT Database connection
+# METRICS
 # ----------------------
+# Served on METRICS_PORT from a thread, while the services are built
 try:
-    from shared.services.get_redis_client import get_redis_client
+    from shared.services import metrics
 
-    db_client = get_redis_client(config)
+    metrics.start_metrics_server(config)
 except RuntimeError:
-    logger.critical(exc_info=True, msg="Failed to initialize db client. Exiting...")
+    logger.critical(exc_info=True, msg="Failed to initialize metrics server. Exiting...")
     sys.exit(1)
 
-# Repository initialisation
+# CONCURRENCY
 # ----------------------
+# Read from the configuration, so the asker starts popping the questions
+# without building the retriever with BOOT_MODE="lazy"
 try:
-    from shared.repositories.params_repository import ParamsRepository
+    from pydantic import ValidationError
+    from shared.models.parallel_retriever_parameters import ParallelRetrieverParameters
 
-    params_repository = ParamsRepository(db_client)
-except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize params repositories. Exiting..."
-    )
+    retriever_parameters = ParallelRetrieverParameters(**config)
+except ValidationError:
+    logger.critical(exc_info=True, msg="Faulty retrieval parameters. Exiting...")
     sys.exit(1)
 
+# BOOT REGISTRY
+# ----------------------
+# The services are registered with their factory below, then built
+# concurrently by registry.start (BOOT_MODE="parallel"). With
+# BOOT_MODE="lazy", registry.start builds the required ones, and the
+# other ones are built on their first use. They are got from this
+# module as attributes when they are used : boot.parallel_retriever
 try:
-    from shared.repositories.update_queues import UpdateQueues
+    from shared.services.boot_registry import BootRegistry
 
-    update_article_queue = UpdateQueues(db_client)
+    registry = BootRegistry(config)
 except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize update articles queue. Exiting..."
-    )
+    logger.critical(exc_info=True, msg="Failed to initialize boot registry. Exiting...")
     sys.exit(1)
 
 
+def __getattr__(name: str):
+    if name not in registry:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        return registry.get(name)
+    except RuntimeError:
+        logger.critical(exc_info=True, msg=f"Failed to initialize {name}. Exiting...")
+        sys.exit(1)
+
+
+# INIT Database connection
+# ----------------------
+def _db_client():
+    from shared.services.get_redis_client import get_redis_client
+
+    return get_redis_client(config)
+
+
+registry.register("db_client", _db_client, "db client", required=True)
+
+
+# Repository initialisation
+# ----------------------
+def _params_repository():
+    from shared.repositories.params_repository import ParamsRepository
+
+    return ParamsRepository(registry.get("db_client"), config)
+
+
+def _update_article_queue():
+    from shared.repositories.update_queues import UpdateQueues
+
+    return UpdateQueues(registry.get("db_client"), config)
+
+
+def _answer_cache_repository():
+    from shared.repositories.answer_cache_repository import AnswerCacheRepository
+
+    return AnswerCacheRepository(registry.get("db_client"), config)
+
+
+def _answer_stream_repository():
+    from shared.repositories.answer_stream_repository import AnswerStreamRepository
+
+    return AnswerStreamRepository(registry.get("db_client"), config)
+
+
+# Required to pop the questions and record their answers : built before
+# the asker is ready with BOOT_MODE="lazy"
+registry.register(
+    "params_repository", _params_repository, "params repositories", required=True
+)
+registry.register(
+    "update_article_queue",
+    _update_article_queue,
+    "update articles queue",
+    required=True,
+)
+registry.register(
+    "answer_cache_repository",
+    _answer_cache_repository,
+    "answer cache repository",
+    required=True,
+)
+registry.register(
+    "answer_stream_repository",
+    _answer_stream_repository,
+    "answer stream repository",
+    required=True,
+)
+
+
 # VECTOR_STORE
 # ----------------------
-try:
+def _vector_store():
     from shared.services.vector_store_client import get_vector_store_client
 
-    vector_store = get_vector_store_client(config)
-except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize vector store client. Exiting..."
-    )
-    sys.exit(1)
+    return get_vector_store_client(config, registry.get("openai_rate_limiter"))
+
+
+registry.register("vector_store", _vector_store, "vector store client")
+
+
+# OPENAI RATE LIMITER
+# ----------------------
+def _openai_rate_limiter():
+    from shared.services.rate_limiter import RateLimiter
+
+    return RateLimiter(config)
+
+
+registry.register("openai_rate_limiter", _openai_rate_limiter, "rate limiter")
+
 
 # ONTOLOGY_QA
 # ----------------------
-try:
+def _ontology_qa():
     from asker.services.ontology_graphdb_qa import OntologyGraphdbQA
 
-    ontology_qa = OntologyGraphdbQA(config)
-except RuntimeError:
-    logger.critical(
-        exc_info=True, msg="Failed to initialize ontology qa service. Exiting..."
+    return OntologyGraphdbQA(config, registry.get("openai_rate_limiter"))
+
+
+registry.register("ontology_qa", _ontology_qa, "ontology qa service")
+
+
+# RETRIEVAL BRANCHES
+# ----------------------
+def _parallel_retriever():
+    from asker.services.parallel_retriever import ParallelRetriever
+
+    return ParallelRetriever(
+        config, registry.get("vector_store"), registry.get("ontology_qa")
     )
-    sys.exit(1)
 
 
-try:
+def _chatgpt_vector_graphdb_qa():
     from asker.services.chatgpt_vector_graphdb_qa import ChatgptVectorGraphdbQA
 
-    chatgpt_vector_graphdb_qa = ChatgptVectorGraphdbQA(config)
+    return ChatgptVectorGraphdbQA(config, registry.get("openai_rate_limiter"))
+
+
+registry.register("parallel_retriever", _parallel_retriever, "parallel retriever")
+registry.register(
+    "chatgpt_vector_graphdb_qa",
+    _chatgpt_vector_graphdb_qa,
+    "chatgpt vector graphdb qa service",
+)
+
+
+# SEMANTIC ANSWER CACHE
+# ----------------------
+def _semantic_answer_cache():
+    from asker.services.semantic_answer_cache import SemanticAnswerCache
+
+    return SemanticAnswerCache(config, registry.get("vector_store").embeddings)
+
+
+registry.register(
+    "semantic_answer_cache", _semantic_answer_cache, "semantic answer cache"
+)
+
+# BOOT
+# ----------------------
+try:
+    registry.start()
+    metrics.set_boot_timings(registry.timings)
+    metrics.register_queue_stats(registry.get("update_article_queue"))
+    metrics.register_redis_pool_stats({"commands": registry.get("db_client")})
 except RuntimeError:
-    logger.critical(
-        exc_info=True,
-        msg="Failed to initialize chatgpt vector graphdb qa service. Exiting...",
-    )
+    logger.critical(exc_info=True, msg="Failed to initialize the services. Exiting...")
     sys.exit(1)
@@ -1,20 +1,23 @@
-from langchain_core.messages import BaseMessage
-
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-    HumanMessagePromptTemplate,
-    SystemMessagePromptTemplate,
-)
-
-from langchain_openai import ChatOpenAI
-
 from shared.models.chatgpt_vector_graphdb_qa_parameters import (
     ChatgptVectorGraphdbQaParameters,
 )
+from shared.services.metrics import QUESTION_PROMPT_TOKENS
 
 from pydantic import ValidationError
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, List, Tuple
 import logging
 import os
+import time
+
+# LangChain, the OpenAI client and tiktoken take seconds to import :
+# they are imported when the service is created
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from shared.services.rate_limiter import RateLimiter
+
+# Context given to ChatGPT when the similarity search found nothing
+NO_VECTOR_ANSWER = "No information could be retrieved from the articles abstracts."
 
 
 class ChatgptVectorGraphdbQA:
@@ -30,10 +33,16 @@ class ChatgptVectorGraphdbQA:
         ChatOpenAI instance for generating AI responses.
     chat_prompt : ChatPromptTemplate
         Template for creating prompts including system and human messages.
+    encoding : Encoding
+        Tokenizer of the model, used to budget the context and count
+        the prompt tokens.
     """
 
-    def __init__(self, app_config) -> None:
-        """Initializes the ChatgptVectorGraphdbQA."""
+    def __init__(self, app_config, rate_limiter: "RateLimiter" = None) -> None:
+        """Initializes the ChatgptVectorGraphdbQA.
+
+        The optional rate_limiter is shared with the other OpenAI clients
+        of the application, and is waited on before each call."""
         self._logger = logging.getLogger(__name__)
 
         # Validate and set configuration parameters
@@ -54,8 +63,35 @@ class ChatgptVectorGraphdbQA:
 
         os.environ["OPENAI_API_KEY"] = self.parameters.openai_api_key
 
+        import tiktoken
+        from langchain_core.prompts import (
+            ChatPromptTemplate,
+            HumanMessagePromptTemplate,
+            SystemMessagePromptTemplate,
+        )
+        from langchain_openai import ChatOpenAI
+        from shared.services.llm_metrics import LlmMetricsCallbackHandler
+        from shared.services.rate_limiter import RateLimitCallbackHandler
+
         # Initialize ChatOpenAI instance with specified parameters
-        self.chat = ChatOpenAI(temperature=0, model=self.parameters.openai_model)
+        self.chat = ChatOpenAI(
+            temperature=0,
+            model=self.parameters.openai_model,
+            callbacks=(
+                [RateLimitCallbackHandler(rate_limiter)] if rate_limiter else []
+            )
+            + [LlmMetricsCallbackHandler("answer")],
+        )
+
+        try:
+            self.encoding = tiktoken.encoding_for_model(self.parameters.openai_model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+        # The same chunks give the same context : memoize its rendering
+        self._render_context = lru_cache(maxsize=self.parameters.context_cache_size)(
+            self._render_context
+        )
 
         # Construct chat prompt template from system and human messages
         self.chat_prompt = ChatPromptTemplate.from_messages(
@@ -67,8 +103,74 @@ class ChatgptVectorGraphdbQA:
             ]
         )
 
+    def build_context(self, similar_documents: List[Tuple["Document", float]]) -> str:
+        """
+        Build the vector store part of the prompt from the result of a
+        similarity search.
+
+        The chunks are grouped by article (article_id metadata, or their
+        text for the chunks stored without it), the duplicates dropped,
+        and the articles ordered by their best score. The context is then
+        cut to CHATPGPT_VECTOR_GRAPHDB_CONTEXT_MAX_TOKENS tokens.
+
+        Parameters:
+        similar_documents (list): The (Document, score) tuples of the search.
+
+        Returns:
+        str: The context, one paragraph per article.
+        """
+        articles = {}
+        for document, score in similar_documents:
+            article_id = document.metadata.get("article_id", document.page_content)
+            title, best_score, chunks = articles.get(
+                article_id, (document.metadata.get("title"), score, [])
+            )
+            if document.page_content not in chunks:
+                chunks.append(document.page_content)
+            articles[article_id] = (title, max(best_score, score), chunks)
+
+        if not articles:
+            return NO_VECTOR_ANSWER
+
+        return self._render_context(
+            tuple(
+                (title, tuple(chunks))
+                for title, _, chunks in sorted(
+                    articles.values(), key=lambda article: article[1], reverse=True
+                )
+            )
+        )
+
+    def _render_context(self, articles: tuple) -> str:
+        """
+        Render the (title, chunks) of the articles, best first, within
+        the token budget. Memoized in __init__.
+        """
+        budget = self.parameters.context_max_tokens
+        paragraphs = []
+        for title, chunks in articles:
+            paragraph = " ".join(chunks)
+            if title:
+                paragraph = f"{title}: {paragraph}"
+
+            tokens = self.encoding.encode(paragraph)
+            if len(tokens) > budget:
+                paragraphs.append(self.encoding.decode(tokens[:budget]))
+                break
+            paragraphs.append(paragraph)
+            # Count the line break between two paragraphs
+            budget -= len(tokens) + 1
+            if budget <= 0:
+                break
+
+        return "\n".join(paragraphs)
+
     def answer_question(
-        self, question: str, vector_answer: str, graphdb_answer: str
+        self,
+        question: str,
+        vector_answer: str,
+        graphdb_answer: str,
+        on_token: Callable[[str], None] = None,
     ) -> str:
         """
         Answers a given question using ChatGPT, vector representation, and graph database.
@@ -77,6 +179,9 @@ class ChatgptVectorGraphdbQA:
         question (str): The question to be answered.
         vector_answer (str): Answer obtained from vector representation.
         graphdb_answer (str): Answer obtained from the graph database.
+        on_token (Callable[[str], None]): Optional function called with each
+        part of the answer as soon as it is generated. The answer is then
+        streamed from the model.
 
         Returns:
         str: The response generated by the ChatGPT model.
@@ -84,17 +189,40 @@ class ChatgptVectorGraphdbQA:
         Raises:
         RuntimeError: If an error occurs during the question-answering process.
         """
+        messages = self.chat_prompt.format_prompt(
+            question=question,
+            vector_answer=vector_answer,
+            graphdb_answer=graphdb_answer,
+        ).to_messages()
+        prompt_tokens = sum(
+            len(self.encoding.encode(message.content)) for message in messages
+        )
+        QUESTION_PROMPT_TOKENS.observe(prompt_tokens)
+
         try:
-            # Format and invoke the chat with the provided prompts
-            return str(
-                self.chat.invoke(
-                    self.chat_prompt.format_prompt(
-                        question=question,
-                        vector_answer=vector_answer,
-                        graphdb_answer=graphdb_answer,
-                    ).to_messages()
-                )
+            start = time.perf_counter()
+            if on_token is None:
+                answer = self.chat.invoke(messages).content
+            else:
+                chunks = []
+                for chunk in self.chat.stream(messages):
+                    if not chunk.content:
+                        continue
+                    if not chunks:
+                        self._logger.info(
+                            "First token generated in %.2f s.",
+                            time.perf_counter() - start,
+                        )
+                    chunks.append(chunk.content)
+                    on_token(chunk.content)
+                answer = "".join(chunks)
+
+            self._logger.info(
+                "Answer generated in %.2f s from a prompt of %s tokens.",
+                time.perf_counter() - start,
+                prompt_tokens,
             )
+            return answer
         except Exception as e:
             # Log and raise error if invocation fails
             self._logger.error(
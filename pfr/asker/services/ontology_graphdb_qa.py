@@ -1,18 +1,95 @@
 import logging
+import re
 
-from typing import Union
+from typing import TYPE_CHECKING, List, Tuple, Union
 import os
 
-from langchain.chains.graph_qa.prompts import GRAPH_QA_PROMPT
-from langchain_community.graphs import OntotextGraphDBGraph
-from langchain_openai import ChatOpenAI
-
-from langchain.chains import OntotextGraphDBQAChain
-from langchain import PromptTemplate
-
 from pydantic import ValidationError
 
 from shared.models.ontology_graphdb_qa_parameters import OntologyGraphdbQaParameters
+from shared.services.metrics import GRAPHDB_SECONDS
+from shared.services.ttl_lru_cache import TtlLruCache
+from asker.services.ontology_schema_cache import OntologySchemaCache
+
+# LangChain takes seconds to import : it's imported when the service
+# is created
+if TYPE_CHECKING:
+    from langchain_community.graphs import OntotextGraphDBGraph
+    from shared.services.rate_limiter import RateLimiter
+
+# Quoted text, and runs of capitalized words not starting the question
+ENTITY_PATTERN = re.compile(r'"([^"]+)"|(?<!^)\b([A-Z][\w\'-]*(?:\s+[A-Z][\w\'-]*)*)')
+# String literals of a SPARQL query
+SPARQL_LITERAL_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+ENTITY_SLOT = "{{entity_{}}}"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Key of a question in the SPARQL cache : the same question up to the
+    spaces and the final punctuation.
+    """
+    return " ".join(question.split()).rstrip("?!. ")
+
+
+def template_question(question: str) -> Tuple[str, List[str]]:
+    """
+    Replace the entities of a question, the quoted text and the names,
+    with slots.
+
+    Returns:
+    Tuple[str, List[str]]
+        The question with its entities replaced, and the entities.
+    """
+    entities = []
+
+    def to_slot(match: re.Match) -> str:
+        entity = match.group(1) or match.group(2)
+        if entity not in entities:
+            entities.append(entity)
+        return ENTITY_SLOT.format(entities.index(entity))
+
+    template = ENTITY_PATTERN.sub(to_slot, normalize_question(question))
+    return template, entities
+
+
+def template_sparql(sparql: str, entities: List[str]) -> Union[str, None]:
+    """
+    Replace the entities of a question in the string literals of its
+    SPARQL query with slots.
+
+    Returns:
+    Union[str, None]
+        The SPARQL template, or None if an entity is not found in a
+        literal, the query then can't be reused for other entities.
+    """
+    found = set()
+
+    def to_slots(match: re.Match) -> str:
+        literal = match.group(0)
+        # The longest first, an entity can contain another one
+        for index, entity in sorted(
+            enumerate(entities), key=lambda item: len(item[1]), reverse=True
+        ):
+            if entity in literal:
+                literal = literal.replace(entity, ENTITY_SLOT.format(index))
+                found.add(index)
+        return literal
+
+    template = SPARQL_LITERAL_PATTERN.sub(to_slots, sparql)
+    return template if len(found) == len(entities) else None
+
+
+def fill_sparql(template: str, entities: List[str]) -> str:
+    """
+    Put the entities of a question into the slots of a SPARQL template.
+    """
+    for index, entity in enumerate(entities):
+        escaped = (
+            entity.replace("\\", "\\\\").replace('"', '\\"').replace("'", "\\'")
+        )
+        template = template.replace(ENTITY_SLOT.format(index), escaped)
+    return template
 
 
 class OntologyGraphdbQA:
@@ -24,17 +101,30 @@ class OntologyGraphdbQA:
         The logger for this service.
     graph: OntotextGraphDBGraph
         Graph database representing the ontology.
+    schema_cache: OntologySchemaCache
+        Snapshot of the ontology schema, refreshed in the background.
     chain: OntotextGraphDBQAChain
-        QA chain for answering questions based on the ontology.
+        QA chain for answering questions based on the ontology. Its steps
+        are run one by one, to cache the SPARQL queries and their results.
+    sparql_cache: TtlLruCache
+        Generated SPARQL queries by normalized question.
+    template_cache: TtlLruCache
+        SPARQL templates by question template, when
+        LANGCHAIN_GRAPHDB_SPARQL_TEMPLATES is enabled.
+    result_cache: TtlLruCache
+        Results of the SPARQL queries, kept a short time.
     """
 
-    def __init__(self, app_config: dict) -> None:
+    def __init__(self, app_config: dict, rate_limiter: "RateLimiter" = None) -> None:
         """
         Initialize the OntologyQA service.
 
         Parameters:
         config: dict
             Configuration parameters for the service.
+        rate_limiter: RateLimiter
+            Optional limiter shared with the other OpenAI clients, waited
+            on before each call of the chain's model.
         """
         self._logger = logging.getLogger(__name__)
 
@@ -59,13 +149,17 @@ class OntologyGraphdbQA:
         os.environ["GRAPHDB_USERNAME"] = self.parameters.graphdb_user
         os.environ["GRAPHDB_PASSWORD"] = self.parameters.graphdb_pwd
 
+        from langchain.chains import OntotextGraphDBQAChain
+        from langchain_core.prompts import PromptTemplate
+        from langchain_openai import ChatOpenAI
+        from shared.services.llm_metrics import LlmMetricsCallbackHandler
+        from shared.services.rate_limiter import RateLimitCallbackHandler
+
+        # The graph representing the ontology, from the schema snapshot
+        self.schema_cache = OntologySchemaCache(app_config)
         try:
-            # Create a graph representing the ontology
-            self.graph = OntotextGraphDBGraph(
-                query_endpoint=f"http://{self.parameters.graphdb_host}:{self.parameters.graphdb_port}{self.parameters.graphdb_url_end}",
-                query_ontology=self.parameters.graphdb_query_ontology,
-            )
-        except Exception as e:
+            self.graph = self.schema_cache.load()
+        except RuntimeError as e:
             self._logger.critical(
                 "An error occurred while creating OntotextGraphDBGraph %s",
                 e,
@@ -76,7 +170,14 @@ class OntologyGraphdbQA:
         try:
             # Create a QA chain for question answering
             self.chain = OntotextGraphDBQAChain.from_llm(
-                ChatOpenAI(temperature=0, model=self.parameters.openai_model),
+                ChatOpenAI(
+                    temperature=0,
+                    model=self.parameters.openai_model,
+                    callbacks=(
+                        [RateLimitCallbackHandler(rate_limiter)] if rate_limiter else []
+                    )
+                    + [LlmMetricsCallbackHandler("ontology")],
+                ),
                 graph=self.graph,
                 verbose=True,
                 qa_prompt=PromptTemplate(
@@ -94,6 +195,19 @@ class OntologyGraphdbQA:
                 "OntotextGraphDBQAChain.from_llm was not able to be created"
             )
 
+        self.sparql_cache = TtlLruCache(
+            self.parameters.sparql_cache_size, self.parameters.sparql_cache_ttl_s
+        )
+        self.template_cache = TtlLruCache(
+            self.parameters.sparql_cache_size if self.parameters.sparql_templates else 0,
+            self.parameters.sparql_cache_ttl_s,
+        )
+        self.result_cache = TtlLruCache(
+            self.parameters.result_cache_size, self.parameters.result_cache_ttl_s
+        )
+
+        self.schema_cache.start(self._on_schema_change)
+
     def answer_question(self, question: str) -> str:
         """
         Answer a question based on the ontology.
@@ -107,12 +221,13 @@ class OntologyGraphdbQA:
             The answer to the question, or None if an error occurs.
         """
         try:
-            # Invoke the QA chain to answer the question
-            return self.chain.invoke(
-                {
-                    self.chain.input_key: question,
-                }
-            )[self.chain.output_key]
+            sparql = self.generate_sparql(question)
+            query_results = self.query(sparql)
+
+            qa_chain = self.chain.qa_chain
+            return qa_chain.invoke({"prompt": question, "context": query_results})[
+                qa_chain.output_key
+            ]
         except Exception as e:
             self._logger.error(
                 "An error occurred while invoking the query chain for graphdb %s",
@@ -120,3 +235,124 @@ class OntologyGraphdbQA:
                 exc_info=True,
             )
             raise RuntimeError
+
+    def generate_sparql(self, question: str) -> str:
+        """
+        Generate the SPARQL query of a question, from the caches when the
+        same question, or a question of the same template, was asked before.
+
+        Parameters:
+        question: str
+            The question to be answered.
+
+        Returns:
+        str
+            The validated SPARQL query.
+        """
+        key = normalize_question(question)
+        sparql = self.sparql_cache.get(key)
+        if sparql is not None:
+            self._logger.info("SPARQL query of the question found in cache.")
+            return sparql
+
+        template, entities = None, []
+        if self.template_cache.enabled:
+            template, entities = template_question(question)
+            sparql_template = self.template_cache.get(template) if entities else None
+            if sparql_template is not None:
+                self._logger.info("SPARQL template of the question found in cache.")
+                sparql = fill_sparql(sparql_template, entities)
+                self.sparql_cache.put(key, sparql)
+                return sparql
+
+        # Same steps as the chain : generate, then validate and fix the query
+        schema = self.graph.get_schema
+        generation_chain = self.chain.sparql_generation_chain
+        sparql = generation_chain.invoke({"prompt": question, "schema": schema})[
+            generation_chain.output_key
+        ]
+        sparql = self.prepare_sparql(sparql, schema)
+
+        self.sparql_cache.put(key, sparql)
+        if entities:
+            sparql_template = template_sparql(sparql, entities)
+            if sparql_template is not None:
+                self.template_cache.put(template, sparql_template)
+        return sparql
+
+    def prepare_sparql(self, sparql: str, schema: str) -> str:
+        """
+        Validate a generated SPARQL query, and have the chain's fix chain
+        correct it up to max_fix_retries times when it can't be parsed.
+        Same steps as the chain, which only runs them in its private
+        methods.
+
+        Parameters:
+        sparql: str
+            The generated SPARQL query.
+        schema: str
+            The ontology schema the query was generated from.
+
+        Returns:
+        str
+            The validated SPARQL query.
+
+        Raises:
+        ValueError
+            If the query is still invalid after the retries.
+        """
+        from rdflib.plugins.sparql import prepareQuery
+
+        for retry in range(self.chain.max_fix_retries + 1):
+            if retry:
+                fix_chain = self.chain.sparql_fix_chain
+                sparql = fix_chain.invoke(
+                    {
+                        "error_message": error_message,
+                        "generated_sparql": sparql,
+                        "schema": schema,
+                    }
+                )[fix_chain.output_key]
+            try:
+                prepareQuery(sparql)
+                return sparql
+            except Exception as e:
+                error_message = str(e)
+                self._logger.warning(
+                    "Invalid SPARQL query generated: %s\n%s", error_message, sparql
+                )
+        raise ValueError("The generated SPARQL query is invalid.")
+
+    def query(self, sparql: str) -> list:
+        """
+        Run a SPARQL query on GraphDB, or return its results if it was
+        run less than LANGCHAIN_GRAPHDB_RESULT_CACHE_TTL_S ago.
+
+        Parameters:
+        sparql: str
+            The SPARQL query.
+
+        Returns:
+        list
+            The result rows of the query.
+        """
+        query_results = self.result_cache.get(sparql)
+        if query_results is not None:
+            self._logger.info("SPARQL query results found in cache.")
+            return query_results
+
+        with GRAPHDB_SECONDS.labels("qa_query").time():
+            query_results = self.graph.query(sparql)
+        self.result_cache.put(sparql, query_results)
+        return query_results
+
+    def _on_schema_change(self, graph: "OntotextGraphDBGraph") -> None:
+        """
+        Use the graph of the new ontology schema. The cached queries were
+        generated for the previous one and are dropped.
+        """
+        self.graph = graph
+        self.chain.graph = graph
+        self.sparql_cache.clear()
+        self.template_cache.clear()
+        self.result_cache.clear()
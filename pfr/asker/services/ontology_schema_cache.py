@@ -0,0 +1,292 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Union
+
+from pydantic import ValidationError
+
+from shared.models.ontology_graphdb_qa_parameters import OntologyGraphdbQaParameters
+from shared.services.metrics import GRAPHDB_SECONDS
+
+# LangChain takes seconds to import : it's imported when the graph is built
+if TYPE_CHECKING:
+    from langchain_community.graphs import OntotextGraphDBGraph
+
+# Format of the schema snapshot, the one of the schema given to the LLM
+SCHEMA_FORMAT = "turtle"
+
+
+@functools.lru_cache(maxsize=None)
+def snapshot_graph_class() -> type:
+    """
+    Get the OntotextGraphDBGraph built from a snapshot without reaching
+    GraphDB : the class checks the endpoint answers before loading the
+    local file. The queries reach it later, or fail on their own.
+    """
+    from langchain_community.graphs import OntotextGraphDBGraph
+
+    class SnapshotOntotextGraphDBGraph(OntotextGraphDBGraph):
+        def _check_connectivity(self) -> None:
+            pass
+
+    return SnapshotOntotextGraphDBGraph
+
+
+class OntologySchemaCache:
+    """
+    A snapshot of the ontology schema kept in a local file, so the asker
+    starts without querying GraphDB, refreshed in the background.
+
+    Note
+    ----
+    The schema is the result of LANGCHAIN_GRAPHDB_QUERY_ONTOLOGY, serialized
+    in turtle into LANGCHAIN_GRAPHDB_SCHEMA_CACHE_PATH. Its version, the
+    SHA-256 of the snapshot, and the query are kept in a .json file next to
+    it : a snapshot of another query, or not matching its version, is
+    ignored. Every LANGCHAIN_GRAPHDB_SCHEMA_REFRESH_S seconds a thread
+    queries the schema again, and when its version changed, saves it and
+    gives the new graph to a callback.
+
+    Attributes:
+    _logger : Logger
+        The logger instance for the service.
+    parameters : OntologyGraphdbQaParameters
+        Configuration parameters for the ontology.
+    version : str
+        The version of the current schema.
+    refreshed_at : float
+        The timestamp of the last query of the schema.
+    """
+
+    def __init__(self, app_config: dict) -> None:
+        """Initializes the OntologySchemaCache."""
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the service is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = OntologyGraphdbQaParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the schema cache's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self.version = None
+        self.refreshed_at = 0.0
+        self._stop = threading.Event()
+        self._refresher = None
+
+    @property
+    def query_endpoint(self) -> str:
+        return (
+            f"http://{self.parameters.graphdb_host}:{self.parameters.graphdb_port}"
+            f"{self.parameters.graphdb_url_end}"
+        )
+
+    @property
+    def metadata_path(self) -> str:
+        return f"{self.parameters.schema_cache_path}.json"
+
+    def load(self) -> "OntotextGraphDBGraph":
+        """
+        Build the graph from the snapshot, or from GraphDB when there is
+        no valid snapshot, then save it.
+
+        Returns:
+        OntotextGraphDBGraph
+            The graph of the ontology.
+
+        Raises:
+        RuntimeError
+            If the graph could not be built.
+        """
+        if self.parameters.schema_cache_path and self._is_valid_snapshot():
+            try:
+                graph = snapshot_graph_class()(
+                    query_endpoint=self.query_endpoint,
+                    local_file=self.parameters.schema_cache_path,
+                    local_file_format=SCHEMA_FORMAT,
+                )
+                self._logger.info(
+                    "Ontology schema %s loaded from %s.",
+                    self.version,
+                    self.parameters.schema_cache_path,
+                )
+                return graph
+            except Exception as e:
+                self._logger.error(
+                    "Failed to load the ontology schema from %s, querying it : %s.",
+                    self.parameters.schema_cache_path,
+                    e,
+                )
+
+        graph = self._query_graph()
+        self.version = self._version(graph.get_schema)
+        self._save(graph.get_schema)
+        return graph
+
+    def refresh(self) -> Union["OntotextGraphDBGraph", None]:
+        """
+        Query the schema again.
+
+        Returns:
+        Union[OntotextGraphDBGraph, None]
+            The new graph if the schema changed, else None.
+
+        Raises:
+        RuntimeError
+            If the graph could not be built.
+        """
+        graph = self._query_graph()
+        version = self._version(graph.get_schema)
+        if version == self.version:
+            self._save_metadata()
+            return None
+
+        self._logger.info(
+            "Ontology schema changed from %s to %s.", self.version, version
+        )
+        self.version = version
+        self._save(graph.get_schema)
+        return graph
+
+    def start(self, on_change: Callable[["OntotextGraphDBGraph"], None]) -> None:
+        """
+        Start the refresh thread, calling on_change with the new graph
+        when the schema changed. Does nothing if the refresh is disabled.
+        """
+        if not self.parameters.schema_refresh_s or self._refresher is not None:
+            return
+
+        self._refresher = threading.Thread(
+            target=self._refresh_loop,
+            args=(on_change,),
+            name="ontology-schema-refresh",
+            daemon=True,
+        )
+        self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _refresh_loop(self, on_change: Callable[["OntotextGraphDBGraph"], None]) -> None:
+        # A snapshot older than the period is refreshed right away
+        while not self._stop.wait(
+            max(0, self.refreshed_at + self.parameters.schema_refresh_s - time.time())
+        ):
+            try:
+                graph = self.refresh()
+            except RuntimeError:
+                # Retry at the next period with the current schema
+                self.refreshed_at = time.time()
+                continue
+
+            if graph is not None:
+                on_change(graph)
+
+    def _query_graph(self) -> "OntotextGraphDBGraph":
+        from langchain_community.graphs import OntotextGraphDBGraph
+
+        try:
+            with GRAPHDB_SECONDS.labels("schema").time():
+                graph = OntotextGraphDBGraph(
+                    query_endpoint=self.query_endpoint,
+                    query_ontology=self.parameters.graphdb_query_ontology,
+                )
+        except Exception as e:
+            self._logger.error(
+                "An error occurred while querying the ontology schema %s",
+                e,
+                exc_info=True,
+            )
+            raise RuntimeError("Fail Query Ontology Schema") from e
+
+        self.refreshed_at = time.time()
+        return graph
+
+    def _is_valid_snapshot(self) -> bool:
+        """
+        Check the snapshot is the result of the configured query and
+        matches its version.
+        """
+        try:
+            with open(self.metadata_path, encoding="utf-8") as file:
+                metadata = json.load(file)
+            with open(self.parameters.schema_cache_path, encoding="utf-8") as file:
+                version = self._version(file.read())
+        except (OSError, ValueError):
+            return False
+
+        if (
+            metadata.get("query") != self.parameters.graphdb_query_ontology
+            or metadata.get("version") != version
+        ):
+            self._logger.info("Ontology schema snapshot outdated, ignored.")
+            return False
+
+        self.version = version
+        self.refreshed_at = float(metadata.get("refreshed_at", 0))
+        return True
+
+    def _save(self, schema: str) -> None:
+        """
+        Write the snapshot in a temporary file then replace the previous one.
+        """
+        if not self.parameters.schema_cache_path:
+            return
+
+        try:
+            directory = os.path.dirname(self.parameters.schema_cache_path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            temporary_path = f"{self.parameters.schema_cache_path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(schema)
+            os.replace(temporary_path, self.parameters.schema_cache_path)
+        except OSError as e:
+            self._logger.error(
+                "Failed to save the ontology schema in %s : %s.",
+                self.parameters.schema_cache_path,
+                e,
+            )
+            return
+
+        self._save_metadata()
+
+    def _save_metadata(self) -> None:
+        if not self.parameters.schema_cache_path:
+            return
+
+        try:
+            temporary_path = f"{self.metadata_path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        "version": self.version,
+                        "query": self.parameters.graphdb_query_ontology,
+                        "refreshed_at": self.refreshed_at,
+                    },
+                    file,
+                )
+            os.replace(temporary_path, self.metadata_path)
+        except OSError as e:
+            self._logger.error(
+                "Failed to save the ontology schema metadata in %s : %s.",
+                self.metadata_path,
+                e,
+            )
+
+    @staticmethod
+    def _version(schema: str) -> str:
+        return hashlib.sha256(schema.encode("utf-8")).hexdigest()
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Tuple
+
+from pydantic import ValidationError
+
+from shared.models.parallel_retriever_parameters import ParallelRetrieverParameters
+from shared.services.metrics import RETRIEVAL_BRANCHES_IN_FLIGHT
+
+# Answer given to ChatGPT when the ontology branch failed
+NO_GRAPHDB_ANSWER = "No information could be retrieved from the knowledge graph."
+
+BRANCHES = ("vector", "ontology")
+
+
+class ParallelRetriever:
+    """
+    Run the two retrieval branches of a question concurrently : the
+    similarity search in the vector store and the ontology question
+    answering on GraphDB.
+
+    Note
+    ----
+    Each branch has its own timeout, counted from the start of the
+    retrieval. When a branch fails or times out, the answer of the other
+    branch is used alone. A timed out branch can not be interrupted : it
+    keeps its worker until it ends, and its result is dropped.
+
+    Each branch has its own pool of ASKER_CONCURRENCY workers, so a slow
+    GraphDB never delays the similarity searches. A branch with no free
+    worker, all of them held by calls still running, is skipped at once
+    instead of being queued : the abandoned calls are bounded by the
+    pool, and the questions fall back on the other branch until they end.
+    The running calls of each branch are in in_flight.
+
+    Attributes:
+    _logger : Logger
+        The logger instance for the service.
+    parameters : ParallelRetrieverParameters
+        The timeouts of the branches, and the number of questions
+        retrieved concurrently : the pool of each branch has one worker
+        per question.
+    vector_store
+        The vector store, searched with similarity_search_with_score.
+    ontology_qa : OntologyGraphdbQA
+        The ontology question answering service.
+    """
+
+    def __init__(self, app_config: dict, vector_store, ontology_qa) -> None:
+        """Initializes the ParallelRetriever."""
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the service is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = ParallelRetrieverParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the retriever's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self.vector_store = vector_store
+        self.ontology_qa = ontology_qa
+        self._executors = {
+            name: ThreadPoolExecutor(
+                max_workers=self.parameters.concurrency,
+                thread_name_prefix=f"retrieval-{name}",
+            )
+            for name in BRANCHES
+        }
+        self._in_flight = {name: 0 for name in BRANCHES}
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> dict:
+        """The calls of each branch still running, abandoned ones included."""
+        with self._in_flight_lock:
+            return dict(self._in_flight)
+
+    def retrieve(self, question: str) -> Tuple[list, str, bool]:
+        """
+        Retrieve the information needed to answer a question.
+
+        Parameters:
+        question (str): The question to be answered.
+
+        Returns:
+        (list, str, bool): The (Document, score) tuples of the similarity
+        search, empty if the branch failed, the answer of the ontology,
+        NO_GRAPHDB_ANSWER if the branch failed, and whether a branch
+        failed : the answer built from them is then degraded.
+
+        Raises:
+        RuntimeError: If both branches failed.
+        """
+        start = time.perf_counter()
+
+        vector_future = self._submit(
+            "vector", self.vector_store.similarity_search_with_score, question
+        )
+        ontology_future = self._submit(
+            "ontology", self.ontology_qa.answer_question, question
+        )
+
+        vector_answer, vector_ok = self._branch_result(
+            "vector", vector_future, self.parameters.vector_timeout_s, start
+        )
+        graphdb_answer, ontology_ok = self._branch_result(
+            "ontology", ontology_future, self.parameters.ontology_timeout_s, start
+        )
+
+        if not vector_ok and not ontology_ok:
+            raise RuntimeError("Both retrieval branches failed")
+
+        self._logger.info(
+            "Retrieval done in %.2f s (vector: %s, ontology: %s).",
+            time.perf_counter() - start,
+            "ok" if vector_ok else "failed",
+            "ok" if ontology_ok else "failed",
+        )
+
+        return (
+            vector_answer if vector_ok else [],
+            graphdb_answer if ontology_ok else NO_GRAPHDB_ANSWER,
+            not (vector_ok and ontology_ok),
+        )
+
+    def _submit(self, name: str, function: Callable, question: str):
+        """
+        Run a branch in its pool, or return None if every worker of the
+        pool is still running a call.
+        """
+        with self._in_flight_lock:
+            if self._in_flight[name] >= self.parameters.concurrency:
+                return None
+            self._in_flight[name] += 1
+        RETRIEVAL_BRANCHES_IN_FLIGHT.labels(name).inc()
+
+        return self._executors[name].submit(self._timed_branch, name, function, question)
+
+    def _timed_branch(self, name: str, function: Callable, question: str) -> Any:
+        """
+        Run a branch and log its duration, even if its result is dropped.
+        """
+        start = time.perf_counter()
+        try:
+            return function(question)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight[name] -= 1
+            RETRIEVAL_BRANCHES_IN_FLIGHT.labels(name).dec()
+            self._logger.info(
+                "Retrieval branch '%s' ran in %.2f s.", name, time.perf_counter() - start
+            )
+
+    def _branch_result(
+        self, name: str, future, timeout_s: float, start: float
+    ) -> Tuple[Any, bool]:
+        """
+        Wait for a branch until its timeout.
+
+        Returns:
+        (Any, bool): The result of the branch and if it succeeded.
+        """
+        if future is None:
+            self._logger.warning(
+                "Retrieval branch '%s' skipped, its %s workers are still running "
+                "previous calls, falling back on the other branch.",
+                name,
+                self.parameters.concurrency,
+            )
+            return None, False
+
+        remaining_s = max(0.0, timeout_s - (time.perf_counter() - start))
+        try:
+            return future.result(timeout=remaining_s), True
+        except FutureTimeoutError:
+            self._logger.warning(
+                "Retrieval branch '%s' timed out after %s s (%s calls running), "
+                "falling back on the other branch.",
+                name,
+                timeout_s,
+                self.in_flight[name],
+            )
+        except Exception as e:
+            self._logger.error(
+                "Retrieval branch '%s' failed, falling back on the other branch: %s",
+                name,
+                e,
+                exc_info=True,
+            )
+        return None, False
@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple, Union
+
+import numpy as np
+from pydantic import ValidationError
+
+from shared.models.semantic_answer_cache_parameters import (
+    SemanticAnswerCacheParameters,
+)
+
+
+class SemanticAnswerCache:
+    """
+    A cache of the answers looked up by the meaning of the questions, so
+    a question asked again with other words is answered without the LLM.
+
+    Note
+    ----
+    The questions are embedded and kept with their answer. A question is
+    answered from the cache when the cosine similarity with a cached
+    question is above SEMANTIC_CACHE_THRESHOLD. The index is an exact
+    search over a normalized matrix, which is fast enough for the bounded
+    size of the cache. The least recently used entries are evicted above
+    SEMANTIC_CACHE_MAX_SIZE. The entries are kept with the answer cache
+    epoch they were computed in, and are dropped when the epoch changes.
+    The index is saved to SEMANTIC_CACHE_PATH to survive restarts.
+
+    Attributes:
+    _logger : Logger
+        The logger instance for the service.
+    parameters : SemanticAnswerCacheParameters
+        Configuration parameters for the cache.
+    embedder
+        Any object with an embed_query(text) -> list[float] method.
+    """
+
+    def __init__(self, app_config: dict, embedder) -> None:
+        """Initializes the SemanticAnswerCache."""
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the service is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        if not callable(getattr(embedder, "embed_query", None)):
+            self._logger.critical(
+                msg="The embedder given to the service has no embed_query method."
+            )
+            raise RuntimeError("Bad Embedder Type")
+
+        try:
+            self.parameters = SemanticAnswerCacheParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the semantic cache's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self.embedder = embedder
+
+        self._lock = threading.Lock()
+        # question -> (vector, answer), ordered from the least recently used
+        self._entries = OrderedDict()
+        self._epoch = None
+        self._matrix = None
+        self._questions = []
+        self._unsaved = 0
+
+        if self.enabled and self.parameters.path and os.path.isfile(self.parameters.path):
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.parameters.max_size > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def embed(self, question: str) -> np.ndarray:
+        """
+        Embed a question into a normalized vector.
+        """
+        vector = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, question: str, epoch: int
+    ) -> Tuple[Union[str, None], Union[np.ndarray, None]]:
+        """
+        Look for the answer of a similar question.
+
+        Parameters:
+        question (str): The question asked.
+        epoch (int): The current answer cache epoch.
+
+        Returns:
+        (str | None, ndarray | None): The cached answer, None on a miss,
+        and the question vector to give back to add.
+
+        Raises:
+        RuntimeError: If the question could not be embedded.
+        """
+        if not self.enabled:
+            return None, None
+
+        try:
+            vector = self.embed(question)
+        except Exception as e:
+            self._logger.error(
+                "An error occurred while embedding a question: %s", e, exc_info=True
+            )
+            raise RuntimeError("Question Embedding Error") from e
+
+        with self._lock:
+            self._check_epoch(epoch)
+
+            answer = None
+            if len(self._entries) > 0:
+                if self._matrix is None:
+                    self._questions = list(self._entries.keys())
+                    self._matrix = np.stack(
+                        [entry[0] for entry in self._entries.values()]
+                    )
+
+                scores = self._matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.parameters.threshold:
+                    best_question = self._questions[best]
+                    answer = self._entries[best_question][1]
+                    self._entries.move_to_end(best_question)
+                    self._logger.info(
+                        "Semantic cache hit (similarity %.3f) with the question '%s'.",
+                        scores[best],
+                        best_question,
+                    )
+
+        return answer, vector
+
+    def add(self, question: str, vector: np.ndarray, answer: str, epoch: int) -> None:
+        """
+        Keep the answer of a question, evicting the least recently used
+        entries above the size bound.
+
+        Parameters:
+        question (str): The question asked.
+        vector (ndarray): The vector returned by lookup.
+        answer (str): The answer given.
+        epoch (int): The answer cache epoch given to lookup.
+        """
+        if not self.enabled or vector is None:
+            return
+
+        with self._lock:
+            # Answer computed before new articles were ingested
+            if epoch != self._epoch:
+                return
+
+            self._entries[question] = (vector, answer)
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.parameters.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+            self._unsaved += 1
+            if self._unsaved >= self.parameters.save_every:
+                self._save()
+
+    def save(self) -> None:
+        """
+        Save the index to SEMANTIC_CACHE_PATH, with the questions added
+        since the last periodic save. Called when the asker stops.
+        """
+        with self._lock:
+            self._save()
+
+    def _check_epoch(self, epoch: int) -> None:
+        """
+        Drop every entry when the answer cache epoch changed.
+        The caller must hold the lock.
+        """
+        if epoch != self._epoch:
+            if len(self._entries) > 0:
+                self._logger.info("New articles ingested : semantic cache cleared.")
+            self._entries.clear()
+            self._matrix = None
+            self._epoch = epoch
+
+    def _save(self) -> None:
+        """
+        Write the index in a temporary file then replace the previous one.
+        The caller must hold the lock.
+        """
+        self._unsaved = 0
+        if not self.parameters.path or len(self._entries) == 0:
+            return
+
+        try:
+            directory = os.path.dirname(self.parameters.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            temporary_path = f"{self.parameters.path}.tmp"
+            with open(temporary_path, "wb") as file:
+                np.savez(
+                    file,
+                    epoch=np.array(self._epoch),
+                    questions=np.array(list(self._entries.keys())),
+                    answers=np.array([entry[1] for entry in self._entries.values()]),
+                    vectors=np.stack([entry[0] for entry in self._entries.values()]),
+                )
+            os.replace(temporary_path, self.parameters.path)
+        except OSError as e:
+            self._logger.error(
+                "Failed to save the semantic cache in %s : %s.",
+                self.parameters.path,
+                e,
+            )
+
+    def _load(self) -> None:
+        """
+        Load the index saved by a previous run.
+        """
+        try:
+            with np.load(self.parameters.path, allow_pickle=False) as data:
+                self._epoch = int(data["epoch"])
+                for question, answer, vector in zip(
+                    data["questions"], data["answers"], data["vectors"]
+                ):
+                    self._entries[str(question)] = (vector, str(answer))
+        except (OSError, KeyError, ValueError) as e:
+            self._logger.error(
+                "Failed to load the semantic cache from %s, starting empty : %s.",
+                self.parameters.path,
+                e,
+            )
+            self._entries.clear()
+            self._epoch = None
+            return
+
+        while len(self._entries) > self.parameters.max_size:
+            self._entries.popitem(last=False)
+        self._logger.info("Semantic cache loaded with %s questions.", len(self._entries))
@@ -0,0 +1,4 @@
+"""
+Benchmarks of the application services. They are run from the pfr
+folder against the databases of the application configuration.
+"""
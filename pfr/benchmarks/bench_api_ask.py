@@ -0,0 +1,92 @@
+"""
+Load test of the /ask endpoints of a running API.
+
+Concurrent clients post questions then read their state, and the
+throughput and latency percentiles of each endpoint are printed. Run
+it against the same API before and after a change to compare them, e.g.
+with the synchronous Redis client of the previous versions and the
+asyncio one. The posted questions are pushed to the asker queue : run it
+against a test Redis, or with the askers stopped and the
+api_ask_question list deleted afterwards. Every client comes from the
+same address : disable the admission limits of the tested API
+(ASK_QUEUE_MAX_LENGTH=0, ASK_CLIENT_RATE_PER_MINUTE=0), or the 429
+answers are counted as errors.
+
+Usage (from the pfr folder, the API running) :
+    python -m benchmarks.bench_api_ask --url http://localhost:8000 --clients 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(latencies: list, rank: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(rank * len(latencies)))]
+
+
+async def client(
+    http: httpx.AsyncClient, requests: int, post_latencies: list, get_latencies: list
+) -> int:
+    """
+    Post questions and read them back, one after the other.
+
+    Returns the number of failed requests.
+    """
+    errors = 0
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await http.post(
+            "/ask/", json={"content": f"Load test question number {i}"}
+        )
+        post_latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors += 1
+            continue
+
+        start = time.perf_counter()
+        response = await http.get(
+            "/ask/<token>", params={"token": response.json()["token"]}
+        )
+        get_latencies.append(time.perf_counter() - start)
+        errors += response.status_code != 200
+    return errors
+
+
+async def main(url: str, clients: int, requests: int) -> None:
+    post_latencies, get_latencies = [], []
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        start = time.perf_counter()
+        errors = await asyncio.gather(
+            *(
+                client(http, requests, post_latencies, get_latencies)
+                for _ in range(clients)
+            )
+        )
+        duration = time.perf_counter() - start
+
+    total = len(post_latencies) + len(get_latencies)
+    print(f"clients    : {clients}")
+    print(f"requests   : {total} in {duration:.2f} s, {sum(errors)} errors")
+    print(f"throughput : {total / duration:.1f} requests/s")
+    for name, latencies in (("POST /ask/", post_latencies), ("GET /ask/", get_latencies)):
+        if latencies:
+            print(
+                f"{name:<10} : p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000", help="API URL")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=100, help="Questions per client")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.url, args.clients, args.requests))
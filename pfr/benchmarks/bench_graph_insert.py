@@ -0,0 +1,88 @@
+"""
+Benchmark of the knowledge graph loading paths.
+
+Compare the online path (ArticleRepository.insert_article, one SPARQL
+INSERT DATA request per group of triples) with the bulk path
+(NTriplesBulkLoader, gzip N-Triples files uploaded to GraphDB) on
+synthetic articles. The GraphDB of the updater configuration is used.
+The articles are written in a dedicated graph, cleared at the end.
+
+Usage (from the pfr folder) :
+    python -m benchmarks.bench_graph_insert --count 1000
+"""
+import argparse
+import datetime
+import tempfile
+import time
+
+from shared.models.article import Article
+from shared.services.get_config import get_config
+from shared.services.graphdb_client import GraphDBClient
+from updater.repositories.articles_repository import ArticleRepository
+from updater.services.ntriples_bulk_loader import NTriplesBulkLoader
+
+BENCH_GRAPH = "pfr:bench"
+
+
+def make_articles(count: int, prefix: str) -> list:
+    """
+    Build synthetic articles shaped like the arXiv records.
+    """
+    return [
+        Article(
+            id=f"oai:bench:{prefix}.{i}",
+            dates=["2024-01-01", "2024-02-01"],
+            modified_at=datetime.datetime(2024, 2, 1),
+            title=f"Benchmark article {i}",
+            creators=[f"Family{i % 97}, Given{i % 89}", f"Family{i % 53}, Given{i % 31}"],
+            subjects=["Computer Science - Databases", f"Subject {i % 20}"],
+            description="A synthetic abstract.",
+        )
+        for i in range(count)
+    ]
+
+
+def bench_online(repository: ArticleRepository, articles: list) -> float:
+    start = time.perf_counter()
+    for article in articles:
+        repository.insert_article(article)
+    return time.perf_counter() - start
+
+
+def bench_bulk(config: dict, repository: ArticleRepository, articles: list) -> float:
+    with tempfile.TemporaryDirectory() as path:
+        loader = NTriplesBulkLoader(
+            {
+                **config,
+                "BULK_PATH": path,
+                "BULK_SUBMIT": True,
+                "BULK_KEEP_FILES": False,
+            },
+            repository,
+        )
+        start = time.perf_counter()
+        for article in articles:
+            loader.add_article(article)
+        loader.flush()
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=1000, help="Number of articles")
+    args = parser.parse_args()
+
+    config = get_config("updater")
+    graphdb_client = GraphDBClient(config)
+    repository = ArticleRepository(graphdb_client, graph=BENCH_GRAPH)
+
+    try:
+        online_time = bench_online(repository, make_articles(args.count, "online"))
+        bulk_time = bench_bulk(config, repository, make_articles(args.count, "bulk"))
+    finally:
+        graphdb_client.request_update(data=f"CLEAR SILENT GRAPH <{BENCH_GRAPH}>")
+
+    print(f"articles : {args.count}")
+    print(f"online   : {online_time:.2f} s ({args.count / online_time:.1f} articles/s)")
+    print(f"bulk     : {bulk_time:.2f} s ({args.count / bulk_time:.1f} articles/s)")
+    print(f"speed-up : x{online_time / bulk_time:.1f}")
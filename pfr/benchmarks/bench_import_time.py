@@ -0,0 +1,125 @@
+"""
+Import time of the modules loaded at the start of the applications.
+
+Each module is imported in a new interpreter with python -X importtime,
+several times, and the median of its cumulative import time is compared
+to its budget in benchmarks/import_time_budget.json, multiplied by the
+tolerance of the file for the noise of the measures. The heaviest imports
+are printed, to find what to defer. The exit status is 1 when a module
+is over its budget or has none (null), so it can run in the CI. Use
+--update on the image of the applications to write the measured times
+as the new budgets.
+
+Usage (from the pfr folder) :
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "import_time_budget.json")
+
+# Written before the import, to skip the imports of the interpreter start
+START_MARKER = "bench_import_time: start"
+
+
+def measure(module: str) -> tuple:
+    """
+    Import a module in a new interpreter.
+
+    Returns the cumulative import time in ms, and the self time in ms
+    of each imported package.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys; sys.stderr.write('{START_MARKER}\\n'); import {module}",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {module} :\n{result.stderr}")
+
+    lines = result.stderr.splitlines()
+    lines = lines[lines.index(START_MARKER) + 1 :]
+
+    total_us = 0
+    self_us = {}
+    for line in lines:
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        self_us[name.strip()] = int(self_time)
+        # The imports run by the statement itself, not by another module
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+
+    return total_us / 1000, {name: us / 1000 for name, us in self_us.items()}
+
+
+def main(repeat: int, top: int, update: bool) -> int:
+    with open(BUDGET_PATH, encoding="utf-8") as file:
+        budget_file = json.load(file)
+    tolerance = budget_file["tolerance"]
+    budgets = budget_file["budgets_ms"]
+
+    failures = 0
+    for module, budget_ms in budgets.items():
+        totals = []
+        self_ms = defaultdict(list)
+        for _ in range(repeat):
+            total_ms, packages = measure(module)
+            totals.append(total_ms)
+            for name, ms in packages.items():
+                self_ms[name].append(ms)
+
+        median_ms = statistics.median(totals)
+        if budget_ms is None:
+            status = "  NO BUDGET"
+        elif median_ms > budget_ms * tolerance:
+            status = "  OVER BUDGET"
+        else:
+            status = ""
+        failures += status != ""
+        print(
+            f"{module:<45} {median_ms:>8.1f} ms / "
+            f"{'-' if budget_ms is None else budget_ms:>6} ms x {tolerance}{status}"
+        )
+        heaviest = sorted(
+            ((statistics.median(ms), name) for name, ms in self_ms.items()),
+            reverse=True,
+        )[:top]
+        for ms, name in heaviest:
+            print(f"    {ms:>8.1f} ms  {name}")
+
+        if update:
+            budgets[module] = int(median_ms) + 1
+
+    if update:
+        with open(BUDGET_PATH, "w", encoding="utf-8") as file:
+            json.dump(budget_file, file, indent=4)
+            file.write("\n")
+        print(f"Budgets written in {BUDGET_PATH}.")
+        return 0
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Imports per module")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports printed")
+    parser.add_argument(
+        "--update", action="store_true", help="Write the measured times as budgets"
+    )
+    args = parser.parse_args()
+
+    sys.exit(main(args.repeat, args.top, args.update))
@@ -0,0 +1,112 @@
+"""
+Benchmark of the semantic answer cache of the asker.
+
+A deterministic hashing embedder replaces OpenAI, so the benchmark runs
+offline and gives the same results on every run. It measures the lookup
+latency for a growing cache size, and the hit rate on paraphrased
+questions against unrelated ones for a given threshold.
+
+Usage (from the pfr folder) :
+    python -m benchmarks.bench_semantic_cache --size 1000 --threshold 0.8
+"""
+import argparse
+import hashlib
+import re
+import time
+
+import numpy as np
+
+from asker.services.semantic_answer_cache import SemanticAnswerCache
+
+TOPICS = [
+    "graph neural networks",
+    "large language models",
+    "quantum error correction",
+    "federated learning",
+    "knowledge graphs",
+    "reinforcement learning",
+    "image segmentation",
+    "program synthesis",
+]
+TEMPLATES = [
+    "What are the latest papers about {topic}?",
+    "Which articles were published on {topic}?",
+    "Who are the authors working on {topic}?",
+]
+PARAPHRASES = [
+    "what are the latest articles about {topic}",
+    "Which papers were published about {topic} ?",
+    "Who are the researchers working on {topic}?",
+]
+
+
+class HashingEmbedder:
+    """
+    Deterministic embedder : the words and word pairs of the text are
+    hashed into the dimensions of the vector.
+    """
+
+    def __init__(self, dimensions: int = 256) -> None:
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> list:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [" ".join(pair) for pair in zip(words, words[1:])]:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] % 2 == 0 else -1.0
+        return vector.tolist()
+
+
+def fill(cache: SemanticAnswerCache, size: int) -> None:
+    for i in range(size):
+        question = f"Filler question number {i} about topic {i % 37} and field {i % 11}"
+        _, vector = cache.lookup(question, epoch=0)
+        cache.add(question, vector, f"answer {i}", epoch=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1000, help="Cache size")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Similarity threshold")
+    parser.add_argument("--lookups", type=int, default=500, help="Timed lookups")
+    args = parser.parse_args()
+
+    cache = SemanticAnswerCache(
+        {
+            "SEMANTIC_CACHE_MAX_SIZE": args.size + len(TOPICS) * len(TEMPLATES),
+            "SEMANTIC_CACHE_THRESHOLD": args.threshold,
+            "SEMANTIC_CACHE_PATH": "",
+        },
+        HashingEmbedder(),
+    )
+
+    fill(cache, args.size)
+    for topic in TOPICS:
+        for template in TEMPLATES:
+            question = template.format(topic=topic)
+            _, vector = cache.lookup(question, epoch=0)
+            cache.add(question, vector, f"answer to {question}", epoch=0)
+
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        cache.lookup(f"Unrelated lookup {i}", epoch=0)
+    lookup_time = (time.perf_counter() - start) / args.lookups
+
+    paraphrase_hits = 0
+    for topic in TOPICS:
+        for paraphrase in PARAPHRASES:
+            answer, _ = cache.lookup(paraphrase.format(topic=topic), epoch=0)
+            paraphrase_hits += answer is not None
+    paraphrase_total = len(TOPICS) * len(PARAPHRASES)
+
+    false_hits = 0
+    for i in range(args.lookups):
+        answer, _ = cache.lookup(f"How is the weather in city {i} today?", epoch=0)
+        false_hits += answer is not None
+
+    print(f"cache size      : {len(cache)}")
+    print(f"lookup latency  : {lookup_time * 1e6:.1f} us (embedding included)")
+    print(f"paraphrase hits : {paraphrase_hits} / {paraphrase_total}")
+    print(f"false hits      : {false_hits} / {args.lookups}")
@@ -31,6 +31,18 @@ except RuntimeError:
     print("Failed to initialize logger. Exiting...")
     sys.exit(1)
 
+# METRICS
+#----------------------
+try:
+    from shared.services import metrics
+    metrics.start_metrics_server(config)
+except RuntimeError:
+    logger.critical(
+        exc_info=True,
+        msg="Failed to initialize metrics server. Exiting..."
+    )
+    sys.exit(1)
+
 # INIT Database connection
 #----------------------
 try:
@@ -47,7 +59,7 @@ except RuntimeError:
 #----------------------
 try:
     from shared.repositories.params_repository import ParamsRepository
-    params_repository = ParamsRepository(db_client)
+    params_repository = ParamsRepository(db_client, config)
 except RuntimeError:
     logger.critical(
         exc_info=True,
@@ -57,7 +69,7 @@ except RuntimeError:
 
 try:
     from shared.repositories.update_queues import UpdateQueues
-    update_article_queue = UpdateQueues(db_client)
+    update_article_queue = UpdateQueues(db_client, config)
 except RuntimeError:
     logger.critical(
         exc_info=True,
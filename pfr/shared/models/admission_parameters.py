@@ -0,0 +1,28 @@
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AdmissionParameters(BaseModel):
+    """
+    Keep and validate the parameters for the admission control of the
+    questions. A pydantic model is used to validate the entries on init.
+    """
+
+    max_queue_length: int = Field(default=0, ge=0, alias="ASK_QUEUE_MAX_LENGTH")
+    retry_after_s: int = Field(default=10, gt=0, alias="ASK_RETRY_AFTER_S")
+    client_rate_per_minute: int = Field(
+        default=0, ge=0, alias="ASK_CLIENT_RATE_PER_MINUTE"
+    )
+    client_burst: int = Field(default=10, gt=0, alias="ASK_CLIENT_BURST")
+    client_key: Literal["address", "forwarded", "api_key"] = Field(
+        default="address", alias="ASK_CLIENT_KEY"
+    )
+    client_forwarded_header: str = Field(
+        default="X-Forwarded-For", min_length=1, alias="ASK_CLIENT_FORWARDED_HEADER"
+    )
+    client_api_key_header: str = Field(
+        default="X-API-Key", min_length=1, alias="ASK_CLIENT_API_KEY_HEADER"
+    )
+    batch_max_size: int = Field(default=100, gt=0, alias="ASK_BATCH_MAX_SIZE")
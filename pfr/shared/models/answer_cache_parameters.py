@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AnswerCacheParameters(BaseModel):
+    """
+    Keep and validate the parameters for the answer cache. A pydantic
+    model is used to validate the entries on init.
+    """
+
+    ttl_s: int = Field(default=0, ge=0, alias="ANSWER_CACHE_TTL_S")
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AnswerStreamParameters(BaseModel):
+    """
+    Keep and validate the parameters for the answer streams. A pydantic
+    model is used to validate the entries on init.
+    """
+
+    ttl_s: int = Field(default=0, ge=0, alias="ANSWER_STREAM_TTL_S")
+    block_ms: int = Field(default=5000, gt=0, alias="ANSWER_STREAM_BLOCK_MS")
+    max_s: float = Field(default=900, gt=0, alias="ANSWER_STREAM_MAX_S")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AnswerWaiterParameters(BaseModel):
+    """
+    Keep and validate the parameters for the long polling of the
+    answers. A pydantic model is used to validate the entries on init.
+    """
+
+    max_wait_s: int = Field(default=30, ge=0, alias="ASK_WAIT_MAX_S")
@@ -0,0 +1,16 @@
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class AskRecordParameters(BaseModel):
+    """
+    Keep and validate the parameters for the storage of the question
+    records. A pydantic model is used to validate the entries on init.
+    """
+
+    pending_ttl_s: int = Field(default=0, ge=0, alias="ASK_TTL_PENDING_S")
+    done_ttl_s: int = Field(default=0, ge=0, alias="ASK_TTL_DONE_S")
+    error_ttl_s: int = Field(default=0, ge=0, alias="ASK_TTL_ERROR_S")
+    storage: Literal["json", "hash"] = Field(default="json", alias="ASK_RECORD_STORAGE")
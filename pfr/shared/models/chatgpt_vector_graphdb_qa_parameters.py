@@ -24,3 +24,15 @@ class ChatgptVectorGraphdbQaParameters(BaseModel):
         min_length=1,
         alias="CHATPGPT_VECTOR_GRAPHDB_SYSTEM_PROMPT",
     )
+
+    context_max_tokens: int = Field(
+        default=1500,
+        gt=0,
+        alias="CHATPGPT_VECTOR_GRAPHDB_CONTEXT_MAX_TOKENS",
+    )
+
+    context_cache_size: int = Field(
+        default=256,
+        ge=0,
+        alias="CHATPGPT_VECTOR_GRAPHDB_CONTEXT_CACHE_SIZE",
+    )
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class DeadLetterParameters(BaseModel):
+    """
+    Keep and validate the parameters for the retries of the failed tasks
+    and their dead letter lists. A pydantic model is used to validate the
+    entries on init.
+    """
+
+    max_retries: int = Field(default=3, ge=0, alias="QUEUE_MAX_RETRIES")
+    backoff_s: int = Field(default=30, gt=0, alias="QUEUE_RETRY_BACKOFF_S")
+    backoff_max_s: int = Field(default=3600, gt=0, alias="QUEUE_RETRY_BACKOFF_MAX_S")
+    max_length: int = Field(default=10000, ge=0, alias="QUEUE_DEAD_LETTER_MAX_LENGTH")
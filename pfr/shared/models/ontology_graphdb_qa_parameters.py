@@ -52,3 +52,31 @@ class OntologyGraphdbQaParameters(BaseModel):
     graphdb_query_ontology: str = Field(
         min_length=5, alias="LANGCHAIN_GRAPHDB_QUERY_ONTOLOGY"
     )
+
+    sparql_cache_size: int = Field(
+        default=1024, ge=0, alias="LANGCHAIN_GRAPHDB_SPARQL_CACHE_SIZE"
+    )
+
+    sparql_cache_ttl_s: int = Field(
+        default=86400, ge=0, alias="LANGCHAIN_GRAPHDB_SPARQL_CACHE_TTL_S"
+    )
+
+    sparql_templates: bool = Field(
+        default=False, alias="LANGCHAIN_GRAPHDB_SPARQL_TEMPLATES"
+    )
+
+    result_cache_size: int = Field(
+        default=256, ge=0, alias="LANGCHAIN_GRAPHDB_RESULT_CACHE_SIZE"
+    )
+
+    result_cache_ttl_s: int = Field(
+        default=300, ge=0, alias="LANGCHAIN_GRAPHDB_RESULT_CACHE_TTL_S"
+    )
+
+    schema_cache_path: str = Field(
+        default="", max_length=255, alias="LANGCHAIN_GRAPHDB_SCHEMA_CACHE_PATH"
+    )
+
+    schema_refresh_s: int = Field(
+        default=3600, ge=0, alias="LANGCHAIN_GRAPHDB_SCHEMA_REFRESH_S"
+    )
@@ -0,0 +1,28 @@
+"""
+Represent the response of the API endpoint GET /ask/batch.
+"""
+
+from typing import List, Union
+
+from pydantic import BaseModel
+
+from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
+
+
+class OutputApiAskBatch(BaseModel):
+    """
+    Represent the states of several questions, returned by the
+    endpoint GET /ask/batch.
+
+    Parameters
+    ----------
+    questions: list of OutputRedisApiAskQuestion
+        The state of each question, in the order of the tokens given,
+        None for an unknown or expired token
+
+    Returns
+    -------
+    None
+    """
+
+    questions: List[Union[OutputRedisApiAskQuestion, None]]
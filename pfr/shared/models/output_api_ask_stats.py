@@ -0,0 +1,99 @@
+"""
+Represent the statistics returned by the API endpoint /ask/stats.
+"""
+
+from pydantic import BaseModel, Field
+
+
+class OutputApiAskStats(BaseModel):
+    """
+    Represent the statistics of the question answering service,
+    returned by the endpoint GET /ask/stats.
+
+    Parameters
+    ----------
+    answer_cache_hits: int
+        Number of questions answered from the answer cache
+
+    answer_cache_misses: int
+        Number of questions not found in the answer cache
+
+    answer_cache_hit_rate: float
+        Part of the questions answered from the answer cache
+
+    answer_cache_epoch: int
+        Current epoch of the answer cache, bumped when new
+        articles are ingested
+
+    semantic_cache_hits: int
+        Number of questions answered from a similar question
+
+    semantic_cache_misses: int
+        Number of questions without a similar question in the cache
+
+    answered_records: int
+        Number of answered or failed question records written
+
+    answered_record_mean_bytes: float
+        Mean memory used in Redis by an answered or failed record
+
+    queue_length: int
+        Number of interactive questions waiting for an asker
+
+    batch_queue_length: int
+        Number of batch questions waiting for an asker
+
+    queue_pending: int
+        Number of questions read by an asker and not acknowledged yet,
+        with QUEUE_QUESTIONS_TRANSPORT="stream"
+
+    admitted_questions: int
+        Number of questions accepted by POST /ask/
+
+    rejected_queue_full: int
+        Number of questions rejected because the queue was full
+
+    rejected_rate_limited: int
+        Number of questions rejected because their client sent too many
+
+    redis_pool_max_connections: int
+        Size of the Redis connection pool of the API worker
+
+    redis_pool_in_use: int
+        Connections of the pool used by a command
+
+    redis_pool_idle: int
+        Connections of the pool opened and free
+
+    redis_blocking_pool_max_connections: int
+        Size of the Redis connection pool of the blocking reads of the
+        answer streams and of the subscription
+
+    redis_blocking_pool_in_use: int
+        Connections of the blocking pool used, about one per client
+        streaming an answer
+
+    Returns
+    -------
+    None
+    """
+
+    answer_cache_hits: int = Field(default=0)
+    answer_cache_misses: int = Field(default=0)
+    answer_cache_hit_rate: float = Field(default=0.0)
+    answer_cache_epoch: int = Field(default=0)
+    semantic_cache_hits: int = Field(default=0)
+    semantic_cache_misses: int = Field(default=0)
+    answered_records: int = Field(default=0)
+    answered_record_mean_bytes: float = Field(default=0.0)
+    queue_length: int = Field(default=0)
+    batch_queue_length: int = Field(default=0)
+    queue_pending: int = Field(default=0)
+    admitted_questions: int = Field(default=0)
+    rejected_queue_full: int = Field(default=0)
+    rejected_rate_limited: int = Field(default=0)
+    redis_pool_max_connections: int = Field(default=0)
+    redis_pool_in_use: int = Field(default=0)
+    redis_pool_idle: int = Field(default=0)
+    redis_blocking_pool_max_connections: int = Field(default=0)
+    redis_blocking_pool_in_use: int = Field(default=0)
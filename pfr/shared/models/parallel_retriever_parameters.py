@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class ParallelRetrieverParameters(BaseModel):
+    """
+    Keep and validate the parameters for the retrieval branches of the
+    asker. A pydantic model is used to validate the entries on init.
+    """
+
+    vector_timeout_s: float = Field(gt=0, alias="ASKER_VECTOR_TIMEOUT_S")
+    ontology_timeout_s: float = Field(gt=0, alias="ASKER_ONTOLOGY_TIMEOUT_S")
+    concurrency: int = Field(default=1, ge=1, alias="ASKER_CONCURRENCY")
@@ -0,0 +1,52 @@
+"""
+Represent the response of the API endpoint POST /ask/batch.
+"""
+
+from typing import List, Union
+
+from pydantic import BaseModel, Field
+
+from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
+
+
+class PostOutputApiAskBatchItem(BaseModel):
+    """
+    Represent the outcome of one question of a batch.
+
+    Parameters
+    ----------
+    question: PostOutputApiAskQuestion, optional
+        The token and content of the question, None if it was rejected
+
+    rejection: str, optional
+        Why the question was rejected : "queue_full" or "rate_limited"
+
+    retry_after_s: int, optional
+        Seconds to wait before sending a rejected question again
+
+    Returns
+    -------
+    None
+    """
+
+    question: Union[PostOutputApiAskQuestion, None] = Field(default=None)
+    rejection: Union[str, None] = Field(default=None)
+    retry_after_s: Union[int, None] = Field(default=None)
+
+
+class PostOutputApiAskBatch(BaseModel):
+    """
+    Represent the response of the endpoint POST /ask/batch : the
+    outcome of each question, in the order they were sent.
+
+    Parameters
+    ----------
+    questions: list of PostOutputApiAskBatchItem
+        The outcome of each question
+
+    Returns
+    -------
+    None
+    """
+
+    questions: List[PostOutputApiAskBatchItem]
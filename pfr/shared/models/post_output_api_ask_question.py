@@ -4,6 +4,8 @@ Generally used to validate incoming data to ensure
 types and rules.
 """
 
+from typing import Literal
+
 from pydantic import BaseModel, Field, UUID4, validator
 
 
@@ -26,6 +28,9 @@ class PostOutputApiAskQuestion(BaseModel):
     question_content: str
         Content of the question, must be at least 5 characters long
 
+    priority: str, optional
+        Lane of the question, "interactive" (default) or "batch"
+
     Returns
     -------
     None
@@ -38,6 +43,10 @@ class PostOutputApiAskQuestion(BaseModel):
         min_length=5,
         description="The content of the question you asked",
     )
+    priority: Literal["interactive", "batch"] = Field(
+        default="interactive",
+        description="The lane of your question",
+    )
 
     @validator("token")
     def add_prefix_to_token(cls, token):
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class QuestionLanesParameters(BaseModel):
+    """
+    Keep and validate the parameters for the priority lanes of the
+    question queue. A pydantic model is used to validate the entries on init.
+    """
+
+    interactive_weight: int = Field(default=4, gt=0, alias="ASK_INTERACTIVE_WEIGHT")
+    batch_weight: int = Field(default=1, gt=0, alias="ASK_BATCH_WEIGHT")
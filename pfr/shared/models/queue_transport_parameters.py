@@ -0,0 +1,24 @@
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class QueueTransportParameters(BaseModel):
+    """
+    Keep and validate the parameters for the transport of the article
+    and question queues. A pydantic model is used to validate the entries
+    on init.
+    """
+
+    articles_transport: Literal["list", "stream"] = Field(
+        default="list", alias="QUEUE_ARTICLES_TRANSPORT"
+    )
+    questions_transport: Literal["list", "stream"] = Field(
+        default="list", alias="QUEUE_QUESTIONS_TRANSPORT"
+    )
+    articles_count: int = Field(default=10, gt=0, alias="QUEUE_ARTICLES_STREAM_COUNT")
+    questions_count: int = Field(default=1, gt=0, alias="QUEUE_QUESTIONS_STREAM_COUNT")
+    block_ms: int = Field(default=1000, ge=0, alias="QUEUE_STREAM_BLOCK_MS")
+    claim_idle_ms: int = Field(default=300000, gt=0, alias="QUEUE_STREAM_CLAIM_IDLE_MS")
+    max_length: int = Field(default=100000, ge=0, alias="QUEUE_STREAM_MAX_LENGTH")
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class SemanticAnswerCacheParameters(BaseModel):
+    """
+    Keep and validate the parameters for the semantic answer cache. A
+    pydantic model is used to validate the entries on init.
+    """
+
+    max_size: int = Field(default=0, ge=0, alias="SEMANTIC_CACHE_MAX_SIZE")
+    threshold: float = Field(default=0.95, gt=0, le=1, alias="SEMANTIC_CACHE_THRESHOLD")
+    path: str = Field(default="", max_length=255, alias="SEMANTIC_CACHE_PATH")
+    save_every: int = Field(default=20, gt=0, alias="SEMANTIC_CACHE_SAVE_EVERY")
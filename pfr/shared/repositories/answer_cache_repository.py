@@ -0,0 +1,245 @@
+"""
+Repository used to keep the answers given to the questions,
+so a question asked again is answered without the LLM and
+the databases.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from typing import Tuple, Union
+
+from pydantic import ValidationError
+from redis import Redis
+from redis import RedisError
+
+from shared.models.answer_cache_parameters import AnswerCacheParameters
+
+ANSWER_CACHE_KEY = "answer_cache"
+ANSWER_CACHE_EPOCH_KEY = "answer_cache_epoch"
+ANSWER_CACHE_STATS_KEY = "answer_cache_stats"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so the same question written with another
+    case, spacing or final punctuation has the same cache key.
+    """
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def format_stats(stats: dict, epoch: Union[str, None]) -> dict:
+    """
+    Build the statistics of the cache from the answer_cache_stats
+    hash and the epoch read in Redis.
+    """
+    hits = int(stats.get("hits", 0))
+    misses = int(stats.get("misses", 0))
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.0,
+        "epoch": int(epoch or 0),
+        "semantic_hits": int(stats.get("semantic_hits", 0)),
+        "semantic_misses": int(stats.get("semantic_misses", 0)),
+    }
+
+
+class AnswerCacheRepository:
+    """
+    Repository used to keep the answers given to the questions.
+
+    Note
+    ----
+    An answer is kept under the hash of its normalized question, with
+    the cache epoch it was computed in and a TTL. The epoch is bumped
+    by the updater when new articles are ingested : the answers of the
+    previous epochs are then ignored. Hits and misses are counted in
+    the answer_cache_stats hash.
+
+    Parameters
+    ------
+    db: Redis
+        The Redis database.
+
+    app_config: dict
+        The configuration dictionary of the application.
+
+    Attributes
+    ------
+    _logger: Logger
+        The repository logger
+
+    parameters: AnswerCacheParameters
+        The cache parameters. A TTL of 0 disables the cache.
+    """
+
+    def __init__(self, db: Redis, app_config: dict) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(db, Redis):
+            self._logger.error(
+                "The Redis connector given to the repository is not of "
+                "the right type : %s",
+                type(db),
+                exc_info=True,
+            )
+            raise RuntimeError("Redis Bad Type")
+        self.db = db
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the repository is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = AnswerCacheParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the answer cache's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.parameters.ttl_s > 0
+
+    def get_answer(self, question: str) -> Tuple[Union[str, None], int]:
+        """
+        Get the answer of a question from the cache.
+
+        Parameters
+        ----------
+        question: str
+            The question asked.
+
+        Returns
+        -------
+        (str | None, int)
+            The cached answer, None on a miss, and the current epoch
+            to give back to set_answer.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        try:
+            if self.enabled:
+                epoch, cached = (
+                    self.db.pipeline(transaction=False)
+                    .get(ANSWER_CACHE_EPOCH_KEY)
+                    .get(self._key(question))
+                    .execute()
+                )
+            else:
+                # The epoch is still needed by the semantic cache
+                epoch, cached = self.db.get(ANSWER_CACHE_EPOCH_KEY), None
+        except RedisError as e:
+            self._logger.error(
+                "Failed to get an answer from the cache : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Get Cached Answer") from e
+
+        epoch = int(epoch or 0)
+        answer = None
+        if cached is not None:
+            try:
+                cached = json.loads(cached)
+                if cached["epoch"] == epoch:
+                    answer = cached["answer"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                self._logger.warning("Faulty cached answer ignored : %s.", cached)
+
+        if self.enabled:
+            try:
+                self.db.hincrby(
+                    ANSWER_CACHE_STATS_KEY, "hits" if answer is not None else "misses", 1
+                )
+            except RedisError as e:
+                self._logger.warning("Failed to count an answer cache lookup : %s.", e)
+
+        return answer, epoch
+
+    def set_answer(self, question: str, answer: str, epoch: int) -> None:
+        """
+        Keep the answer of a question in the cache.
+
+        Parameters
+        ----------
+        question: str
+            The question asked.
+
+        answer: str
+            The answer given.
+
+        epoch: int
+            The epoch returned by get_answer before the answer was computed.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        if not self.enabled:
+            return
+
+        try:
+            self.db.set(
+                self._key(question),
+                json.dumps({"epoch": epoch, "answer": answer}),
+                ex=self.parameters.ttl_s,
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to set an answer in the cache : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Set Cached Answer") from e
+
+    def count_semantic_lookup(self, hit: bool) -> None:
+        """
+        Count a lookup of the semantic answer cache of the asker,
+        so its hit rate is reported with the exact cache one.
+
+        Parameters
+        ----------
+        hit: bool
+            If the question was answered by the semantic cache.
+        """
+        try:
+            self.db.hincrby(
+                ANSWER_CACHE_STATS_KEY, "semantic_hits" if hit else "semantic_misses", 1
+            )
+        except RedisError as e:
+            self._logger.warning("Failed to count a semantic cache lookup : %s.", e)
+
+    def bump_epoch(self) -> int:
+        """
+        Invalidate every cached answer, used when new articles
+        are ingested.
+
+        Returns
+        -------
+        int
+            The new epoch.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        try:
+            return self.db.incr(ANSWER_CACHE_EPOCH_KEY)
+        except RedisError as e:
+            self._logger.error(
+                "Failed to bump the answer cache epoch : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Bump Answer Cache Epoch") from e
+
+    def _key(self, question: str) -> str:
+        digest = hashlib.sha256(normalize_question(question).encode("utf-8"))
+        return f"{ANSWER_CACHE_KEY}:{digest.hexdigest()}"
@@ -0,0 +1,156 @@
+"""
+Repository used to stream the answers of the questions while
+they are generated, so the API can relay them to the users.
+"""
+
+import logging
+
+from pydantic import ValidationError
+from redis import Redis
+from redis import RedisError
+
+from shared.models.answer_stream_parameters import AnswerStreamParameters
+
+ANSWER_STREAM_KEY = "answer_stream"
+
+# Types of the stream events
+STREAM_TOKEN = "token"
+STREAM_END = "end"
+STREAM_ERROR = "error"
+# The answer streamed so far is dropped : the question is retried
+STREAM_RESET = "reset"
+
+
+class AnswerStreamRepository:
+    """
+    Repository used to stream the answers of the questions.
+
+    Note
+    ----
+    The answer of a question is streamed into a Redis Stream named
+    after its token. Each entry has a type, token, end, error or reset,
+    and a content. The stream expires ANSWER_STREAM_TTL_S seconds after
+    its last entry. A TTL of 0 disables the streams.
+
+    Parameters
+    ------
+    db: Redis
+        The Redis database.
+
+    app_config: dict
+        The configuration dictionary of the application.
+
+    Attributes
+    ------
+    _logger: Logger
+        The repository logger
+
+    parameters: AnswerStreamParameters
+        The stream parameters.
+    """
+
+    def __init__(self, db: Redis, app_config: dict) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(db, Redis):
+            self._logger.error(
+                "The Redis connector given to the repository is not of "
+                "the right type : %s",
+                type(db),
+                exc_info=True,
+            )
+            raise RuntimeError("Redis Bad Type")
+        self.db = db
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the repository is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = AnswerStreamParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the answer stream's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+    @property
+    def enabled(self) -> bool:
+        return self.parameters.ttl_s > 0
+
+    def append(self, token: str, event_type: str, content: str = "") -> None:
+        """
+        Append an event to the stream of a question.
+
+        Parameters
+        ----------
+        token: str
+            The token of the question.
+
+        event_type: str
+            STREAM_TOKEN, STREAM_END, STREAM_ERROR or STREAM_RESET.
+
+        content: str
+            The generated text of a STREAM_TOKEN event.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        if not self.enabled:
+            return
+
+        key = self._key(token)
+        try:
+            (
+                self.db.pipeline(transaction=False)
+                .xadd(key, {"type": event_type, "content": content})
+                .expire(key, self.parameters.ttl_s)
+                .execute()
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to append to the answer stream : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Append Answer Stream") from e
+
+    def reset(self, token: str) -> None:
+        """
+        Restart the stream of a question before its retry : the events of
+        the failed attempt are deleted, and a reset event tells the
+        readers to drop the answer they received.
+
+        Parameters
+        ----------
+        token: str
+            The token of the question.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        if not self.enabled:
+            return
+
+        key = self._key(token)
+        try:
+            (
+                self.db.pipeline(transaction=True)
+                .delete(key)
+                .xadd(key, {"type": STREAM_RESET, "content": ""})
+                .expire(key, self.parameters.ttl_s)
+                .execute()
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to reset the answer stream : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Reset Answer Stream") from e
+
+    def _key(self, token: str) -> str:
+        return f"{ANSWER_STREAM_KEY}:{token}"
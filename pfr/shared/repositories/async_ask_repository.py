@@ -0,0 +1,624 @@
+"""
+Asyncio repository used by the API endpoints /ask/, so a Redis
+round-trip never blocks the event loop of the API.
+
+It reads and writes the same keys as ParamsRepository,
+UpdateQueues, AnswerCacheRepository and AnswerStreamRepository.
+"""
+
+import json
+import logging
+import math
+from typing import List, Tuple, Union
+
+from pydantic import ValidationError
+from redis import RedisError
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from redis.asyncio.client import PubSub
+
+from shared.models.admission_parameters import AdmissionParameters
+from shared.models.answer_stream_parameters import AnswerStreamParameters
+from shared.models.ask_record_parameters import AskRecordParameters
+from shared.models.get_ask_input import GetAskInput
+from shared.models.queue_transport_parameters import QueueTransportParameters
+from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
+from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
+from shared.repositories.answer_cache_repository import (
+    ANSWER_CACHE_EPOCH_KEY,
+    ANSWER_CACHE_STATS_KEY,
+    format_stats,
+)
+from shared.repositories.answer_stream_repository import ANSWER_STREAM_KEY
+from shared.repositories.params_repository import (
+    ASK_ANSWERED_CHANNEL,
+    ASK_RECORD_STATS_KEY,
+    ask_record_ttl,
+)
+from shared.services.metrics import QUEUE_PUSHES
+from shared.repositories.update_queues import (
+    API_ASK_QUESTION_QUEUES,
+    ASKER_GROUP,
+    ASK_PRIORITY_BATCH,
+    ASK_PRIORITY_INTERACTIVE,
+    stream_key,
+)
+
+# Hash counting the admitted and rejected questions
+ASK_ADMISSION_STATS_KEY = "ask_admission_stats"
+# Token bucket of a client, followed by its address or API key hash
+ASK_CLIENT_BUCKET_KEY = "ask_client_bucket"
+
+# Admission results
+ADMITTED = "admitted"
+REJECTED_QUEUE_FULL = "queue_full"
+REJECTED_RATE_LIMITED = "rate_limited"
+
+# Admit a question, then write its record and push it, atomically.
+# KEYS : queue (list or stream), record, admission stats, client bucket
+# ARGV : max queue length (0 = no limit), client rate per second (0 = no
+# limit), client burst, question, record TTL (0 = no expiry), record
+# storage, queue transport, asker consumer group, max stream length
+# (0 = no trim), then the record : a JSON string or field value pairs
+# Returns {result, milliseconds before a retry}
+# The question is added to a stream in its "data" field (STREAM_DATA_FIELD)
+ADMIT_QUESTION_SCRIPT = """
+local max_length = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+
+-- Questions not popped yet : the lag of the askers on a stream
+local function queue_length()
+    if ARGV[7] ~= 'stream' then
+        return redis.call('LLEN', KEYS[1])
+    end
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    for _, group in ipairs(redis.call('XINFO', 'GROUPS', KEYS[1])) do
+        local info = {}
+        for i = 1, #group, 2 do
+            info[group[i]] = group[i + 1]
+        end
+        if info['name'] == ARGV[8] and info['lag'] then
+            return info['lag']
+        end
+    end
+    return redis.call('XLEN', KEYS[1])
+end
+
+if max_length > 0 and queue_length() >= max_length then
+    redis.call('HINCRBY', KEYS[3], 'rejected_queue_full', 1)
+    return {'queue_full', 0}
+end
+
+if rate > 0 then
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[4], 'tokens', 'time')
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - last) * rate)
+    if tokens < 1 then
+        redis.call('HINCRBY', KEYS[3], 'rejected_rate_limited', 1)
+        return {'rate_limited', math.ceil((1 - tokens) / rate * 1000)}
+    end
+    redis.call('HSET', KEYS[4], 'tokens', tostring(tokens - 1), 'time', tostring(now))
+    redis.call('EXPIRE', KEYS[4], math.ceil(burst / rate) + 1)
+end
+
+local ttl = tonumber(ARGV[5])
+if ARGV[6] == 'hash' then
+    redis.call('HSET', KEYS[2], unpack(ARGV, 10))
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[2], ttl)
+    end
+elseif ttl > 0 then
+    redis.call('SET', KEYS[2], ARGV[10], 'EX', ttl)
+else
+    redis.call('SET', KEYS[2], ARGV[10])
+end
+
+if ARGV[7] == 'stream' then
+    if tonumber(ARGV[9]) > 0 then
+        redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[9], '*', 'data', ARGV[4])
+    else
+        redis.call('XADD', KEYS[1], '*', 'data', ARGV[4])
+    end
+else
+    redis.call('LPUSH', KEYS[1], ARGV[4])
+end
+redis.call('HINCRBY', KEYS[3], 'admitted', 1)
+return {'admitted', 0}
+"""
+
+
+class AsyncAskRepository:
+    """
+    Asyncio repository used by the API endpoints /ask/.
+
+    Parameters
+    ------
+    db: redis.asyncio.Redis
+        The asyncio Redis client, created in the lifespan of the API.
+
+    app_config: dict
+        The configuration dictionary of the application.
+
+    blocking_db: redis.asyncio.Redis, optional
+        The client of the blocking reads of the answer streams and of
+        the subscription, with its own pool, db by default.
+
+    Attributes
+    ------
+    _logger: Logger
+        The repository logger
+
+    stream_parameters: AnswerStreamParameters
+        The parameters of the answer streams.
+
+    record_parameters: AskRecordParameters
+        The TTLs and the storage of the question records.
+
+    admission_parameters: AdmissionParameters
+        The limits of the queue and of the clients.
+
+    transport_parameters: QueueTransportParameters
+        The transport of the question queues, list or stream.
+    """
+
+    def __init__(self, db: Redis, app_config: dict, blocking_db: Redis = None) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        for connector in (db, blocking_db if blocking_db is not None else db):
+            if not isinstance(connector, Redis):
+                self._logger.error(
+                    "The Redis connector given to the repository is not of "
+                    "the right type : %s",
+                    type(connector),
+                    exc_info=True,
+                )
+                raise RuntimeError("Redis Bad Type")
+        self.db = db
+        self.blocking_db = blocking_db if blocking_db is not None else db
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the repository is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.stream_parameters = AnswerStreamParameters(**app_config)
+            self.record_parameters = AskRecordParameters(**app_config)
+            self.admission_parameters = AdmissionParameters(**app_config)
+            self.transport_parameters = QueueTransportParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the ask repository's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self._admit_question = self.db.register_script(ADMIT_QUESTION_SCRIPT)
+
+    async def push_question(
+        self,
+        post_output_api_ask_question: PostOutputApiAskQuestion,
+        output_redis_api_ask_question: OutputRedisApiAskQuestion,
+        client: str,
+    ) -> Tuple[str, int]:
+        """
+        Admit a question, then set its pending record and push it to the
+        asker queue. The whole is a single Lua script : one round-trip,
+        an asker can't pop a question whose record is not set yet, and
+        concurrent requests can't overfill the queue.
+
+        The question is pushed to the queue of its priority lane. It is
+        rejected when this queue holds ASK_QUEUE_MAX_LENGTH questions,
+        or when its client has no token left in its bucket
+        (ASK_CLIENT_RATE_PER_MINUTE, ASK_CLIENT_BURST).
+
+        Parameters
+        ----------
+        post_output_api_ask_question: PostOutputApiAskQuestion
+            The question pushed to the queue of its priority.
+
+        output_redis_api_ask_question: OutputRedisApiAskQuestion
+            The record of the question, set under its token.
+
+        client: str
+            The client, key of its token bucket, see ASK_CLIENT_KEY.
+
+        Returns
+        -------
+        (str, int)
+            ADMITTED, REJECTED_QUEUE_FULL or REJECTED_RATE_LIMITED, and
+            the seconds the client should wait before a retry.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        return (
+            await self.push_questions(
+                [(post_output_api_ask_question, output_redis_api_ask_question)], client
+            )
+        )[0]
+
+    async def push_questions(
+        self,
+        questions: List[Tuple[PostOutputApiAskQuestion, OutputRedisApiAskQuestion]],
+        client: str,
+    ) -> List[Tuple[str, int]]:
+        """
+        Admit and push several questions as push_question, in a single
+        pipeline : one round-trip for the whole batch. Each question is
+        admitted on its own.
+
+        Parameters
+        ----------
+        questions: list
+            The (question, record) pairs, as given to push_question.
+
+        client: str
+            The client, key of its token bucket, see ASK_CLIENT_KEY.
+
+        Returns
+        -------
+        list
+            The (result, retry after) of each question, in order.
+
+        Raises
+        ------
+        RuntimeError
+            If the writing procedure on the database went wrong.
+        """
+        pipeline = self.db.pipeline(transaction=False)
+        for post_output_api_ask_question, output_redis_api_ask_question in questions:
+            record = output_redis_api_ask_question.model_dump(mode="json")
+            if self.record_parameters.storage == "hash":
+                record_args = [
+                    item
+                    for field, value in record.items()
+                    if value is not None
+                    for item in (field, value)
+                ]
+            else:
+                record_args = [json.dumps(record)]
+
+            await self._admit_question(
+                keys=[
+                    self._queue_key(post_output_api_ask_question.priority),
+                    output_redis_api_ask_question.token,
+                    ASK_ADMISSION_STATS_KEY,
+                    f"{ASK_CLIENT_BUCKET_KEY}:{client}",
+                ],
+                args=[
+                    self.admission_parameters.max_queue_length,
+                    self.admission_parameters.client_rate_per_minute / 60,
+                    self.admission_parameters.client_burst,
+                    post_output_api_ask_question.model_dump_json(),
+                    ask_record_ttl(self.record_parameters, record["state"]) or 0,
+                    self.record_parameters.storage,
+                    self.transport_parameters.questions_transport,
+                    ASKER_GROUP,
+                    self.transport_parameters.max_length,
+                    *record_args,
+                ],
+                client=pipeline,
+            )
+
+        try:
+            results = await pipeline.execute()
+        except RedisError as e:
+            self._logger.error("Failed to push questions: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Push Question") from e
+
+        for (post_output_api_ask_question, _), (result, _) in zip(questions, results):
+            if result == ADMITTED:
+                QUEUE_PUSHES.labels(
+                    API_ASK_QUESTION_QUEUES[post_output_api_ask_question.priority]
+                ).inc()
+
+        return [
+            (
+                result,
+                self.admission_parameters.retry_after_s
+                if result == REJECTED_QUEUE_FULL
+                else math.ceil(retry_after_ms / 1000),
+            )
+            for result, retry_after_ms in results
+        ]
+
+    async def get_question(self, get_ask_input: GetAskInput) -> OutputRedisApiAskQuestion:
+        """
+        Get the record of a question.
+
+        Parameters
+        ----------
+        get_ask_input: GetAskInput
+            An instance of GetAskInput containing the token.
+
+        Returns
+        -------
+        OutputRedisApiAskQuestion
+            The record of the question.
+
+        Raises
+        ------
+        RuntimeError
+            If the question is unknown or the read procedure went wrong.
+        """
+        try:
+            if self.record_parameters.storage == "hash":
+                result = await self.db.hgetall(get_ask_input.token) or None
+            else:
+                result = await self.db.get(get_ask_input.token)
+        except RedisError as e:
+            self._logger.error(
+                "Failed to retrieve from Redis "
+                "the value associated with the key '%s': %s.",
+                get_ask_input.token,
+                e,
+                exc_info=True,
+            )
+            raise RuntimeError("Fail Get Question") from e
+
+        if result is None:
+            self._logger.error(
+                "No value found in Redis for the key '%s'.", get_ask_input.token
+            )
+            raise RuntimeError("No value found in Redis for the given key")
+
+        return self._parse_record(result)
+
+    async def get_questions(
+        self, get_ask_inputs: List[GetAskInput]
+    ) -> List[Union[OutputRedisApiAskQuestion, None]]:
+        """
+        Get the records of several questions in one round-trip : a
+        single MGET, or a pipeline of HGETALL for the hash records.
+
+        Parameters
+        ----------
+        get_ask_inputs: list
+            The GetAskInput of the questions.
+
+        Returns
+        -------
+        list
+            The records, in order, None for an unknown or expired token.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        tokens = [get_ask_input.token for get_ask_input in get_ask_inputs]
+        try:
+            if self.record_parameters.storage == "hash":
+                pipeline = self.db.pipeline(transaction=False)
+                for token in tokens:
+                    pipeline.hgetall(token)
+                results = [result or None for result in await pipeline.execute()]
+            else:
+                results = await self.db.mget(tokens)
+        except RedisError as e:
+            self._logger.error(
+                "Failed to retrieve the questions from Redis: %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Get Questions") from e
+
+        records = []
+        for result in results:
+            try:
+                records.append(None if result is None else self._parse_record(result))
+            except RuntimeError:
+                records.append(None)
+        return records
+
+    def _parse_record(self, result: Union[str, dict]) -> OutputRedisApiAskQuestion:
+        """
+        Validate a question record read as a JSON string or a hash.
+        """
+        try:
+            if isinstance(result, dict):
+                return OutputRedisApiAskQuestion(**result)
+            return OutputRedisApiAskQuestion.model_validate_json(result)
+        except ValidationError as e:
+            self._logger.error(
+                "Faulty question record %s coming from Redis: %s", result, e
+            )
+            raise RuntimeError("Failed to transform the JSON coming from REDIS") from e
+
+    async def ping(self) -> None:
+        """
+        Check the database answers, for the readiness probe.
+
+        Raises
+        ------
+        RuntimeError
+            If the database could not be reached.
+        """
+        try:
+            await self.db.ping()
+        except RedisError as e:
+            self._logger.error("Failed to ping the database : %s.", e)
+            raise RuntimeError("Fail Ping") from e
+
+    async def get_answer_cache_stats(self) -> dict:
+        """
+        Get the statistics of the answer caches, counted by the
+        AnswerCacheRepository of the asker.
+
+        Returns
+        -------
+        dict
+            hits, misses, hit_rate and epoch of the cache, and the
+            semantic_hits, semantic_misses of the semantic cache.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        try:
+            stats, epoch = await (
+                self.db.pipeline(transaction=False)
+                .hgetall(ANSWER_CACHE_STATS_KEY)
+                .get(ANSWER_CACHE_EPOCH_KEY)
+                .execute()
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to get the answer cache statistics : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Get Answer Cache Stats") from e
+
+        return format_stats(stats, epoch)
+
+    async def get_record_stats(self) -> dict:
+        """
+        Get the number of answered or failed records written, and
+        their mean memory usage in bytes.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        try:
+            stats = await self.db.hgetall(ASK_RECORD_STATS_KEY)
+        except RedisError as e:
+            self._logger.error(
+                "Failed to get the question records statistics : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Get Record Stats") from e
+
+        records = int(stats.get("records", 0))
+        memory_bytes = int(stats.get("memory_bytes", 0))
+        return {
+            "records": records,
+            "mean_bytes": memory_bytes / records if records > 0 else 0.0,
+        }
+
+    async def get_admission_stats(self) -> dict:
+        """
+        Get the length of the question queues, the questions popped and
+        not acknowledged when the queues are streams, and the number of
+        admitted and rejected questions.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        try:
+            stats = await self.db.hgetall(ASK_ADMISSION_STATS_KEY)
+            queue_length, queue_pending = await self._queue_backlog(
+                ASK_PRIORITY_INTERACTIVE
+            )
+            batch_queue_length, batch_queue_pending = await self._queue_backlog(
+                ASK_PRIORITY_BATCH
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to get the admission statistics : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Get Admission Stats") from e
+
+        return {
+            "queue_length": queue_length,
+            "batch_queue_length": batch_queue_length,
+            "queue_pending": queue_pending + batch_queue_pending,
+            "admitted": int(stats.get("admitted", 0)),
+            "rejected_queue_full": int(stats.get("rejected_queue_full", 0)),
+            "rejected_rate_limited": int(stats.get("rejected_rate_limited", 0)),
+        }
+
+    def _queue_key(self, priority: str) -> str:
+        queue = API_ASK_QUESTION_QUEUES[priority]
+        if self.transport_parameters.questions_transport == "stream":
+            return stream_key(queue)
+        return queue
+
+    async def _queue_backlog(self, priority: str) -> Tuple[int, int]:
+        """
+        The questions of a lane not popped yet, and the ones popped from
+        a stream and not acknowledged yet, as UpdateQueues.get_queue_stats.
+        """
+        key = self._queue_key(priority)
+        if self.transport_parameters.questions_transport == "list":
+            return await self.db.llen(key), 0
+
+        try:
+            groups = await self.db.xinfo_groups(key)
+        except ResponseError:
+            # The stream doesn't exist yet
+            return 0, 0
+        for info in groups:
+            if info["name"] == ASKER_GROUP and info.get("lag") is not None:
+                return info["lag"], info["pending"]
+        return await self.db.xlen(key), 0
+
+    async def read_answer_stream(
+        self, token: str, last_id: str = "0"
+    ) -> List[Tuple[str, dict]]:
+        """
+        Read the events appended by the AnswerStreamRepository of the
+        asker to the stream of a question after last_id, waiting up to
+        ANSWER_STREAM_BLOCK_MS for new ones.
+
+        Returns
+        -------
+        list
+            The (id, {"type", "content"}) events, empty on a timeout.
+
+        Raises
+        ------
+        RuntimeError
+            If the read procedure on the database went wrong.
+        """
+        try:
+            result = await self.blocking_db.xread(
+                {f"{ANSWER_STREAM_KEY}:{token}": last_id},
+                block=self.stream_parameters.block_ms,
+            )
+        except RedisError as e:
+            self._logger.error(
+                "Failed to read the answer stream : %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Read Answer Stream") from e
+
+        if not result:
+            return []
+        return result[0][1]
+
+    async def subscribe_answered_questions(self) -> PubSub:
+        """
+        Subscribe to the notifications published by the ParamsRepository
+        of the asker when a question is answered or failed.
+
+        Returns
+        -------
+        PubSub
+            The subscription. Its messages have the token of the question
+            as channel suffix, and its final state as data.
+
+        Raises
+        ------
+        RuntimeError
+            If the subscription failed.
+        """
+        pubsub = self.blocking_db.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f"{ASK_ANSWERED_CHANNEL}:*")
+        except RedisError as e:
+            await pubsub.aclose()
+            self._logger.error(
+                "Failed to subscribe to the answered questions: %s.", e, exc_info=True
+            )
+            raise RuntimeError("Fail Subscribe Answered Questions") from e
+        return pubsub
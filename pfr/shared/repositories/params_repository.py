@@ -7,6 +7,7 @@ elements of the application.
 """
 
 from pydantic import ValidationError
+from shared.models.ask_record_parameters import AskRecordParameters
 from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
 from shared.models.get_ask_input import GetAskInput
 from shared.models.redis_popped_api_ask_question import RedisPoppedApiAskQuestion
@@ -14,10 +15,69 @@ from shared.models.redis_popped_api_ask_question import RedisPoppedApiAskQuestio
 import logging
 import json
 import datetime
+from typing import Union
 
 from redis import Redis
 from redis import RedisError
 
+# Channel prefix where the token of a question is published once it
+# is answered or failed
+ASK_ANSWERED_CHANNEL = "api_ask_answered"
+
+# States after which a question is not updated anymore
+ASK_FINAL_STATES = ("Done", "ERROR")
+
+# Hash counting the answered records and their memory usage
+ASK_RECORD_STATS_KEY = "ask_record_stats"
+
+
+def ask_record_ttl(parameters: AskRecordParameters, state: str) -> Union[int, None]:
+    """
+    Get the TTL in seconds of a question record in a state,
+    None to keep it without expiry.
+    """
+    if state == "Done":
+        ttl_s = parameters.done_ttl_s
+    elif state == "ERROR":
+        ttl_s = parameters.error_ttl_s
+    else:
+        ttl_s = parameters.pending_ttl_s
+    return ttl_s or None
+
+
+def write_ask_record(pipeline, parameters: AskRecordParameters, record: dict) -> None:
+    """
+    Queue the write of a question record into a pipeline, with the TTL
+    of its state. Works with the pipelines of both the synchronous and
+    the asyncio clients.
+
+    Parameters
+    ----------
+    pipeline
+        The pipeline, executed by the caller.
+
+    parameters: AskRecordParameters
+        The storage parameters of the records.
+
+    record: dict
+        The JSON compatible fields of the record, with token and state.
+    """
+    ttl_s = ask_record_ttl(parameters, record["state"])
+
+    if parameters.storage == "hash":
+        pipeline.hset(
+            record["token"],
+            mapping={
+                field: value for field, value in record.items() if value is not None
+            },
+        )
+        if ttl_s is None:
+            pipeline.persist(record["token"])
+        else:
+            pipeline.expire(record["token"], ttl_s)
+    else:
+        pipeline.set(record["token"], json.dumps(record), ex=ttl_s)
+
 
 class ParamsRepository:
     """
@@ -33,6 +93,10 @@ class ParamsRepository:
         The Mongo database in wich the record collection
         is kept.
 
+    app_config: dict, optional
+        The configuration dictionary of the application, with the
+        TTLs and the storage of the question records.
+
     Attributes
     ------
     _logger: Logger
@@ -43,7 +107,7 @@ class ParamsRepository:
         kept.
     """
 
-    def __init__(self, db: Redis) -> None:
+    def __init__(self, db: Redis, app_config: dict = None) -> None:
         self._logger = logging.getLogger(__name__)
 
         if not isinstance(db, Redis):
@@ -56,6 +120,15 @@ class ParamsRepository:
             raise RuntimeError("Redis Bad Type")
         self.db = db
 
+        try:
+            self.record_parameters = AskRecordParameters(**(app_config or {}))
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the question records' configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
     def update_api_retrieve_time(self, param: datetime.datetime) -> None:
         """
         Update the last time data was retrieved from the API.
@@ -177,11 +250,20 @@ class ParamsRepository:
             )
             raise TypeError("Parameter Bad Type")
 
+        final_state = output_redis_api_ask_question.state in ASK_FINAL_STATES
         try:
-            self.db.set(
-                output_redis_api_ask_question.token,
-                output_redis_api_ask_question.model_dump_json(),
+            pipeline = self.db.pipeline()
+            write_ask_record(
+                pipeline,
+                self.record_parameters,
+                output_redis_api_ask_question.model_dump(mode="json"),
             )
+            if final_state:
+                pipeline.publish(
+                    self._answered_channel(output_redis_api_ask_question.token),
+                    output_redis_api_ask_question.state,
+                )
+            pipeline.execute()
         except RedisError as e:
             self._logger.error(
                 "Failed to set in redis the key '%s' with value '%s': %s.",
@@ -194,6 +276,9 @@ class ParamsRepository:
                 "Failed to set key value into redis for the endpoint /ask/"
             ) from e
 
+        if final_state:
+            self._count_record_memory(output_redis_api_ask_question.token)
+
     def get_key_value_api_ask_question(
         self,
         get_ask_input: GetAskInput,
@@ -229,7 +314,10 @@ class ParamsRepository:
             )
             raise TypeError("Parameter Bad Type")
         try:
-            result = self.db.get(get_ask_input.token)
+            if self.record_parameters.storage == "hash":
+                result = self.db.hgetall(get_ask_input.token) or None
+            else:
+                result = self.db.get(get_ask_input.token)
             if result is None:
                 self._logger.error(
                     "No value found in Redis for the key '%s'.",
@@ -249,7 +337,7 @@ class ParamsRepository:
             ) from e
 
         try:
-            data = json.loads(result)
+            data = result if isinstance(result, dict) else json.loads(result)
         except json.JSONDecodeError as e:
             self._logger.error(
                 "Failed to decode the JSON %s coming from Redis: %s",
@@ -284,16 +372,21 @@ class ParamsRepository:
             raise TypeError("Parameter Bad Type")
 
         try:
-            self.db.set(
-                output_redis_error_qa_question.token,
-                json.dumps(
-                    {
-                        "token": output_redis_error_qa_question.token,
-                        "state": "ERROR",
-                        "question_content": output_redis_error_qa_question.question_content,
-                    }
-                ),
+            pipeline = self.db.pipeline()
+            write_ask_record(
+                pipeline,
+                self.record_parameters,
+                {
+                    "token": output_redis_error_qa_question.token,
+                    "state": "ERROR",
+                    "question_content": output_redis_error_qa_question.question_content,
+                },
+            )
+            pipeline.publish(
+                self._answered_channel(output_redis_error_qa_question.token),
+                "ERROR",
             )
+            pipeline.execute()
         except RedisError as e:
             self._logger.error(
                 "Failed to set in redis the key '%s' with value '%s': %s.",
@@ -305,3 +398,39 @@ class ParamsRepository:
             raise RuntimeError(
                 "Failed to set key value error of the qa process into redis"
             ) from e
+
+        self._count_record_memory(output_redis_error_qa_question.token)
+
+    def _count_record_memory(self, token: str) -> None:
+        """
+        Log the memory used by an answered or failed record, and add
+        it to the ask_record_stats hash read by GET /ask/stats.
+
+        Best effort, once the record is written and published : MEMORY
+        USAGE may be refused, e.g. by a managed Redis.
+        """
+        try:
+            memory_bytes = self.db.memory_usage(token)
+            if memory_bytes is None:
+                return
+
+            self._logger.info("Record of %s stored in %s bytes.", token, memory_bytes)
+            (
+                self.db.pipeline(transaction=False)
+                .hincrby(ASK_RECORD_STATS_KEY, "records", 1)
+                .hincrby(ASK_RECORD_STATS_KEY, "memory_bytes", memory_bytes)
+                .execute()
+            )
+        except RedisError as e:
+            self._logger.warning("Failed to count the memory of a record : %s.", e)
+
+    @staticmethod
+    def answered_token(channel: str) -> str:
+        """
+        Get the token of a question from its notification channel.
+        """
+        return channel[len(ASK_ANSWERED_CHANNEL) + 1 :]
+
+    @staticmethod
+    def _answered_channel(token: str) -> str:
+        return f"{ASK_ANSWERED_CHANNEL}:{token}"
@@ -6,27 +6,167 @@ The params collection keeps dynamic configuration elements of the application.
 import logging
 import datetime
 import json
-from typing import Union
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import List, Union
 
 from redis import Redis
 from redis import RedisError
+from redis.exceptions import ResponseError
 
 from pydantic import ValidationError
 
 from shared.models.article import Article
+from shared.models.dead_letter_parameters import DeadLetterParameters
 from shared.models.redis_popped_api_ask_question import RedisPoppedApiAskQuestion
 from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
 
+from shared.models.question_lanes_parameters import QuestionLanesParameters
+from shared.models.queue_transport_parameters import QueueTransportParameters
+from shared.services.metrics import QUEUE_FAILURES
+from shared.services.metrics import QUEUE_POPS
+from shared.services.metrics import QUEUE_PUSHES
+
+# Priority lanes of the questions, each one with its own queue
+ASK_PRIORITY_INTERACTIVE = "interactive"
+ASK_PRIORITY_BATCH = "batch"
+API_ASK_QUESTION_QUEUE = "api_ask_question"
+API_ASK_QUESTION_QUEUES = {
+    ASK_PRIORITY_INTERACTIVE: API_ASK_QUESTION_QUEUE,
+    ASK_PRIORITY_BATCH: f"{API_ASK_QUESTION_QUEUE}_batch",
+}
+UPDATE_ARTICLE_QUEUE = "task_update_article"
+
+# Consumer groups of the stream transport
+UPDATER_GROUP = "updater"
+ASKER_GROUP = "asker"
+# Field of a stream entry holding the JSON of the task
+STREAM_DATA_FIELD = "data"
+# Pause between two claims of the stuck messages of a stream
+CLAIM_CHECK_INTERVAL_S = 30
+# Pause between two moves of the due retries back to a queue
+RETRY_CHECK_INTERVAL_S = 1
+# Retries moved back to a queue at most by move
+RETRY_BATCH_SIZE = 100
+
+# Move the due retries of a queue back to its list or stream, in one
+# step so a retry is neither lost nor pushed twice by two consumers.
+# KEYS[1]: the retries, KEYS[2]: the list or stream of the queue
+# ARGV[1]: now, ARGV[2]: max retries moved, ARGV[3]: "list" or "stream",
+# ARGV[4]: max stream length, ARGV[5]: the data field of a stream entry
+REQUEUE_RETRIES_SCRIPT = """
+local tasks = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, task in ipairs(tasks) do
+    redis.call('ZREM', KEYS[1], task)
+    if ARGV[3] == 'stream' then
+        if tonumber(ARGV[4]) > 0 then
+            redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', ARGV[5], task)
+        else
+            redis.call('XADD', KEYS[2], '*', ARGV[5], task)
+        end
+    else
+        redis.call('LPUSH', KEYS[2], task)
+    end
+end
+return #tasks
+"""
+
+# Move the oldest dead letters of a queue back to its list or stream,
+# resetting their attempts. The tasks which could not be read have no
+# data, only their raw payload : they would fail again, so they are kept.
+# KEYS[1]: the dead letters, KEYS[2]: the list or stream of the queue,
+# KEYS[3]: the attempts
+# ARGV[1]: max entries replayed, ARGV[2]: "list" or "stream",
+# ARGV[3]: max stream length, ARGV[4]: the data field of a stream entry
+REPLAY_DEAD_LETTERS_SCRIPT = """
+local count = math.min(tonumber(ARGV[1]), redis.call('LLEN', KEYS[1]))
+local replayed = 0
+for _ = 1, count do
+    local raw = redis.call('RPOP', KEYS[1])
+    local entry = cjson.decode(raw)
+    if type(entry['data']) ~= 'string' then
+        redis.call('LPUSH', KEYS[1], raw)
+    else
+        if ARGV[2] == 'stream' then
+            if tonumber(ARGV[3]) > 0 then
+                redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', ARGV[4], entry['data'])
+            else
+                redis.call('XADD', KEYS[2], '*', ARGV[4], entry['data'])
+            end
+        else
+            redis.call('LPUSH', KEYS[2], entry['data'])
+        end
+        if type(entry['task_id']) == 'string' then
+            redis.call('HDEL', KEYS[3], entry['task_id'])
+        end
+        replayed = replayed + 1
+    end
+end
+return replayed
+"""
+
+
+def stream_key(queue: str) -> str:
+    """
+    Key of the stream transport of a queue. The list and stream
+    transports use different keys, a key can't hold both.
+    """
+    return f"{queue}_stream"
+
+
+def retry_key(queue: str) -> str:
+    """
+    Key of the failed tasks of a queue waiting for their retry, a
+    sorted set scored by the time of the retry.
+    """
+    return f"{queue}_retry"
+
+
+def attempts_key(queue: str) -> str:
+    """
+    Key of the failed attempts of the tasks of a queue, a hash by task id.
+    """
+    return f"{queue}_attempts"
+
+
+def dead_letter_key(queue: str) -> str:
+    """
+    Key of the dead letters of a queue, a list of the tasks failed after
+    their retries, newest first.
+    """
+    return f"{queue}_dead_letter"
+
 
 class UpdateQueues:
-    """Class for updating queues in the database."""
+    """
+    Class for updating queues in the database.
+
+    The article queue and the question queues are Redis lists by
+    default. With QUEUE_ARTICLES_TRANSPORT or QUEUE_QUESTIONS_TRANSPORT
+    set to "stream", they are Redis Streams read by a consumer group, the
+    updaters or the askers, so several instances share the tasks. A task
+    read from a stream is kept pending until ack is called with it : the
+    tasks of an instance stopped before are claimed by another one after
+    QUEUE_STREAM_CLAIM_IDLE_MS, and delivered at least once.
 
-    def __init__(self, db: Redis) -> None:
+    A task which failed is given to fail : it is pushed back to its queue
+    after a backoff, up to QUEUE_MAX_RETRIES times, then moved with the
+    error to the dead letter list of the queue, to be inspected and
+    replayed with app_dead_letter.py. A popped task which can't be read
+    is moved there at once.
+    """
+
+    def __init__(self, db: Redis, app_config: dict = None) -> None:
         """
         Initializes the UpdateQueues instance with a Redis database connection.
 
         Parameters:
         - db (Redis): The Redis database connection.
+        - app_config (dict, optional): The configuration of the application,
+          with the weights of the question lanes.
         """
         self._logger = logging.getLogger(__name__)
 
@@ -40,6 +180,55 @@ class UpdateQueues:
             raise RuntimeError("Redis Bad Type")
         self.db = db
 
+        try:
+            self.lanes_parameters = QuestionLanesParameters(**(app_config or {}))
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the question lanes' configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        try:
+            self.transport_parameters = QueueTransportParameters(**(app_config or {}))
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the queues transport's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        try:
+            self.dead_letter_parameters = DeadLetterParameters(**(app_config or {}))
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the queues retries' configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self._requeue_retries = self.db.register_script(REQUEUE_RETRIES_SCRIPT)
+        self._replay_dead_letters = self.db.register_script(REPLAY_DEAD_LETTERS_SCRIPT)
+        self._requeued_at = {}
+
+        # Name of the instance in the consumer groups
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        # Messages read in a batch and not returned yet, by stream
+        self._buffers = {}
+        self._claimed_at = {}
+        self._groups = set()
+        # Popped task -> (queue, data, (stream, group, message id) or None),
+        # until acknowledged or failed
+        self._receipts = {}
+        self._receipts_lock = threading.Lock()
+
+        # Smooth weighted round robin between the question lanes
+        self._lane_weights = {
+            ASK_PRIORITY_INTERACTIVE: self.lanes_parameters.interactive_weight,
+            ASK_PRIORITY_BATCH: self.lanes_parameters.batch_weight,
+        }
+        self._lane_credits = {lane: 0 for lane in self._lane_weights}
+
     def push_task_update_article(self, article: Article) -> None:
         """
         Pushes an article update task to the database queue.
@@ -57,21 +246,28 @@ class UpdateQueues:
 
         try:
             # Push the article update task to the database queue
-            self.db.lpush("task_update_article", article.model_dump_json())
+            if self.transport_parameters.articles_transport == "stream":
+                self._stream_push(UPDATE_ARTICLE_QUEUE, article.model_dump_json())
+            else:
+                self.db.lpush(UPDATE_ARTICLE_QUEUE, article.model_dump_json())
         except RedisError as e:
             self._logger.error(
                 "Failed to push an update article task: %s.", e, exc_info=True
             )
             raise RuntimeError("Fail Update Api Retrieval Time") from e
+        QUEUE_PUSHES.labels(UPDATE_ARTICLE_QUEUE).inc()
 
     def api_lpush_question(
-        self, output_api_ask_question: PostOutputApiAskQuestion
+        self,
+        output_api_ask_question: PostOutputApiAskQuestion,
+        priority: str = ASK_PRIORITY_INTERACTIVE,
     ) -> None:
         """
         Pushes a question received from the API to the Redis queue by the api post /ask/ question.
 
         Parameters:
         - output_api_ask_question (PostOutputApiAskQuestion): The question received from the API.
+        - priority (str): The lane of the question, ASK_PRIORITY_INTERACTIVE or ASK_PRIORITY_BATCH.
         """
         if not isinstance(output_api_ask_question, PostOutputApiAskQuestion):
             self._logger.error(
@@ -83,36 +279,74 @@ class UpdateQueues:
 
         try:
             # Push the question to the Redis queue named api_ask_question
-            self.db.lpush("api_ask_question", output_api_ask_question.model_dump_json())
+            if self.transport_parameters.questions_transport == "stream":
+                self._stream_push(
+                    API_ASK_QUESTION_QUEUES[priority],
+                    output_api_ask_question.model_dump_json(),
+                )
+            else:
+                self.db.lpush(
+                    API_ASK_QUESTION_QUEUES[priority],
+                    output_api_ask_question.model_dump_json(),
+                )
         except RedisError as e:
             self._logger.error(
                 "Failed to push an update article task: %s.", e, exc_info=True
             )
             raise RuntimeError("Fail Push Update Task") from e
+        QUEUE_PUSHES.labels(API_ASK_QUESTION_QUEUES[priority]).inc()
 
     def api_pop_question(self) -> Union[RedisPoppedApiAskQuestion, None]:
         """
-        Pops a question from the Redis queue used by the api post /ask/ question.
+        Pops a question from the Redis queues used by the api post /ask/ question.
+
+        The lanes are popped with a weighted round robin : each pop first
+        looks in the lane whose turn it is, then in the other ones. Under
+        load, the interactive and batch lanes get ASK_INTERACTIVE_WEIGHT
+        and ASK_BATCH_WEIGHT pops out of their sum, so none is starved.
 
         Returns:
-        - Union[RedisPoppedApiAskQuestion, None]: The popped question or None if the queue is empty.
+        - Union[RedisPoppedApiAskQuestion, None]: The popped question or None if the queues are empty.
         """
+        queues = [API_ASK_QUESTION_QUEUES[lane] for lane in self._next_lanes()]
+        if self.transport_parameters.questions_transport == "stream":
+            return self._stream_pop(
+                queues,
+                ASKER_GROUP,
+                self.transport_parameters.questions_count,
+                RedisPoppedApiAskQuestion,
+            )
+
         try:
-            # Pop a question from the Redis queue named api_ask_question
-            result = self.db.rpop("api_ask_question")
-            if result is not None:
-                result = RedisPoppedApiAskQuestion(**json.loads(result))
-            return result
+            self._requeue_due_retries(queues)
+            # Pop a question from the first non empty lane, in one command
+            result = self.db.lmpop(len(queues), *queues, direction="RIGHT")
         except RedisError as e:
             self._logger.error(
                 "Failed to pop an API ask question task: %s.", e, exc_info=True
             )
             raise RuntimeError("Fail Pop API Ask Question Task") from e
-        except ValidationError as e:
-            self._logger.error(
-                "Failed to convert a popped API ask question task: %s.", e
-            )
+
+        if result is None:
             return None
+        return self._read_task(result[0], result[1][0], RedisPoppedApiAskQuestion)
+
+    def _next_lanes(self) -> list:
+        """
+        Get the lanes in the order to pop them : the lane whose turn it
+        is, then the other ones by weight.
+        """
+        total = sum(self._lane_weights.values())
+        for lane, weight in self._lane_weights.items():
+            self._lane_credits[lane] += weight
+        turn = max(self._lane_credits, key=self._lane_credits.get)
+        self._lane_credits[turn] -= total
+
+        return [turn] + sorted(
+            (lane for lane in self._lane_weights if lane != turn),
+            key=self._lane_weights.get,
+            reverse=True,
+        )
 
     def pop_task_update_article(self) -> Article:
         """
@@ -121,17 +355,487 @@ class UpdateQueues:
         Returns:
         - Article: The popped article update task or None if the queue is empty.
         """
+        if self.transport_parameters.articles_transport == "stream":
+            return self._stream_pop(
+                [UPDATE_ARTICLE_QUEUE],
+                UPDATER_GROUP,
+                self.transport_parameters.articles_count,
+                Article,
+            )
+
         try:
+            self._requeue_due_retries([UPDATE_ARTICLE_QUEUE])
             # Pop an article update task from the Redis queue named task_update_article
-            result = self.db.rpop("task_update_article")
-            if result is not None:
-                result = Article(**json.loads(result))
-            return result
+            result = self.db.rpop(UPDATE_ARTICLE_QUEUE)
         except RedisError as e:
             self._logger.error(
                 "Failed to pop an update article task: %s.", e, exc_info=True
             )
             raise RuntimeError("Fail Pop Update Task") from e
-        except ValidationError as e:
-            self._logger.error("Failed to convert a popped update article task: %s.", e)
+
+        if result is None:
             return None
+        return self._read_task(UPDATE_ARTICLE_QUEUE, result, Article)
+
+    def ack(self, task: Union[Article, RedisPoppedApiAskQuestion]) -> None:
+        """
+        Acknowledge a task once it is handled : a task popped from a stream
+        isn't delivered again, and the failed attempts of a retried task
+        are forgotten.
+
+        Parameters:
+        - task: The article or question returned by a pop method.
+        """
+        with self._receipts_lock:
+            receipt = self._receipts.pop(id(task), None)
+        if receipt is None:
+            return
+
+        queue, _, message = receipt
+        try:
+            pipeline = self.db.pipeline(transaction=True)
+            pipeline.hdel(attempts_key(queue), self._task_id(task))
+            if message is not None:
+                pipeline.xack(*message)
+            pipeline.execute()
+        except RedisError as e:
+            self._logger.error("Failed to acknowledge a task: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Ack Task") from e
+
+    def fail(self, task: Union[Article, RedisPoppedApiAskQuestion], error: str) -> bool:
+        """
+        Acknowledge a task which failed, and push it back to its queue after
+        QUEUE_RETRY_BACKOFF_S seconds, doubled at each attempt up to
+        QUEUE_RETRY_BACKOFF_MAX_S. After QUEUE_MAX_RETRIES retries, it is
+        moved to the dead letter list of its queue instead.
+
+        Parameters:
+        - task: The article or question returned by a pop method.
+        - error (str): The reason of the failure, kept in the dead letter.
+
+        Returns:
+        - bool: True if the task will be retried, False if it was dead lettered.
+        """
+        with self._receipts_lock:
+            receipt = self._receipts.pop(id(task), None)
+        if receipt is None:
+            self._logger.error("Failed task not popped by this instance: %s.", task)
+            return False
+
+        queue, data, message = receipt
+        task_id = self._task_id(task)
+        parameters = self.dead_letter_parameters
+        try:
+            attempts = self.db.hincrby(attempts_key(queue), task_id, 1)
+            retry = attempts <= parameters.max_retries
+
+            pipeline = self.db.pipeline(transaction=True)
+            if retry:
+                delay = min(
+                    parameters.backoff_max_s, parameters.backoff_s * 2 ** (attempts - 1)
+                )
+                pipeline.zadd(retry_key(queue), {data: time.time() + delay})
+            else:
+                self._push_dead_letter(pipeline, queue, task_id, data, error, attempts)
+                pipeline.hdel(attempts_key(queue), task_id)
+            if message is not None:
+                pipeline.xack(*message)
+            pipeline.execute()
+        except RedisError as e:
+            self._logger.error("Failed to fail a task: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Fail Task") from e
+
+        QUEUE_FAILURES.labels(queue, "retry" if retry else "dead_letter").inc()
+        if retry:
+            self._logger.warning(
+                "Task %s of %s failed (attempt %s), retried in %s s: %s.",
+                task_id,
+                queue,
+                attempts,
+                delay,
+                error,
+            )
+        else:
+            self._logger.error(
+                "Task %s of %s failed %s times, dead lettered: %s.",
+                task_id,
+                queue,
+                attempts,
+                error,
+            )
+        return retry
+
+    def attempts(self, task: Union[Article, RedisPoppedApiAskQuestion]) -> int:
+        """
+        Get the failed attempts of a popped task, 0 on its first delivery.
+
+        Parameters:
+        - task: The article or question returned by a pop method.
+
+        Returns:
+        - int: The number of failed attempts.
+        """
+        with self._receipts_lock:
+            receipt = self._receipts.get(id(task))
+        if receipt is None:
+            return 0
+
+        try:
+            attempts = self.db.hget(attempts_key(receipt[0]), self._task_id(task))
+        except RedisError as e:
+            self._logger.error("Failed to get the attempts of a task: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Get Task Attempts") from e
+        return int(attempts or 0)
+
+    def get_dead_letters(self, queue: str, start: int = 0, count: int = 20) -> List[dict]:
+        """
+        Get the dead letters of a queue, newest first.
+
+        Parameters:
+        - queue (str): The queue, e.g. UPDATE_ARTICLE_QUEUE.
+        - start (int): The index of the first dead letter.
+        - count (int): The number of dead letters.
+
+        Returns:
+        - List[dict]: The dead letters, with the queue, task_id, data of the
+          task, raw payload of an unreadable task, error, attempts and
+          failed_at.
+        """
+        try:
+            entries = self.db.lrange(dead_letter_key(queue), start, start + count - 1)
+        except RedisError as e:
+            self._logger.error("Failed to get the dead letters: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Get Dead Letters") from e
+        return [json.loads(entry) for entry in entries]
+
+    def replay_dead_letters(self, queue: str, count: int = None) -> int:
+        """
+        Push the oldest dead letters of a queue back to it, with their
+        attempts reset.
+
+        Parameters:
+        - queue (str): The queue, e.g. UPDATE_ARTICLE_QUEUE.
+        - count (int, optional): The number of dead letters, all by default.
+
+        Returns:
+        - int: The number of replayed dead letters.
+        """
+        transport = self._transport(queue)
+        try:
+            replayed = self._replay_dead_letters(
+                keys=[
+                    dead_letter_key(queue),
+                    stream_key(queue) if transport == "stream" else queue,
+                    attempts_key(queue),
+                ],
+                args=[
+                    count if count is not None else self.db.llen(dead_letter_key(queue)),
+                    transport,
+                    self.transport_parameters.max_length,
+                    STREAM_DATA_FIELD,
+                ],
+            )
+        except RedisError as e:
+            self._logger.error("Failed to replay the dead letters: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Replay Dead Letters") from e
+
+        self._logger.info("Replayed %s dead letters of %s.", replayed, queue)
+        return replayed
+
+    def purge_dead_letters(self, queue: str) -> int:
+        """
+        Delete the dead letters of a queue.
+
+        Parameters:
+        - queue (str): The queue, e.g. UPDATE_ARTICLE_QUEUE.
+
+        Returns:
+        - int: The number of deleted dead letters.
+        """
+        try:
+            pipeline = self.db.pipeline(transaction=True)
+            pipeline.llen(dead_letter_key(queue))
+            pipeline.delete(dead_letter_key(queue))
+            purged, _ = pipeline.execute()
+        except RedisError as e:
+            self._logger.error("Failed to purge the dead letters: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Purge Dead Letters") from e
+
+        self._logger.info("Purged %s dead letters of %s.", purged, queue)
+        return purged
+
+    def get_queue_stats(self) -> dict:
+        """
+        Get the backlog of the queues.
+
+        Returns:
+        - dict: By queue, its transport and length. For a stream, the
+          length is the lag of the consumer group, the messages not
+          delivered yet, and pending the messages delivered and not
+          acknowledged. retrying is the number of failed tasks waiting
+          for their retry, and dead_letter the number of dead letters.
+        """
+        queues = {
+            UPDATE_ARTICLE_QUEUE: (
+                self.transport_parameters.articles_transport,
+                UPDATER_GROUP,
+            ),
+            **{
+                queue: (self.transport_parameters.questions_transport, ASKER_GROUP)
+                for queue in API_ASK_QUESTION_QUEUES.values()
+            },
+        }
+
+        stats = {}
+        try:
+            for queue, (transport, group) in queues.items():
+                if transport == "list":
+                    stats[queue] = {"transport": transport, "length": self.db.llen(queue)}
+                else:
+                    stats[queue] = {
+                        "transport": transport,
+                        **self._stream_backlog(stream_key(queue), group),
+                    }
+                stats[queue]["retrying"] = self.db.zcard(retry_key(queue))
+                stats[queue]["dead_letter"] = self.db.llen(dead_letter_key(queue))
+        except RedisError as e:
+            self._logger.error("Failed to get the queues backlog: %s.", e, exc_info=True)
+            raise RuntimeError("Fail Get Queue Stats") from e
+        return stats
+
+    def _transport(self, queue: str) -> str:
+        if queue == UPDATE_ARTICLE_QUEUE:
+            return self.transport_parameters.articles_transport
+        return self.transport_parameters.questions_transport
+
+    @staticmethod
+    def _task_id(task: Union[Article, RedisPoppedApiAskQuestion]) -> str:
+        return task.id if isinstance(task, Article) else task.token
+
+    def _read_task(self, queue: str, data: str, model, message: tuple = None):
+        """
+        Read a popped task as a model and keep its receipt. A task which
+        can't be read would fail again : it is moved to the dead letters
+        without retry.
+        """
+        try:
+            task = model(**json.loads(data))
+        except (ValidationError, ValueError, TypeError) as e:
+            self._logger.error("Failed to convert a task popped from %s: %s.", queue, e)
+            QUEUE_FAILURES.labels(queue, "unreadable").inc()
+            try:
+                pipeline = self.db.pipeline(transaction=True)
+                self._push_dead_letter(pipeline, queue, None, None, str(e), 1, raw=data)
+                if message is not None:
+                    pipeline.xack(*message)
+                pipeline.execute()
+            except RedisError as e:
+                self._logger.error(
+                    "Failed to dead letter a task of %s: %s.", queue, e, exc_info=True
+                )
+            return None
+
+        QUEUE_POPS.labels(queue).inc()
+        with self._receipts_lock:
+            self._receipts[id(task)] = (queue, data, message)
+        return task
+
+    def _push_dead_letter(
+        self,
+        pipeline,
+        queue: str,
+        task_id: str,
+        data: str,
+        error: str,
+        attempts: int,
+        raw: str = None,
+    ) -> None:
+        """
+        Add a dead letter to a pipeline, the list trimmed to
+        QUEUE_DEAD_LETTER_MAX_LENGTH entries. An unreadable task has no
+        data, its payload is kept as raw to be inspected.
+        """
+        pipeline.lpush(
+            dead_letter_key(queue),
+            json.dumps(
+                {
+                    "queue": queue,
+                    "task_id": task_id,
+                    "data": data,
+                    "raw": raw,
+                    "error": error,
+                    "attempts": attempts,
+                    "failed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                }
+            ),
+        )
+        if self.dead_letter_parameters.max_length:
+            pipeline.ltrim(
+                dead_letter_key(queue), 0, self.dead_letter_parameters.max_length - 1
+            )
+
+    def _requeue_due_retries(self, queues: List[str]) -> None:
+        """
+        Move the due retries of the queues back to them, at most every
+        RETRY_CHECK_INTERVAL_S seconds.
+        """
+        now = time.monotonic()
+        for queue in queues:
+            if now - self._requeued_at.get(queue, 0) < RETRY_CHECK_INTERVAL_S:
+                continue
+            self._requeued_at[queue] = now
+
+            transport = self._transport(queue)
+            requeued = self._requeue_retries(
+                keys=[
+                    retry_key(queue),
+                    stream_key(queue) if transport == "stream" else queue,
+                ],
+                args=[
+                    time.time(),
+                    RETRY_BATCH_SIZE,
+                    transport,
+                    self.transport_parameters.max_length,
+                    STREAM_DATA_FIELD,
+                ],
+            )
+            if requeued:
+                self._logger.info("Pushed back %s failed tasks to %s.", requeued, queue)
+
+    def _stream_backlog(self, stream: str, group: str) -> dict:
+        try:
+            groups = self.db.xinfo_groups(stream)
+        except ResponseError:
+            # The stream doesn't exist yet
+            return {"length": 0, "pending": 0}
+
+        for info in groups:
+            if info["name"] == group:
+                lag = info.get("lag")
+                return {
+                    # The lag is unknown after some trims and deletions
+                    "length": lag if lag is not None else self.db.xlen(stream),
+                    "pending": info["pending"],
+                }
+        return {"length": self.db.xlen(stream), "pending": 0}
+
+    def _stream_push(self, queue: str, data: str) -> None:
+        """
+        Add a task to the stream of a queue, trimmed around
+        QUEUE_STREAM_MAX_LENGTH entries.
+        """
+        max_length = self.transport_parameters.max_length
+        self.db.xadd(
+            stream_key(queue),
+            {STREAM_DATA_FIELD: data},
+            maxlen=max_length or None,
+            approximate=True,
+        )
+
+    def _stream_pop(self, queues: List[str], group: str, count: int, model):
+        """
+        Pop a task from the stream of the first queue holding one, as a model.
+
+        The messages stuck in a stopped consumer are claimed first, then
+        the new messages are read by batches of count, from each stream
+        in turn without blocking, then from all of them, waiting up to
+        QUEUE_STREAM_BLOCK_MS.
+        """
+        streams = [stream_key(queue) for queue in queues]
+        try:
+            self._requeue_due_retries(queues)
+            self._create_groups(streams, group)
+            message = self._next_message(streams, group, count)
+        except RedisError as e:
+            self._logger.error(
+                "Failed to read a task from the streams %s: %s.", streams, e, exc_info=True
+            )
+            raise RuntimeError("Fail Pop Stream Task") from e
+
+        if message is None:
+            return None
+
+        stream, message_id, fields = message
+        return self._read_task(
+            queues[streams.index(stream)],
+            fields.get(STREAM_DATA_FIELD),
+            model,
+            (stream, group, message_id),
+        )
+
+    def _create_groups(self, streams: List[str], group: str) -> None:
+        for stream in streams:
+            if (stream, group) in self._groups:
+                continue
+            try:
+                # From the start : the tasks added before the first
+                # consumer started are delivered
+                self.db.xgroup_create(stream, group, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self._groups.add((stream, group))
+
+    def _next_message(self, streams: List[str], group: str, count: int):
+        message = self._take_buffered(streams)
+        if message is not None:
+            return message
+
+        now = time.monotonic()
+        for stream in streams:
+            if now - self._claimed_at.get(stream, 0) < CLAIM_CHECK_INTERVAL_S:
+                continue
+            self._claimed_at[stream] = now
+            claimed = self.db.xautoclaim(
+                stream,
+                group,
+                self.consumer,
+                min_idle_time=self.transport_parameters.claim_idle_ms,
+                start_id="0-0",
+                count=count,
+            )
+            if claimed[1]:
+                self._logger.warning(
+                    "Claimed %s stuck tasks from %s.", len(claimed[1]), stream
+                )
+                self._buffer(stream, claimed[1], group)
+        message = self._take_buffered(streams)
+        if message is not None:
+            return message
+
+        for stream in streams:
+            read = self.db.xreadgroup(group, self.consumer, {stream: ">"}, count=count)
+            for read_stream, messages in read or []:
+                self._buffer(read_stream, messages, group)
+            message = self._take_buffered(streams)
+            if message is not None:
+                return message
+
+        if self.transport_parameters.block_ms:
+            read = self.db.xreadgroup(
+                group,
+                self.consumer,
+                {stream: ">" for stream in streams},
+                count=count,
+                block=self.transport_parameters.block_ms,
+            )
+            for read_stream, messages in read or []:
+                self._buffer(read_stream, messages, group)
+        return self._take_buffered(streams)
+
+    def _buffer(self, stream: str, messages: list, group: str) -> None:
+        buffer = self._buffers.setdefault(stream, deque())
+        for message_id, fields in messages:
+            if fields is None:
+                # Trimmed while pending
+                self.db.xack(stream, group, message_id)
+                continue
+            buffer.append((message_id, fields))
+
+    def _take_buffered(self, streams: List[str]):
+        for stream in streams:
+            buffer = self._buffers.get(stream)
+            if buffer:
+                message_id, fields = buffer.popleft()
+                return stream, message_id, fields
+        return None
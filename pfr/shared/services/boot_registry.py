@@ -0,0 +1,258 @@
+"""
+Registry of the services of an application, built lazily or
+concurrently at boot, with their initialization timings.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from pydantic import ValidationError
+
+from shared.services.boot_registry_parameters import BootRegistryParameters
+
+
+class BootRegistry:
+    """
+    Build the services of an application from their factories.
+
+    Note
+    ----
+    A service is registered with a factory, which gets the services it
+    depends on from the registry. It is built once, on its first get.
+    With BOOT_MODE="parallel", start builds every service in a thread
+    pool : the independent clients (Redis, Neo4j, GraphDB...) connect
+    concurrently, and a service waits only for its own dependencies.
+    With BOOT_MODE="lazy", start builds only the services registered
+    as required, and the other ones are built when the application
+    first uses them : it gets them from the registry when it needs
+    them, not when it's imported.
+
+    The application is ready once start returned : every service is
+    built, or the required ones with BOOT_MODE="lazy". Its readiness
+    is written into BOOT_READINESS_FILE, removed on exit, for the
+    probes of the orchestrator.
+
+    Parameters
+    ----------
+    app_config: dict
+        The configuration dictionary of the application.
+
+    Attributes
+    ----------
+    parameters: BootRegistryParameters
+        The boot parameters.
+
+    timings: dict
+        The initialization duration in seconds of each built service,
+        without the time spent building its dependencies.
+    """
+
+    def __init__(self, app_config: dict) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the registry is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = BootRegistryParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the boot registry's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self.timings = {}
+        self._factories = {}
+        self._descriptions = {}
+        self._required = set()
+        self._services = {}
+        self._errors = {}
+        self._locks = {}
+        self._started = False
+        # Time spent getting dependencies by the factory run in a thread
+        self._local = threading.local()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        description: str,
+        required: bool = False,
+    ) -> None:
+        """
+        Register a service.
+
+        Parameters
+        ----------
+        name: str
+            The name of the service, the one imported from the boot module.
+
+        factory: Callable
+            Builds the service, raising a RuntimeError on failure.
+
+        description: str
+            The service in the logs, e.g. "vector store client".
+
+        required: bool
+            Whether the service is built before the application is
+            ready with BOOT_MODE="lazy".
+        """
+        self._factories[name] = factory
+        self._descriptions[name] = description
+        self._locks[name] = threading.Lock()
+        if required:
+            self._required.add(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def built(self, name: str) -> bool:
+        """
+        Return whether a service was built, without building it.
+        """
+        return name in self._services
+
+    def get(self, name: str) -> Any:
+        """
+        Return a service, building it and its dependencies first if needed.
+
+        Raises
+        ------
+        RuntimeError
+            If the service or one of its dependencies could not be built.
+        """
+        if name in self._services:
+            return self._services[name]
+
+        start = time.perf_counter()
+        try:
+            with self._locks[name]:
+                if name in self._errors:
+                    # Built and failed by another thread, not tried again
+                    raise RuntimeError("Boot Failed") from self._errors[name]
+                if name not in self._services:
+                    self._build(name)
+            return self._services[name]
+        finally:
+            # Not counted in the timing of the service depending on it
+            self._local.dependencies = (
+                getattr(self._local, "dependencies", 0.0) + time.perf_counter() - start
+            )
+
+    def _build(self, name: str) -> None:
+        parent_dependencies = getattr(self._local, "dependencies", 0.0)
+        self._local.dependencies = 0.0
+
+        start = time.perf_counter()
+        try:
+            service = self._factories[name]()
+        except RuntimeError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Failed to initialize {self._descriptions[name]}.",
+            )
+            self._errors[name] = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            dependencies = self._local.dependencies
+            self._local.dependencies = parent_dependencies
+
+        self.timings[name] = duration - dependencies
+        self._services[name] = service
+        self._logger.info(
+            "Initialized %s in %.2f s.", self._descriptions[name], self.timings[name]
+        )
+
+    def start(self) -> None:
+        """
+        Build every service concurrently with BOOT_MODE="parallel", or
+        only the required ones with BOOT_MODE="lazy", then mark the
+        application ready.
+
+        Raises
+        ------
+        RuntimeError
+            If a service could not be built.
+        """
+        if self.parameters.mode == "lazy":
+            names = [name for name in self._factories if name in self._required]
+        else:
+            names = list(self._factories)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=self.parameters.max_workers, thread_name_prefix="boot"
+        ) as executor:
+            futures = [executor.submit(self.get, name) for name in names]
+            # Wait for every service, so a failure isn't reported while
+            # other services are still connecting
+            errors = [future.exception() for future in futures]
+
+        for error in errors:
+            if error is not None:
+                raise RuntimeError("Boot Failed") from error
+
+        self._logger.info(
+            "Boot done in %.2f s : %s.",
+            time.perf_counter() - start,
+            ", ".join(
+                f"{name} {duration:.2f} s"
+                for name, duration in sorted(
+                    self.timings.items(), key=lambda item: item[1], reverse=True
+                )
+            ),
+        )
+        self._started = True
+        self.mark_ready()
+
+    @property
+    def ready(self) -> bool:
+        return self._started
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Return the readiness of the application and the timings of the
+        services, for the readiness probes.
+        """
+        return {
+            "ready": self.ready,
+            "pending": [name for name in self._factories if name not in self._services],
+            "timings": {name: round(duration, 3) for name, duration in self.timings.items()},
+        }
+
+    def mark_ready(self) -> None:
+        """
+        Write the readiness file, removed when the application exits.
+        """
+        path = self.parameters.readiness_file
+        if not path:
+            return
+
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(str(os.getpid()))
+        except OSError as e:
+            self._logger.error("Failed to write the readiness file %s : %s.", path, e)
+            return
+
+        atexit.register(self.mark_not_ready)
+
+    def mark_not_ready(self) -> None:
+        path = self.parameters.readiness_file
+        if path and os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,15 @@
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class BootRegistryParameters(BaseModel):
+    """
+    Keep and validate the parameters for a BootRegistry. A pydantic
+    model is used to validate the entries on init.
+    """
+
+    mode: Literal["parallel", "lazy"] = Field(default="parallel", alias="BOOT_MODE")
+    max_workers: int = Field(default=8, gt=0, alias="BOOT_MAX_WORKERS")
+    readiness_file: str = Field(default="", max_length=255, alias="BOOT_READINESS_FILE")
@@ -0,0 +1,94 @@
+"""
+This function is used to return an asyncio Redis client, backed
+by a connection pool shared by the coroutines of the application.
+"""
+import logging
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis
+from redis.asyncio.connection import Connection
+from redis.asyncio.connection import UnixDomainSocketConnection
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis import RedisError
+from pydantic import ValidationError
+
+from shared.services.redis_client_parameters import RedisClientParameters
+
+
+def get_async_redis_client(app_config: dict = None, blocking: bool = False) -> Redis:
+    """
+    This function is used to return an asyncio Redis client, backed
+    by a connection pool shared by the coroutines of the application.
+
+    It ensure the presence and coherence of configuration
+    parameters needed by the service. The client must be created
+    inside the event loop using it, and closed with aclose. The pool
+    and retry parameters are the ones of get_redis_client.
+
+    Parameters
+    ----------
+    app_config
+        The configuration dictionary of the application.
+
+    blocking
+        Whether the client is used for the commands holding their
+        connection, the blocking reads and the subscriptions. Its pool
+        has REDIS_BLOCKING_MAX_CONNECTIONS connections, so they can't
+        take every connection of the pool of the short commands.
+
+    Returns
+    -------
+    redis.asyncio.Redis
+
+    Exceptions
+    -------
+    RuntimeError
+        Something went wrong during setup process.
+
+    """
+    logger = logging.getLogger(__name__)
+
+    if not isinstance(app_config, dict):
+        logger.critical(
+            exc_info=True,
+            msg="The configuration given to the db client is not of dict type."
+        )
+        raise RuntimeError("Bad Config Type")
+
+    try:
+        parameters = RedisClientParameters(**app_config)
+    except ValidationError as e:
+        logger.critical(
+            exc_info=True,
+            msg=f"Faulty parameter into the db client's configuration : {e}."
+        )
+        raise RuntimeError("Bad Config Parameter") from e
+
+    connection_kwargs = parameters.connection_kwargs()
+    if blocking:
+        connection_kwargs["max_connections"] = parameters.blocking_max_connections
+
+    try:
+        pool = BlockingConnectionPool(
+            connection_class=(
+                UnixDomainSocketConnection if parameters.unix_socket_path
+                else Connection
+            ),
+            # Retries the connection and timeout errors
+            retry=Retry(
+                ExponentialBackoff(
+                    cap=parameters.retry_backoff_cap_ms / 1000,
+                    base=parameters.retry_backoff_base_ms / 1000
+                ),
+                parameters.retries
+            ),
+            **connection_kwargs
+        )
+        # The client closes the pool with it
+        return Redis.from_pool(pool)
+    except RedisError as e:
+        logger.critical(
+            exc_info=True,
+            msg=f"Could not initialize DB client : {e}."
+        )
+        raise RuntimeError("DB Client Init Error") from e
@@ -5,8 +5,13 @@ If the engine is not initialized and no parameters are given,
 an error is raised.
 """
 import logging
+from redis import BlockingConnectionPool
 from redis import Redis
 from redis import RedisError
+from redis.backoff import ExponentialBackoff
+from redis.connection import Connection
+from redis.connection import UnixDomainSocketConnection
+from redis.retry import Retry
 from pydantic import ValidationError
 
 from shared.services.redis_client_parameters import RedisClientParameters
@@ -19,7 +24,11 @@ def get_redis_client(app_config: dict = None) -> Redis:
     an error is raised.
 
     It ensure the presence and coherence of configuration
-    parameters needed by the service.
+    parameters needed by the service. The client is backed by a pool of
+    REDIS_MAX_CONNECTIONS connections, shared by the threads of the
+    application : a thread waits up to REDIS_POOL_TIMEOUT_S for a free
+    connection. The commands failing on a connection or timeout error
+    are retried REDIS_RETRIES times with an exponential backoff.
 
     Parameters
     ----------
@@ -28,7 +37,7 @@ def get_redis_client(app_config: dict = None) -> Redis:
 
     Returns
     -------
-    MongoClient
+    Redis
 
     Exceptions
     -------
@@ -56,14 +65,22 @@ def get_redis_client(app_config: dict = None) -> Redis:
         raise RuntimeError("Bad Config Parameter") from e
 
     try:
-        return Redis(
-            host=parameters.host,
-            port=parameters.port,
-            username=parameters.user,
-            password=parameters.pwd,
-            ssl=False,
-            decode_responses=True
+        pool = BlockingConnectionPool(
+            connection_class=(
+                UnixDomainSocketConnection if parameters.unix_socket_path
+                else Connection
+            ),
+            # Retries the connection and timeout errors
+            retry=Retry(
+                ExponentialBackoff(
+                    cap=parameters.retry_backoff_cap_ms / 1000,
+                    base=parameters.retry_backoff_base_ms / 1000
+                ),
+                parameters.retries
+            ),
+            **parameters.connection_kwargs()
         )
+        return Redis(connection_pool=pool)
     except RedisError as e:
         logger.critical(
             exc_info=True,
@@ -0,0 +1,50 @@
+"""
+This function is used to return the usage of the connection pool
+of a Redis client, to tune REDIS_MAX_CONNECTIONS.
+"""
+from typing import Union
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+
+def get_redis_pool_stats(db: Union[Redis, AsyncRedis]) -> dict:
+    """
+    This function is used to return the usage of the connection pool
+    of a Redis client, created by get_redis_client or
+    get_async_redis_client.
+
+    redis-py doesn't expose these counters : they are read from the
+    pool internals, and are 0 for an unknown pool implementation.
+
+    Parameters
+    ----------
+    db
+        The sync or asyncio Redis client.
+
+    Returns
+    -------
+    dict
+        max_connections, the size of the pool, created, the connections
+        opened, in_use, the connections used by a command, and idle.
+    """
+    pool = db.connection_pool
+
+    if hasattr(pool, "_in_use_connections"):
+        # Pools keeping their free and used connections apart
+        in_use = len(pool._in_use_connections)
+        idle = len(pool._available_connections)
+    elif hasattr(pool, "pool") and hasattr(pool, "_connections"):
+        # Sync blocking pool : a queue of free connections, or None
+        # for the connections not opened yet
+        idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+        in_use = len(pool._connections) - idle
+    else:
+        in_use = idle = 0
+
+    return {
+        "max_connections": pool.max_connections,
+        "created": in_use + idle,
+        "in_use": in_use,
+        "idle": idle,
+    }
@@ -5,6 +5,8 @@ If the engine is not initialized and no parameters are given,
 an error is raised.
 """
 import logging
+import threading
+import time
 from pydantic import ValidationError
 from requests import Request
 from requests import Response
@@ -13,6 +15,7 @@ from requests.exceptions import ConnectionError
 from requests.exceptions import HTTPError
 
 from shared.services.graphdb_client_parameters import GraphDBClientParameters
+from shared.services.metrics import GRAPHDB_SECONDS
 
 class GraphDBClient:
     """
@@ -24,6 +27,11 @@ class GraphDBClient:
     first and a GDB token is given to him. this token his used in
     each next request to the database.
 
+    When the token expires, GraphDB answers with a 401 or 403 status.
+    The client then refreshes the token once and replays the request.
+    If GRAPHDB_TOKEN_REFRESH_S is set, the token is also refreshed
+    ahead of its expiry.
+
     """
 
     def __init__(self, app_config: dict = None):
@@ -48,6 +56,8 @@ class GraphDBClient:
 
         self.auth_session = Session()
         self.token_session = None
+        self.token_time = None
+        self._token_lock = threading.Lock()
         self.getToken()
 
     def getToken(self):
@@ -62,6 +72,43 @@ class GraphDBClient:
         -------
         None
         """
+        with self._token_lock:
+            self._login()
+
+    def refresh_token(self, stale_session: Session = None) -> Session:
+        """
+        Refresh the authorization token, unless another thread already
+        did it since the given session was used.
+
+        Parameters
+        ----------
+        stale_session: Session
+            The token session whose token was rejected or is expired.
+
+        Returns
+        -------
+        Session
+            The token session to use for the next requests.
+        """
+        with self._token_lock:
+            if self.token_session is None or self.token_session is stale_session:
+                self.logger.info("Refreshing the GraphDB authorization token.")
+                self._login()
+            return self.token_session
+
+    def _token_expired(self) -> bool:
+        """
+        Tell if the token is old enough to be refreshed ahead of its expiry.
+        """
+        if self.parameters.token_refresh_s == 0 or self.token_time is None:
+            return False
+        return time.monotonic() - self.token_time >= self.parameters.token_refresh_s
+
+    def _login(self):
+        """
+        Send the credentials to GraphDB and keep the returned token
+        in a new session. The caller must hold the token lock.
+        """
         self.auth_session.headers.update({'X-GraphDB-Password': self.parameters.pwd})
 
         try:
@@ -76,10 +123,12 @@ class GraphDBClient:
         if "authorization" not in response.headers:
             raise RuntimeError(f"GraphDB Token Retrieve Error : Token absent of the DB response.")
         
-        self.token_session = Session()
-        self.token_session.headers["authorization"] = response.headers["authorization"]
+        token_session = Session()
+        token_session.headers["authorization"] = response.headers["authorization"]
+        self.token_session = token_session
+        self.token_time = time.monotonic()
 
-    def request(self, request: Request) -> Response:
+    def request(self, request: Request, operation: str = "request") -> Response:
         """
         Pass a request to the grapDB database and add the elements 
         needed to reach it and be authorized.
@@ -89,6 +138,8 @@ class GraphDBClient:
         a request object. The URL used must be relative, the method
         will add the host and port used to reach the db.
 
+        operation: the label of its latency in pfr_graphdb_request_seconds.
+
         Exemple
         ----------
         request = Request('GET', '/rest/repositories/pfr')
@@ -102,8 +153,9 @@ class GraphDBClient:
         Response object
         """
 
-        if self.token_session is None:
-            self.getToken()
+        token_session = self.token_session
+        if token_session is None or self._token_expired():
+            token_session = self.refresh_token(token_session)
 
         if not isinstance(request, Request):
             self.logger.error(
@@ -114,8 +166,21 @@ class GraphDBClient:
         
         try:
             request.url = f"http://{self.parameters.host}:{self.parameters.port}{request.url}"
-            prepared_request = self.token_session.prepare_request(request=request)
-            response = self.token_session.send(prepared_request)
+            prepared_request = token_session.prepare_request(request=request)
+            with GRAPHDB_SECONDS.labels(operation).time():
+                response = token_session.send(prepared_request)
+
+            # The token expired or was revoked : refresh it once and retry
+            if response.status_code in (401, 403):
+                self.logger.warning(
+                    "GraphDB rejected the token (status %s), retrying with a new one.",
+                    response.status_code
+                )
+                token_session = self.refresh_token(token_session)
+                prepared_request = token_session.prepare_request(request=request)
+                with GRAPHDB_SECONDS.labels(operation).time():
+                    response = token_session.send(prepared_request)
+
             response.raise_for_status()
             return response
         except ConnectionError as e:
@@ -126,4 +191,43 @@ class GraphDBClient:
         
     def request_update(self, data):
         request = Request('POST', '/repositories/pfr/statements', headers={"Content-Type": "application/sparql-update"}, data=data)
-        self.request(request=request)
+        self.request(request=request, operation="update")
+
+    def request_query(self, query: str) -> dict:
+        """
+        Send a SPARQL SELECT query to the repository.
+
+        Parameters
+        ----------
+        query: str
+            The SPARQL query.
+
+        Returns
+        -------
+        dict
+            The SPARQL JSON results.
+        """
+        request = Request('POST', '/repositories/pfr', headers={"Content-Type": "application/sparql-query", "Accept": "application/sparql-results+json"}, data=query)
+        return self.request(request=request, operation="query").json()
+
+    def request_upload(self, data, content_type: str = "application/n-triples", context: str = None):
+        """
+        Upload an RDF document in the repository through the
+        statements endpoint. Much faster than SPARQL updates to
+        load a large number of triples.
+
+        Parameters
+        ----------
+        data
+            The RDF document (bytes or str).
+
+        content_type: str
+            The RDF format of the document.
+
+        context: str
+            IRI of the named graph where the statements are added.
+            If None, the statements go in the default graph.
+        """
+        params = {"context": f"<{context}>"} if context is not None else None
+        request = Request('POST', '/repositories/pfr/statements', headers={"Content-Type": content_type}, params=params, data=data)
+        self.request(request=request, operation="upload")
@@ -12,4 +12,5 @@ class GraphDBClientParameters(BaseModel):
     port: int = Field(gt=0, alias="GRAPHDB_PORT")
     time_out_ms: int = Field(gt=0, alias="GRAPHDB_TIME_OUT_MS")
     user: str = Field(min_length=1, max_length=255, alias="GRAPHDB_USER")
-    pwd: str = Field(min_length=1, max_length=255, alias="GRAPHDB_PWD")
\ No newline at end of file
+    pwd: str = Field(min_length=1, max_length=255, alias="GRAPHDB_PWD")
+    token_refresh_s: int = Field(default=0, ge=0, alias="GRAPHDB_TOKEN_REFRESH_S")
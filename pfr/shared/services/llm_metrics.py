@@ -0,0 +1,71 @@
+"""
+LangChain callback recording the latency and the tokens of each call
+of the model it is given to, in the Prometheus metrics.
+"""
+import threading
+import time
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from shared.services.metrics import LLM_SECONDS
+from shared.services.metrics import LLM_TOKENS
+
+
+class LlmMetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Observe pfr_llm_seconds and count pfr_llm_tokens_total for the calls
+    of a model. The tokens are the ones reported by the provider, which
+    OpenAI doesn't report for a streamed answer.
+
+    Parameters
+    ----------
+    chain: str
+        The label of the calls, e.g. "answer".
+    """
+
+    def __init__(self, chain: str) -> None:
+        self.chain = chain
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._stop(run_id)
+
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if token_usage.get(kind):
+                LLM_TOKENS.labels(self.chain, kind.split("_")[0]).inc(token_usage[kind])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # A failed call isn't observed, its time would blur the latency
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+    def _start(self, run_id: UUID) -> None:
+        with self._lock:
+            self._starts[run_id] = time.perf_counter()
+
+    def _stop(self, run_id: UUID) -> None:
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_SECONDS.labels(self.chain).observe(time.perf_counter() - start)
@@ -0,0 +1,323 @@
+"""
+Prometheus metrics of the applications, and the HTTP server exposing
+them for the workers. The API exposes them on /metrics.
+
+The metrics are module globals, as prometheus_client expects : they are
+registered once per process, and updated by the services from any thread.
+With PROMETHEUS_MULTIPROC_DIR, the gauges are merged across the workers
+by their multiprocess_mode.
+"""
+import logging
+import os
+from typing import Any, Callable, Dict
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+from prometheus_client import start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.core import REGISTRY
+from pydantic import ValidationError
+
+from shared.services.metrics_parameters import MetricsParameters
+
+# Buckets of the calls to a model or an external API, slower than the default
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+QUEUE_PUSHES = Counter(
+    "pfr_queue_pushes_total", "Tasks pushed to a queue.", ["queue"]
+)
+QUEUE_POPS = Counter(
+    "pfr_queue_pops_total", "Tasks popped from a queue.", ["queue"]
+)
+QUEUE_FAILURES = Counter(
+    "pfr_queue_failures_total",
+    "Failed tasks of a queue, retried or dead lettered.",
+    ["queue", "outcome"],
+)
+GRAPHDB_SECONDS = Histogram(
+    "pfr_graphdb_request_seconds",
+    "Latency of the requests to GraphDB.",
+    ["operation"],
+)
+EMBEDDING_SECONDS = Histogram(
+    "pfr_embedding_batch_seconds",
+    "Latency of the calls to the embedding model.",
+    ["kind"],
+    buckets=SLOW_BUCKETS,
+)
+EMBEDDING_TEXTS = Counter(
+    "pfr_embedding_texts_total", "Texts given to the embedding model.", ["kind"]
+)
+LLM_SECONDS = Histogram(
+    "pfr_llm_seconds",
+    "Latency of the calls to the LLM.",
+    ["chain"],
+    buckets=SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "pfr_llm_tokens_total",
+    "Tokens of the calls to the LLM, when reported by the provider.",
+    ["chain", "kind"],
+)
+QUESTION_PROMPT_TOKENS = Histogram(
+    "pfr_question_prompt_tokens",
+    "Tokens of the prompt answering a question.",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+QUESTION_SECONDS = Histogram(
+    "pfr_question_seconds",
+    "Time to handle a popped question.",
+    ["outcome"],
+    buckets=SLOW_BUCKETS,
+)
+RETRIEVAL_BRANCHES_IN_FLIGHT = Gauge(
+    "pfr_retrieval_branches_in_flight",
+    "Calls of a retrieval branch still running, timed out ones included.",
+    ["branch"],
+    # Summed over the running workers
+    multiprocess_mode="livesum",
+)
+ANSWER_CACHE_LOOKUPS = Counter(
+    "pfr_answer_cache_lookups_total",
+    "Lookups of a question in the answer caches.",
+    ["cache", "result"],
+)
+HTTP_SECONDS = Histogram(
+    "pfr_http_request_seconds",
+    "Latency of the API requests, by route template.",
+    ["method", "route", "status"],
+)
+RETRIEVER_SECONDS = Histogram(
+    "pfr_retriever_seconds",
+    "Time to fetch and convert a page of records from the source API.",
+    ["step"],
+    buckets=SLOW_BUCKETS,
+)
+ARTICLES_RETRIEVED = Counter(
+    "pfr_retriever_articles_total", "Articles retrieved from the source API."
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "pfr_rate_limit_wait_seconds",
+    "Time waited for the rate limiter before a call to the provider.",
+    buckets=(0.0, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0),
+)
+BOOT_SECONDS = Gauge(
+    "pfr_boot_seconds",
+    "Initialization duration of a service, without its dependencies.",
+    ["service"],
+    # The slowest worker
+    multiprocess_mode="max",
+)
+
+# The CallbackCollectors registered by the process, also read by the
+# registry of /metrics with PROMETHEUS_MULTIPROC_DIR
+CALLBACK_COLLECTORS = []
+
+
+class CallbackCollector:
+    """
+    Gauges read when Prometheus scrapes the process, e.g. the backlog
+    of the queues. A failing callback is logged and its gauges skipped.
+    Registered with register_callback_collector.
+
+    Parameters
+    ----------
+    name: str
+        The name of the gauge family.
+
+    documentation: str
+        The help of the gauge family.
+
+    labels: list
+        The labels of the gauges.
+
+    callback: Callable
+        Returns the value of each gauge by its tuple of label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: list,
+        callback: Callable[[], Dict[tuple, float]],
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.callback = callback
+
+    def describe(self) -> list:
+        # Not read at registration : the callback may need Redis
+        return [GaugeMetricFamily(self.name, self.documentation, labels=self.labels)]
+
+    def collect(self) -> list:
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labels)
+        try:
+            values = self.callback()
+        except Exception as e:
+            self._logger.warning("Failed to collect the metric %s : %s.", self.name, e)
+            return [family]
+
+        for label_values, value in values.items():
+            family.add_metric(list(label_values), value)
+        return [family]
+
+
+def register_callback_collector(collector: CallbackCollector) -> None:
+    """
+    Register a CallbackCollector in the registry of the process, and keep
+    it for the registry of the workers with PROMETHEUS_MULTIPROC_DIR.
+
+    Its gauges aren't written in the multiprocess files : they are read
+    by the process answering the scrape. The backlog of the queues is the
+    same from any process, the Redis pools are the ones of this process.
+    """
+    REGISTRY.register(collector)
+    CALLBACK_COLLECTORS.append(collector)
+
+
+class TimedEmbeddings:
+    """
+    Embedding model observing the latency of its calls in
+    pfr_embedding_batch_seconds, by kind : "documents" or "query".
+
+    Parameters
+    ----------
+    embeddings
+        The embedding model, e.g. OpenAIEmbeddings.
+    """
+
+    def __init__(self, embeddings: Any) -> None:
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: list) -> list:
+        EMBEDDING_TEXTS.labels("documents").inc(len(texts))
+        with EMBEDDING_SECONDS.labels("documents").time():
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        EMBEDDING_TEXTS.labels("query").inc()
+        with EMBEDDING_SECONDS.labels("query").time():
+            return self.embeddings.embed_query(text)
+
+    def __getattr__(self, name: str) -> Any:
+        # The other methods and attributes of the model, not timed
+        return getattr(self.embeddings, name)
+
+
+def register_queue_stats(update_queues: Any) -> None:
+    """
+    Expose the backlog of the queues, read from UpdateQueues.get_queue_stats
+    on each scrape, as pfr_queue_depth{queue, state}.
+    """
+    def queue_depth() -> Dict[tuple, float]:
+        return {
+            (queue, state): value
+            for queue, stats in update_queues.get_queue_stats().items()
+            for state, value in stats.items()
+            if state != "transport"
+        }
+
+    register_callback_collector(
+        CallbackCollector(
+            "pfr_queue_depth",
+            "Tasks of a queue : waiting (length), delivered and not "
+            "acknowledged (pending), waiting for a retry, or dead lettered.",
+            ["queue", "state"],
+            queue_depth,
+        )
+    )
+
+
+def register_redis_pool_stats(pools: Dict[str, Any]) -> None:
+    """
+    Expose the usage of the Redis connection pools of clients, read on
+    each scrape, as pfr_redis_pool_connections{pool,state}.
+
+    Parameters
+    ----------
+    pools: dict
+        The clients by pool name, e.g. {"commands": db_client}.
+    """
+    from shared.services.get_redis_pool_stats import get_redis_pool_stats
+
+    def pool_connections() -> Dict[tuple, float]:
+        connections = {}
+        for pool, db in pools.items():
+            stats = get_redis_pool_stats(db)
+            connections[(pool, "max")] = stats["max_connections"]
+            connections[(pool, "in_use")] = stats["in_use"]
+            connections[(pool, "idle")] = stats["idle"]
+        return connections
+
+    register_callback_collector(
+        CallbackCollector(
+            "pfr_redis_pool_connections",
+            "Connections of the Redis pools, by pool and state.",
+            ["pool", "state"],
+            pool_connections,
+        )
+    )
+
+
+def set_boot_timings(timings: Dict[str, float]) -> None:
+    """
+    Expose the initialization durations of BootRegistry.timings.
+    """
+    for service, duration in timings.items():
+        BOOT_SECONDS.labels(service).set(duration)
+
+
+def start_metrics_server(app_config: dict) -> None:
+    """
+    Serve the metrics of a worker on METRICS_PORT, from a daemon thread.
+    Does nothing when METRICS_PORT is 0.
+
+    Parameters
+    ----------
+    app_config: dict
+        The configuration dictionary of the application.
+
+    Raises
+    ------
+    RuntimeError
+        If the parameters are wrong or the port can't be bound.
+    """
+    logger = logging.getLogger(__name__)
+
+    if not isinstance(app_config, dict):
+        logger.critical(
+            msg="The configuration given to the metrics server is not of dict type."
+        )
+        raise RuntimeError("Bad Config Type")
+
+    try:
+        parameters = MetricsParameters(**app_config)
+    except ValidationError as e:
+        logger.critical(
+            exc_info=True,
+            msg=f"Faulty parameter into the metrics server's configuration : {e}.",
+        )
+        raise RuntimeError("Bad Config Parameter") from e
+
+    if not parameters.port:
+        return
+
+    try:
+        start_http_server(parameters.port, addr=parameters.address)
+    except OSError as e:
+        logger.critical(
+            exc_info=True,
+            msg=f"Could not serve the metrics on port {parameters.port} : {e}.",
+        )
+        raise RuntimeError("Metrics Server Init Error") from e
+
+    logger.info(
+        "Metrics served on http://%s:%s/metrics (pid %s).",
+        parameters.address,
+        parameters.port,
+        os.getpid(),
+    )
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class MetricsParameters(BaseModel):
+    """
+    Keep and validate the parameters for the metrics server of a worker.
+    A pydantic model is used to validate the entries on init.
+    """
+
+    port: int = Field(default=0, ge=0, le=65535, alias="METRICS_PORT")
+    address: str = Field(default="0.0.0.0", max_length=255, alias="METRICS_ADDRESS")
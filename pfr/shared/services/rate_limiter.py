@@ -0,0 +1,200 @@
+"""
+Thread-safe token bucket limiting the requests sent to a provider,
+the LangChain callback applying it before each LLM call, and the
+embedding model applying it before each embedding call.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from pydantic import ValidationError
+
+from shared.services.metrics import RATE_LIMIT_WAIT_SECONDS
+from shared.services.rate_limiter_parameters import RateLimiterParameters
+
+# Rough size of a token, used to estimate the tokens of a prompt
+CHARACTERS_PER_TOKEN = 4
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread calling a provider.
+
+    Note
+    ----
+    Two buckets are kept : one for the requests, one for the prompt
+    tokens, refilled continuously up to their limit per minute. A call
+    to acquire blocks until both buckets hold enough, and the time it
+    waited is observed in pfr_rate_limit_wait_seconds. A limit of 0
+    disables its bucket.
+
+    Parameters
+    ----------
+    app_config: dict
+        The configuration dictionary of the application.
+
+    Attributes
+    ----------
+    parameters: RateLimiterParameters
+        The limits per minute.
+    """
+
+    def __init__(self, app_config: dict) -> None:
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                msg="The configuration given to the rate limiter is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        try:
+            self.parameters = RateLimiterParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the rate limiter's configuration : {e}.",
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        self._lock = threading.Lock()
+        self._requests = float(self.parameters.requests_per_minute)
+        self._tokens = float(self.parameters.tokens_per_minute)
+        self._refill_time = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.parameters.requests_per_minute > 0
+            or self.parameters.tokens_per_minute > 0
+        )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Block until a request of the given size can be sent.
+
+        Parameters
+        ----------
+        tokens: int
+            The estimated number of tokens of the request.
+        """
+        if not self.enabled:
+            return
+
+        # A request bigger than the bucket would wait forever
+        if self.parameters.tokens_per_minute > 0:
+            tokens = min(tokens, self.parameters.tokens_per_minute)
+
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill()
+                wait_s = max(
+                    self._missing_time(
+                        self._requests, 1, self.parameters.requests_per_minute
+                    ),
+                    self._missing_time(
+                        self._tokens, tokens, self.parameters.tokens_per_minute
+                    ),
+                )
+                if wait_s == 0:
+                    if self.parameters.requests_per_minute > 0:
+                        self._requests -= 1
+                    if self.parameters.tokens_per_minute > 0:
+                        self._tokens -= tokens
+                    RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - start)
+                    return
+
+            time.sleep(wait_s)
+
+    def _refill(self) -> None:
+        """
+        Refill the buckets for the time elapsed since the last call.
+        The caller must hold the lock.
+        """
+        now = time.monotonic()
+        elapsed_min = (now - self._refill_time) / 60
+        self._refill_time = now
+        self._requests = min(
+            float(self.parameters.requests_per_minute),
+            self._requests + elapsed_min * self.parameters.requests_per_minute,
+        )
+        self._tokens = min(
+            float(self.parameters.tokens_per_minute),
+            self._tokens + elapsed_min * self.parameters.tokens_per_minute,
+        )
+
+    @staticmethod
+    def _missing_time(available: float, needed: int, per_minute: int) -> float:
+        """
+        Time in seconds before a bucket holds the needed amount.
+        """
+        if per_minute == 0 or available >= needed:
+            return 0
+        return (needed - available) * 60 / per_minute
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback waiting on a RateLimiter before each call of
+    the model it is given to. The tokens of the prompt are estimated
+    from its length.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter) -> None:
+        self.rate_limiter = rate_limiter
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
+    ) -> None:
+        self.rate_limiter.acquire(
+            sum(len(prompt) for prompt in prompts) // CHARACTERS_PER_TOKEN
+        )
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        **kwargs: Any,
+    ) -> None:
+        self.rate_limiter.acquire(
+            sum(len(str(message.content)) for batch in messages for message in batch)
+            // CHARACTERS_PER_TOKEN
+        )
+
+
+class RateLimitedEmbeddings:
+    """
+    Embedding model waiting on a RateLimiter before each call, so the
+    embeddings of the questions share the limits of the chat models.
+    The tokens of the texts are estimated from their length.
+
+    Parameters
+    ----------
+    embeddings
+        The embedding model, e.g. OpenAIEmbeddings.
+
+    rate_limiter: RateLimiter
+        The rate limiter of the provider.
+    """
+
+    def __init__(self, embeddings: Any, rate_limiter: RateLimiter) -> None:
+        self.embeddings = embeddings
+        self.rate_limiter = rate_limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.rate_limiter.acquire(
+            sum(len(text) for text in texts) // CHARACTERS_PER_TOKEN
+        )
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.rate_limiter.acquire(len(text) // CHARACTERS_PER_TOKEN)
+        return self.embeddings.embed_query(text)
+
+    def __getattr__(self, name: str) -> Any:
+        # The other methods and attributes of the model, not limited
+        return getattr(self.embeddings, name)
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class RateLimiterParameters(BaseModel):
+    """
+    Keep and validate the parameters for a RateLimiter. A pydantic
+    model is used to validate the entries on init.
+    """
+
+    requests_per_minute: int = Field(
+        default=0, ge=0, alias="OPENAI_MAX_REQUESTS_PER_MINUTE"
+    )
+    tokens_per_minute: int = Field(default=0, ge=0, alias="OPENAI_MAX_TOKENS_PER_MINUTE")
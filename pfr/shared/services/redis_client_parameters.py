@@ -12,4 +12,47 @@ class RedisClientParameters(BaseModel):
     port: int = Field(gt=0, alias="REDIS_PORT")
     time_out_ms: int = Field(gt=0, alias="REDIS_TIME_OUT_MS")
     user: str = Field(min_length=1, max_length=255, alias="REDIS_USER")
-    pwd: str = Field(min_length=1, max_length=255, alias="REDIS_PWD")
\ No newline at end of file
+    pwd: str = Field(min_length=1, max_length=255, alias="REDIS_PWD")
+    unix_socket_path: str = Field(
+        default="", max_length=255, alias="REDIS_UNIX_SOCKET_PATH"
+    )
+    max_connections: int = Field(default=50, gt=0, alias="REDIS_MAX_CONNECTIONS")
+    blocking_max_connections: int = Field(
+        default=200, gt=0, alias="REDIS_BLOCKING_MAX_CONNECTIONS"
+    )
+    pool_timeout_s: float = Field(default=20, gt=0, alias="REDIS_POOL_TIMEOUT_S")
+    socket_timeout_ms: int = Field(default=30000, ge=0, alias="REDIS_SOCKET_TIMEOUT_MS")
+    socket_keepalive: bool = Field(default=True, alias="REDIS_SOCKET_KEEPALIVE")
+    health_check_interval_s: int = Field(
+        default=30, ge=0, alias="REDIS_HEALTH_CHECK_INTERVAL_S"
+    )
+    retries: int = Field(default=3, ge=0, alias="REDIS_RETRIES")
+    retry_backoff_base_ms: int = Field(
+        default=100, gt=0, alias="REDIS_RETRY_BACKOFF_BASE_MS"
+    )
+    retry_backoff_cap_ms: int = Field(
+        default=2000, gt=0, alias="REDIS_RETRY_BACKOFF_CAP_MS"
+    )
+
+    def connection_kwargs(self) -> dict:
+        """
+        The connection parameters shared by the sync and asyncio pools,
+        without the connection class and the retry policy.
+        """
+        kwargs = {
+            "username": self.user,
+            "password": self.pwd,
+            "socket_connect_timeout": self.time_out_ms / 1000,
+            "socket_timeout": self.socket_timeout_ms / 1000 or None,
+            "health_check_interval": self.health_check_interval_s,
+            "max_connections": self.max_connections,
+            "timeout": self.pool_timeout_s,
+            "decode_responses": True,
+        }
+        if self.unix_socket_path:
+            kwargs["path"] = self.unix_socket_path
+        else:
+            kwargs["host"] = self.host
+            kwargs["port"] = self.port
+            kwargs["socket_keepalive"] = self.socket_keepalive
+        return kwargs
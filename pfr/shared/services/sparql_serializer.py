@@ -0,0 +1,131 @@
+"""
+Serialize RDF terms for the graph writes and build the SPARQL / N-Triples
+documents sent to GraphDB.
+
+The terms are written in the N-Triples syntax, which is also valid
+in SPARQL, so the same triples can be used by both.
+"""
+import re
+
+# Characters not allowed in an IRI reference (RDF 1.1 N-Triples IRIREF)
+IRI_FORBIDDEN_CHARACTERS = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+IRI_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.\-]*:")
+
+LITERAL_ESCAPES = {
+    "\\": "\\\\",
+    '"': '\\"',
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    "\b": "\\b",
+    "\f": "\\f",
+}
+LITERAL_ESCAPED_CHARACTERS = re.compile(r'[\\"\x00-\x1f\x7f]')
+
+
+def iri(value: str) -> str:
+    """
+    Serialize an absolute IRI.
+
+    Parameters
+    ----------
+    value: str
+        The IRI, without the angle brackets.
+
+    Returns
+    -------
+    str
+        The IRI term.
+
+    Raises
+    ------
+    ValueError
+        If the value is not an absolute IRI or holds forbidden characters.
+    """
+    if not isinstance(value, str) or IRI_SCHEME.match(value) is None:
+        raise ValueError(f"Not an absolute IRI : {value!r}")
+
+    if IRI_FORBIDDEN_CHARACTERS.search(value) is not None:
+        raise ValueError(f"Forbidden character in IRI : {value!r}")
+
+    return f"<{value}>"
+
+
+def literal(value: str, datatype: str = None) -> str:
+    """
+    Serialize a string literal, escaping the quotes, backslashes and
+    control characters.
+
+    Parameters
+    ----------
+    value: str
+        The lexical form of the literal.
+
+    datatype: str
+        IRI of the datatype of the literal. None for a plain string.
+
+    Returns
+    -------
+    str
+        The literal term.
+    """
+    escaped = LITERAL_ESCAPED_CHARACTERS.sub(
+        lambda match: LITERAL_ESCAPES.get(match.group(), f"\\u{ord(match.group()):04X}"),
+        str(value),
+    )
+
+    if datatype is None:
+        return f'"{escaped}"'
+    return f'"{escaped}"^^{iri(datatype)}'
+
+
+class SparqlWriter:
+    """
+    Build a SPARQL or N-Triples document. The pieces are kept in a list
+    and joined once by render, instead of growing a string.
+
+    Exemple
+    ----------
+    writer = SparqlWriter()
+    writer.insert_data("pfr:pfr", triples)
+    client.request_update(data=writer.render())
+    """
+
+    def __init__(self) -> None:
+        self._parts = []
+
+    def write(self, *parts: str) -> "SparqlWriter":
+        """
+        Append raw pieces of document.
+        """
+        self._parts.extend(parts)
+        return self
+
+    def triples(self, triples: list) -> "SparqlWriter":
+        """
+        Append (subject, predicate, object) tuples of serialized terms
+        as triple patterns, one per line.
+        """
+        for subject, predicate, obj in triples:
+            self._parts.extend((subject, " ", predicate, " ", obj, " .\n"))
+        return self
+
+    def insert_data(self, graph: str, triples: list) -> "SparqlWriter":
+        """
+        Append an INSERT DATA operation of triples into a named graph.
+        """
+        self.write("INSERT DATA {\nGRAPH ", iri(graph), " {\n")
+        self.triples(triples)
+        return self.write("}\n}\n")
+
+    def next_operation(self) -> "SparqlWriter":
+        """
+        Separate two operations of a same update request.
+        """
+        return self.write(";\n")
+
+    def render(self) -> str:
+        """
+        Return the document.
+        """
+        return "".join(self._parts)
@@ -0,0 +1,86 @@
+"""
+Thread-safe in-memory cache bounded in size and in age.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TtlLruCache:
+    """
+    In-memory cache evicting its least recently used entries above
+    max_size, and its entries older than ttl_s.
+
+    Note
+    ----
+    A max_size of 0 disables the cache : nothing is kept. A ttl_s of 0
+    keeps the entries until they are evicted. The cache is shared by the
+    threads of an application, its methods hold a lock.
+
+    Parameters
+    ----------
+    max_size: int
+        The maximum number of entries.
+
+    ttl_s: float
+        The maximum age in seconds of an entry.
+
+    Attributes
+    ----------
+    hits, misses: int
+        Lookup counters since the creation of the cache.
+    """
+
+    def __init__(self, max_size: int, ttl_s: float = 0) -> None:
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # key -> (expiry, value), ordered from the least recently used
+        self._entries = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value of a key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Keep the value of a key, evicting the least recently used entries.
+        """
+        if not self.enabled:
+            return
+
+        expiry = time.monotonic() + self.ttl_s if self.ttl_s else 0
+        with self._lock:
+            self._entries[key] = (expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -5,14 +5,20 @@ If the engine is not initialized and no parameters are given,
 an error is raised.
 """
 import logging
+from typing import TYPE_CHECKING
 from pydantic import ValidationError
 
-from langchain.vectorstores.neo4j_vector import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
-
 from shared.services.vector_store_client_parameters import VectorStoreClientParameters
 
-def get_vector_store_client(app_config: dict = None) -> Neo4jVector:
+# LangChain takes seconds to import : it's imported by the function
+if TYPE_CHECKING:
+    from langchain.vectorstores.neo4j_vector import Neo4jVector
+    from shared.services.rate_limiter import RateLimiter
+
+
+def get_vector_store_client(
+    app_config: dict = None, rate_limiter: "RateLimiter" = None
+) -> "Neo4jVector":
     """
     This function is used to return the db_engine. If the engine
     is not created, the engine is initialized with the parameters.
@@ -27,6 +33,9 @@ def get_vector_store_client(app_config: dict = None) -> Neo4jVector:
     app_config
         The configuration dictionary of the application.
 
+    rate_limiter
+        The rate limiter the embedding calls wait on, if any.
+
     Returns
     -------
     Neo4jVector
@@ -56,9 +65,18 @@ def get_vector_store_client(app_config: dict = None) -> Neo4jVector:
         )
         raise RuntimeError("Bad Config Parameter") from e
 
+    from langchain.vectorstores.neo4j_vector import Neo4jVector
+    from langchain_openai import OpenAIEmbeddings
+    from shared.services.metrics import TimedEmbeddings
+
+    embeddings = TimedEmbeddings(OpenAIEmbeddings(api_key=parameters.api_key))
+    if rate_limiter is not None:
+        from shared.services.rate_limiter import RateLimitedEmbeddings
+        embeddings = RateLimitedEmbeddings(embeddings, rate_limiter)
+
     try:
         return Neo4jVector.from_existing_index(
-                OpenAIEmbeddings(api_key=parameters.api_key),
+                embeddings,
                 url=parameters.host,
                 username=parameters.user,
                 password=parameters.pwd,
@@ -0,0 +1,47 @@
+"""
+Fixtures shared by the tests. Run them from the pfr folder :
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+import pytest_asyncio
+
+# The applications import their packages from the pfr folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def redis_server():
+    """
+    A fakeredis server, shared by the sync and asyncio clients of a test.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_db(redis_server):
+    """
+    A fakeredis client answering like the clients of get_redis_client,
+    with the Lua scripting of the repositories.
+    """
+    import fakeredis
+
+    db = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    yield db
+    db.close()
+
+
+@pytest_asyncio.fixture
+async def async_redis_db(redis_server):
+    """
+    An asyncio fakeredis client answering like the clients of
+    get_async_redis_client.
+    """
+    import fakeredis
+
+    db = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    yield db
+    await db.aclose()
@@ -0,0 +1,151 @@
+from datetime import datetime
+from uuid import uuid4
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.routers import ask
+from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
+from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
+from shared.repositories.async_ask_repository import (
+    ADMITTED,
+    REJECTED_QUEUE_FULL,
+    REJECTED_RATE_LIMITED,
+    AsyncAskRepository,
+)
+from shared.repositories.update_queues import UpdateQueues
+
+
+def question(priority: str = "interactive") -> tuple:
+    post = PostOutputApiAskQuestion(
+        token=uuid4(), question_content="A question ?", priority=priority
+    )
+    record = OutputRedisApiAskQuestion(
+        token=post.token, question_content=post.question_content, start_date=datetime.now()
+    )
+    return post, record
+
+
+async def push(ask_repository: AsyncAskRepository, client: str = "127.0.0.1") -> tuple:
+    return await ask_repository.push_question(*question(), client=client)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("transport", ["list", "stream"])
+async def test_full_queue_rejects_questions(async_redis_db, redis_db, transport):
+    config = {"ASK_QUEUE_MAX_LENGTH": 2, "QUEUE_QUESTIONS_TRANSPORT": transport}
+    ask_repository = AsyncAskRepository(async_redis_db, config)
+
+    assert [(await push(ask_repository))[0] for _ in range(3)] == [
+        ADMITTED,
+        ADMITTED,
+        REJECTED_QUEUE_FULL,
+    ]
+    assert (await push(ask_repository))[1] == ask_repository.admission_parameters.retry_after_s
+
+    # A question popped by an asker frees a place
+    queues = UpdateQueues(redis_db, {**config, "QUEUE_STREAM_BLOCK_MS": 0})
+    assert queues.api_pop_question() is not None
+    assert (await push(ask_repository))[0] == ADMITTED
+
+    stats = await ask_repository.get_admission_stats()
+    assert stats["admitted"] == 3
+    assert stats["rejected_queue_full"] == 2
+    assert stats["queue_length"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rejected_question_is_not_recorded(async_redis_db):
+    ask_repository = AsyncAskRepository(async_redis_db, {"ASK_QUEUE_MAX_LENGTH": 1})
+    await push(ask_repository)
+
+    post, record = question()
+    result, _ = await ask_repository.push_question(post, record, client="127.0.0.1")
+
+    assert result == REJECTED_QUEUE_FULL
+    assert await async_redis_db.exists(record.token) == 0
+
+
+@pytest.mark.asyncio
+async def test_client_over_its_rate_is_rejected(async_redis_db):
+    ask_repository = AsyncAskRepository(
+        async_redis_db, {"ASK_CLIENT_RATE_PER_MINUTE": 1, "ASK_CLIENT_BURST": 2}
+    )
+
+    results = [await push(ask_repository) for _ in range(3)]
+
+    assert [result for result, _ in results] == [ADMITTED, ADMITTED, REJECTED_RATE_LIMITED]
+    # A token every 60 s
+    assert 0 < results[2][1] <= 60
+    # The other clients have their own bucket
+    assert (await push(ask_repository, client="10.0.0.2"))[0] == ADMITTED
+
+    stats = await ask_repository.get_admission_stats()
+    assert stats["rejected_rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_admits_each_question_on_its_own(async_redis_db):
+    ask_repository = AsyncAskRepository(async_redis_db, {"ASK_QUEUE_MAX_LENGTH": 2})
+
+    results = await ask_repository.push_questions(
+        [question() for _ in range(3)], client="127.0.0.1"
+    )
+
+    assert [result for result, _ in results] == [ADMITTED, ADMITTED, REJECTED_QUEUE_FULL]
+
+
+async def post_as(ask_repository: AsyncAskRepository, headers: dict) -> int:
+    app = FastAPI()
+    app.include_router(ask.router)
+    app.state.ask_repository = ask_repository
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, client=("10.0.0.1", 1234)),
+        base_url="http://test",
+    ) as client:
+        response = await client.post(
+            "/ask/", json={"content": "A question ?"}, headers=headers
+        )
+    return response.status_code
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "client_key,first,second",
+    [
+        # Behind a proxy, every client has its address
+        ("address", {"X-Forwarded-For": "1.1.1.1"}, {"X-Forwarded-For": "2.2.2.2"}),
+        ("forwarded", {"X-Forwarded-For": "9.9.9.9, 1.1.1.1"}, {"X-Forwarded-For": "1.1.1.1"}),
+        ("api_key", {"X-API-Key": "first"}, {"X-API-Key": "first"}),
+    ],
+)
+async def test_client_key_is_configurable(async_redis_db, client_key, first, second):
+    ask_repository = AsyncAskRepository(
+        async_redis_db,
+        {"ASK_CLIENT_RATE_PER_MINUTE": 1, "ASK_CLIENT_BURST": 1, "ASK_CLIENT_KEY": client_key},
+    )
+
+    assert await post_as(ask_repository, first) == 200
+    assert await post_as(ask_repository, second) == 429
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "client_key,first,second",
+    [
+        ("forwarded", {"X-Forwarded-For": "1.1.1.1"}, {"X-Forwarded-For": "2.2.2.2"}),
+        ("api_key", {"X-API-Key": "first"}, {"X-API-Key": "second"}),
+    ],
+)
+async def test_clients_behind_a_proxy_have_their_bucket(
+    async_redis_db, client_key, first, second
+):
+    ask_repository = AsyncAskRepository(
+        async_redis_db,
+        {"ASK_CLIENT_RATE_PER_MINUTE": 1, "ASK_CLIENT_BURST": 1, "ASK_CLIENT_KEY": client_key},
+    )
+
+    assert await post_as(ask_repository, first) == 200
+    assert await post_as(ask_repository, second) == 200
+    assert "first" not in str(await async_redis_db.keys())
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from api.routers.ask import answer_events, format_event
+from shared.models.get_ask_input import GetAskInput
+from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
+from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
+from shared.repositories.answer_stream_repository import (
+    STREAM_END,
+    STREAM_ERROR,
+    STREAM_RESET,
+    STREAM_TOKEN,
+    AnswerStreamRepository,
+)
+from shared.repositories.async_ask_repository import ADMITTED, AsyncAskRepository
+from shared.repositories.params_repository import ParamsRepository
+
+
+async def ask(ask_repository: AsyncAskRepository) -> GetAskInput:
+    question = PostOutputApiAskQuestion(token=uuid4(), question_content="A question ?")
+    admission, _ = await ask_repository.push_question(
+        question,
+        OutputRedisApiAskQuestion(
+            token=question.token,
+            question_content=question.question_content,
+            start_date=datetime.now(),
+        ),
+        client="127.0.0.1",
+    )
+    assert admission == ADMITTED
+    return GetAskInput(token=question.token)
+
+
+async def collect(events) -> list:
+    return [event async for event in events]
+
+
+@pytest.mark.asyncio
+async def test_pending_question_stream_ends_after_its_max_duration(async_redis_db):
+    ask_repository = AsyncAskRepository(
+        async_redis_db, {"ANSWER_STREAM_BLOCK_MS": 10, "ANSWER_STREAM_MAX_S": 0.1}
+    )
+    token = await ask(ask_repository)
+
+    events = await collect(answer_events(token, ask_repository))
+
+    assert events[-1] == format_event(STREAM_ERROR)
+    assert set(events[:-1]) <= {": waiting\n\n"}
+
+
+@pytest.mark.asyncio
+async def test_failed_question_stream_ends_with_an_error(async_redis_db):
+    ask_repository = AsyncAskRepository(async_redis_db, {"ANSWER_STREAM_BLOCK_MS": 10})
+    token = await ask(ask_repository)
+    record = await ask_repository.get_question(token)
+    record.state = "ERROR"
+    await async_redis_db.set(token.token, record.model_dump_json())
+
+    events = await collect(answer_events(token, ask_repository))
+
+    assert events == [format_event(STREAM_ERROR)]
+
+
+@pytest.mark.asyncio
+async def test_done_question_without_stream_is_sent_at_once(async_redis_db):
+    ask_repository = AsyncAskRepository(async_redis_db, {"ANSWER_STREAM_BLOCK_MS": 10})
+    token = await ask(ask_repository)
+    record = await ask_repository.get_question(token)
+    record.state = "Done"
+    record.question_answer = "An answer."
+    await async_redis_db.set(token.token, record.model_dump_json())
+
+    events = await collect(answer_events(token, ask_repository))
+
+    assert events[-1] == format_event(STREAM_END)
+
+
+@pytest.mark.asyncio
+async def test_retried_question_stream_drops_the_failed_attempt(async_redis_db, redis_db):
+    ask_repository = AsyncAskRepository(async_redis_db, {"ANSWER_STREAM_BLOCK_MS": 10})
+    answer_stream = AnswerStreamRepository(redis_db, {"ANSWER_STREAM_TTL_S": 60})
+    token = await ask(ask_repository)
+    answer_stream.append(token.token, STREAM_TOKEN, "A wrong")
+
+    answer_stream.reset(token.token)
+    answer_stream.append(token.token, STREAM_TOKEN, "An answer.")
+    answer_stream.append(token.token, STREAM_END)
+
+    events = await collect(answer_events(token, ask_repository))
+
+    assert events == [
+        format_event(STREAM_RESET),
+        format_event(STREAM_TOKEN, "An answer."),
+        format_event(STREAM_END),
+    ]
+    assert redis_db.ttl(f"answer_stream:{token.token}") > 0
+
+
+@pytest.mark.asyncio
+async def test_streams_dont_hold_the_connections_of_the_commands(redis_server):
+    import fakeredis
+
+    db = fakeredis.FakeAsyncRedis(
+        server=redis_server, decode_responses=True, max_connections=1
+    )
+    blocking_db = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    ask_repository = AsyncAskRepository(
+        db, {"ANSWER_STREAM_BLOCK_MS": 200}, blocking_db
+    )
+    token = await ask(ask_repository)
+
+    streaming = asyncio.ensure_future(ask_repository.read_answer_stream(token.token))
+    await asyncio.sleep(0.05)
+    # The only connection of the commands is free during the blocking read
+    assert (await ask_repository.get_question(token)).state == "pending"
+    assert await streaming == []
+
+    await db.aclose()
+    await blocking_db.aclose()
@@ -0,0 +1,81 @@
+from uuid import uuid4
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+
+from api.routers import ask
+from shared.repositories.async_ask_repository import AsyncAskRepository
+
+
+@pytest_asyncio.fixture
+async def client(async_redis_db):
+    app = FastAPI()
+    app.include_router(ask.router)
+    app.state.ask_repository = AsyncAskRepository(
+        async_redis_db, {"ASK_BATCH_MAX_SIZE": 3}
+    )
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+def questions(count: int) -> dict:
+    return {"questions": [{"content": f"Question {index} ?"} for index in range(count)]}
+
+
+@pytest.mark.asyncio
+async def test_empty_batch_is_rejected(client):
+    assert (await client.post("/ask/batch", json=questions(0))).status_code == 422
+    assert (await client.get("/ask/batch")).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_oversized_batch_is_rejected(client, async_redis_db):
+    response = await client.post("/ask/batch", json=questions(4))
+
+    assert response.status_code == 422
+    assert "at most 3 questions" in response.json()["detail"]
+    assert await async_redis_db.dbsize() == 0
+
+    tokens = [f"/ask/{uuid4()}" for _ in range(4)]
+    response = await client.get("/ask/batch", params={"tokens": tokens})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_is_answered_in_order(client):
+    response = await client.post("/ask/batch", json=questions(3))
+
+    assert response.status_code == 200
+    tokens = [item["question"]["token"] for item in response.json()["questions"]]
+    response = await client.get("/ask/batch", params={"tokens": tokens})
+
+    assert response.status_code == 200
+    assert [
+        question["question_content"] for question in response.json()["questions"]
+    ] == ["Question 0 ?", "Question 1 ?", "Question 2 ?"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_token_is_none(client):
+    response = await client.post("/ask/batch", json=questions(1))
+    token = response.json()["questions"][0]["question"]["token"]
+
+    response = await client.get(
+        "/ask/batch", params={"tokens": [f"/ask/{uuid4()}", token]}
+    )
+
+    assert response.status_code == 200
+    unknown, known = response.json()["questions"]
+    assert unknown is None
+    assert known["token"] == token
+
+
+@pytest.mark.asyncio
+async def test_malformed_token_is_rejected(client):
+    response = await client.get("/ask/batch", params={"tokens": ["/ask/not-a-uuid"]})
+
+    assert response.status_code == 422
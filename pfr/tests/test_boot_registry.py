@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from shared.services.boot_registry import BootRegistry
+
+
+@pytest.fixture
+def readiness_file(tmp_path) -> str:
+    return str(tmp_path / "ready")
+
+
+def registry_with(mode: str, readiness_file: str, built: list) -> BootRegistry:
+    registry = BootRegistry({"BOOT_MODE": mode, "BOOT_READINESS_FILE": readiness_file})
+
+    def factory(name: str):
+        def build():
+            # Not ready before the required services are built
+            ready = os.path.isfile(readiness_file)
+            assert not ready or name == "vector_store"
+            built.append(name)
+            return name
+
+        return build
+
+    registry.register("db_client", factory("db_client"), "db client", required=True)
+    registry.register(
+        "queue", lambda: registry.get("db_client") + " queue", "queue", required=True
+    )
+    registry.register("vector_store", factory("vector_store"), "vector store")
+    return registry
+
+
+def test_lazy_mode_is_ready_once_the_required_services_are_built(readiness_file):
+    built = []
+    registry = registry_with("lazy", readiness_file, built)
+
+    registry.start()
+
+    assert built == ["db_client"]
+    assert registry.get("queue") == "db_client queue"
+    assert os.path.isfile(readiness_file)
+    assert registry.report()["pending"] == ["vector_store"]
+    assert not registry.built("vector_store")
+
+    assert registry.get("vector_store") == "vector_store"
+    assert built == ["db_client", "vector_store"]
+    assert registry.built("vector_store")
+
+
+def test_parallel_mode_builds_every_service(readiness_file):
+    built = []
+    registry = registry_with("parallel", readiness_file, built)
+
+    registry.start()
+
+    assert sorted(built) == ["db_client", "vector_store"]
+    assert registry.report()["pending"] == []
+    assert os.path.isfile(readiness_file)
+
+
+def test_failed_required_service_is_not_ready(readiness_file):
+    registry = BootRegistry({"BOOT_MODE": "lazy", "BOOT_READINESS_FILE": readiness_file})
+
+    def fail():
+        raise RuntimeError("Redis unreachable")
+
+    registry.register("db_client", fail, "db client", required=True)
+
+    with pytest.raises(RuntimeError):
+        registry.start()
+    assert not registry.ready
+    assert not os.path.isfile(readiness_file)
@@ -0,0 +1,35 @@
+from prometheus_client import Gauge
+from prometheus_client.core import REGISTRY
+
+from api.routers.metrics import metrics
+from shared.services import metrics as metrics_module
+from shared.services.metrics import (
+    CALLBACK_COLLECTORS,
+    CallbackCollector,
+    register_callback_collector,
+)
+
+
+def test_every_gauge_is_merged_across_the_workers():
+    gauges = [
+        value for value in vars(metrics_module).values() if isinstance(value, Gauge)
+    ]
+
+    assert gauges
+    # "all" would keep a gauge per worker, dead ones included
+    assert all(gauge._multiprocess_mode != "all" for gauge in gauges)
+
+
+def test_callback_gauges_are_served_with_multiprocess_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    collector = CallbackCollector(
+        "pfr_test_depth", "A gauge read on scrape.", ["queue"], lambda: {("q",): 3}
+    )
+    register_callback_collector(collector)
+    try:
+        body = metrics().body.decode()
+    finally:
+        REGISTRY.unregister(collector)
+        CALLBACK_COLLECTORS.remove(collector)
+
+    assert 'pfr_test_depth{queue="q"} 3.0' in body
@@ -0,0 +1,115 @@
+import datetime
+import gzip
+import os
+
+import pytest
+
+from shared.models.article import Article
+from shared.services.graphdb_client import GraphDBClient
+from updater.repositories.articles_repository import ArticleRepository
+from updater.services.ntriples_bulk_loader import NTriplesBulkLoader
+
+
+class FlakyGraphDBClient(GraphDBClient):
+    """GraphDB client whose uploads fail the first failures times."""
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.uploads = []
+
+    def request_upload(self, data, content_type="application/n-triples", context=None):
+        self.uploads.append(data)
+        if len(self.uploads) <= self.failures:
+            raise RuntimeError("GraphDB Repository Error : 503.")
+
+
+def make_loader(tmp_path, failures: int, **config) -> NTriplesBulkLoader:
+    client = FlakyGraphDBClient(failures)
+    return NTriplesBulkLoader(
+        {
+            "BULK_PATH": str(tmp_path),
+            "BULK_FILE_MAX_TRIPLES": 100000,
+            "BULK_SUBMIT": True,
+            "BULK_KEEP_FILES": False,
+            "BULK_MAX_ATTEMPTS": 3,
+            "BULK_RETRY_DELAY_S": 0,
+            **config,
+        },
+        ArticleRepository(client),
+    )
+
+
+def add_article(loader: NTriplesBulkLoader) -> None:
+    loader.add_article(
+        Article(
+            id="oai:arXiv.org:2401.00001",
+            modified_at=datetime.datetime(2024, 1, 1),
+            title="A title",
+            description="An abstract.",
+        )
+    )
+
+
+def staged_files(path) -> list:
+    return sorted(name for name in os.listdir(path) if name.endswith(".nt.gz"))
+
+
+def test_failed_upload_is_retried_by_the_next_flush(tmp_path):
+    loader = make_loader(tmp_path, failures=1)
+    add_article(loader)
+
+    loader.flush()
+    uploads = loader.article_repository.graphdb_client.uploads
+    # Failed, then uploaded again by the retry of the same flush
+    assert len(uploads) == 2
+    assert staged_files(tmp_path) == []
+
+    loader.flush()
+    assert len(uploads) == 2
+
+
+def test_failed_file_is_moved_after_its_attempts(tmp_path):
+    loader = make_loader(tmp_path, failures=10)
+    add_article(loader)
+
+    for _ in range(5):
+        loader.flush()
+
+    assert len(loader.article_repository.graphdb_client.uploads) == 3
+    assert staged_files(tmp_path) == []
+    failed = staged_files(tmp_path / "failed")
+    assert len(failed) == 1
+    with gzip.open(tmp_path / "failed" / failed[0], "rb") as file:
+        assert b"2401.00001" in file.read()
+
+
+def test_retry_waits_for_the_delay(tmp_path):
+    loader = make_loader(tmp_path, failures=10, BULK_RETRY_DELAY_S=3600)
+    add_article(loader)
+
+    loader.flush()
+    loader.flush()
+
+    assert len(loader.article_repository.graphdb_client.uploads) == 1
+    assert len(staged_files(tmp_path)) == 1
+
+
+def test_files_of_a_previous_run_are_loaded(tmp_path):
+    with gzip.open(tmp_path / "articles-1.nt.gz", "wb") as file:
+        file.write(b"<a> <b> <c> .\n")
+
+    loader = make_loader(tmp_path, failures=0)
+    loader.flush()
+
+    assert loader.article_repository.graphdb_client.uploads == [b"<a> <b> <c> .\n"]
+    assert staged_files(tmp_path) == []
+
+
+def test_kept_files_of_a_previous_run_are_not_loaded_again(tmp_path):
+    with gzip.open(tmp_path / "articles-1.nt.gz", "wb") as file:
+        file.write(b"<a> <b> <c> .\n")
+
+    loader = make_loader(tmp_path, failures=0, BULK_KEEP_FILES=True)
+    loader.flush()
+
+    assert loader.article_repository.graphdb_client.uploads == []
@@ -0,0 +1,55 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from asker.services.ontology_graphdb_qa import OntologyGraphdbQA
+
+pytest.importorskip("rdflib")
+
+VALID_SPARQL = "SELECT ?s WHERE { ?s ?p ?o }"
+
+
+class FixChain:
+    output_key = "text"
+
+    def __init__(self, fixes: list) -> None:
+        self.fixes = fixes
+        self.inputs = []
+
+    def invoke(self, inputs: dict) -> dict:
+        self.inputs.append(inputs)
+        return {self.output_key: self.fixes.pop(0)}
+
+
+def ontology_qa(fixes: list, max_fix_retries: int = 2) -> OntologyGraphdbQA:
+    # Without LangChain nor GraphDB : only the chain's fix step is used
+    service = object.__new__(OntologyGraphdbQA)
+    service._logger = logging.getLogger(__name__)
+    service.chain = SimpleNamespace(
+        max_fix_retries=max_fix_retries, sparql_fix_chain=FixChain(fixes)
+    )
+    return service
+
+
+def test_valid_query_is_not_fixed():
+    service = ontology_qa([])
+
+    assert service.prepare_sparql(VALID_SPARQL, "schema") == VALID_SPARQL
+
+
+def test_invalid_query_is_fixed_with_the_last_error():
+    service = ontology_qa(["SELECT broken", VALID_SPARQL])
+
+    assert service.prepare_sparql("SELECT nothing", "schema") == VALID_SPARQL
+    first, second = service.chain.sparql_fix_chain.inputs
+    assert first["generated_sparql"] == "SELECT nothing"
+    assert second["generated_sparql"] == "SELECT broken"
+    assert second["schema"] == "schema"
+
+
+def test_query_still_invalid_after_the_retries_is_rejected():
+    service = ontology_qa(["SELECT broken", "SELECT still broken"])
+
+    with pytest.raises(ValueError):
+        service.prepare_sparql("SELECT nothing", "schema")
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from asker.services.ontology_schema_cache import OntologySchemaCache
+
+pytest.importorskip("langchain_community")
+pytest.importorskip("rdflib")
+
+QUERY_ONTOLOGY = "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }"
+SCHEMA = """@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+<http://example.org/Article> rdfs:label "Article" .
+"""
+
+
+@pytest.fixture
+def schema_cache(tmp_path) -> OntologySchemaCache:
+    # Nothing listens on the port 9 : GraphDB is unreachable
+    return OntologySchemaCache(
+        {
+            "GRAPHDB_HOST": "127.0.0.1",
+            "GRAPHDB_PORT": 9,
+            "GRAPHDB_URL_END": "/repositories/arxiv",
+            "GRAPHDB_USER": "user",
+            "GRAPHDB_PWD": "password",
+            "LANGCHAIN_OPENAI_API_KEY": "key",
+            "LANGCHAIN_OPENAI_MODEL": "model",
+            "LANGCHAIN_GRAPHDB_QA_PROMPT": "A prompt",
+            "LANGCHAIN_GRAPHDB_QUERY_ONTOLOGY": QUERY_ONTOLOGY,
+            "LANGCHAIN_GRAPHDB_SCHEMA_CACHE_PATH": str(tmp_path / "schema.ttl"),
+        }
+    )
+
+
+def test_snapshot_is_loaded_with_graphdb_unreachable(schema_cache, monkeypatch):
+    with open(schema_cache.parameters.schema_cache_path, "w", encoding="utf-8") as file:
+        file.write(SCHEMA)
+    version = schema_cache._version(SCHEMA)
+    with open(schema_cache.metadata_path, "w", encoding="utf-8") as file:
+        json.dump({"version": version, "query": QUERY_ONTOLOGY, "refreshed_at": 0}, file)
+
+    def unreachable():
+        raise AssertionError("GraphDB queried")
+
+    monkeypatch.setattr(schema_cache, "_query_graph", unreachable)
+    graph = schema_cache.load()
+
+    assert "Article" in graph.get_schema
+    assert schema_cache.version == version
+
+
+def test_invalid_snapshot_queries_graphdb(schema_cache):
+    with pytest.raises(RuntimeError):
+        schema_cache.load()
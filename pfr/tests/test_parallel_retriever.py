@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from asker.services.parallel_retriever import NO_GRAPHDB_ANSWER, ParallelRetriever
+
+
+class VectorStore:
+    def similarity_search_with_score(self, question: str) -> list:
+        return [(question, 1.0)]
+
+
+class BlockedOntologyQA:
+    """Ontology branch stuck until released, like a slow GraphDB."""
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.calls = 0
+
+    def answer_question(self, question: str) -> str:
+        self.calls += 1
+        self.release.wait(5)
+        return "graphdb answer"
+
+
+@pytest.fixture
+def ontology_qa():
+    ontology_qa = BlockedOntologyQA()
+    yield ontology_qa
+    ontology_qa.release.set()
+
+
+def make_retriever(ontology_qa, concurrency: int = 2) -> ParallelRetriever:
+    return ParallelRetriever(
+        {
+            "ASKER_VECTOR_TIMEOUT_S": 1,
+            "ASKER_ONTOLOGY_TIMEOUT_S": 0.05,
+            "ASKER_CONCURRENCY": concurrency,
+        },
+        VectorStore(),
+        ontology_qa,
+    )
+
+
+def test_timed_out_branch_falls_back_on_the_other(ontology_qa):
+    retriever = make_retriever(ontology_qa)
+
+    documents, graphdb_answer, degraded = retriever.retrieve("question")
+
+    assert documents == [("question", 1.0)]
+    assert graphdb_answer == NO_GRAPHDB_ANSWER
+    assert degraded
+    assert retriever.in_flight == {"vector": 0, "ontology": 1}
+
+
+def test_abandoned_calls_are_bounded_by_the_pool(ontology_qa):
+    retriever = make_retriever(ontology_qa, concurrency=2)
+
+    for _ in range(5):
+        documents, graphdb_answer, _ = retriever.retrieve("question")
+        assert documents == [("question", 1.0)]
+        assert graphdb_answer == NO_GRAPHDB_ANSWER
+
+    # The stuck calls hold the two workers, the next branches are skipped
+    assert ontology_qa.calls == 2
+    assert retriever.in_flight["ontology"] == 2
+
+    ontology_qa.release.set()
+    for executor in retriever._executors.values():
+        executor.shutdown(wait=True)
+    assert retriever.in_flight == {"vector": 0, "ontology": 0}
+
+
+def test_answer_of_both_branches_is_not_degraded(ontology_qa):
+    retriever = make_retriever(ontology_qa)
+    ontology_qa.release.set()
+
+    documents, graphdb_answer, degraded = retriever.retrieve("question")
+
+    assert graphdb_answer == "graphdb answer"
+    assert not degraded
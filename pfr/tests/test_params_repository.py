@@ -0,0 +1,77 @@
+import json
+from uuid import uuid4
+
+import pytest
+from redis.exceptions import ResponseError
+
+from shared.models.output_redis_api_ask_question import OutputRedisApiAskQuestion
+from shared.models.redis_popped_api_ask_question import RedisPoppedApiAskQuestion
+from shared.repositories.params_repository import (
+    ASK_ANSWERED_CHANNEL,
+    ASK_RECORD_STATS_KEY,
+    ParamsRepository,
+)
+
+
+def refuse_memory_usage(*args, **kwargs):
+    raise ResponseError("unknown command 'MEMORY'")
+
+
+def answered(token: str) -> OutputRedisApiAskQuestion:
+    return OutputRedisApiAskQuestion(
+        token=token, state="Done", question_content="A question ?", question_answer="An answer."
+    )
+
+
+@pytest.fixture
+def subscription(redis_db):
+    pubsub = redis_db.pubsub(ignore_subscribe_messages=True)
+    pubsub.psubscribe(f"{ASK_ANSWERED_CHANNEL}:*")
+    pubsub.get_message(timeout=1)
+    yield pubsub
+    pubsub.close()
+
+
+def published(subscription) -> list:
+    messages = []
+    while (message := subscription.get_message(timeout=0.1)) is not None:
+        messages.append(message["data"])
+    return messages
+
+
+def test_answer_is_counted(redis_db, monkeypatch):
+    # fakeredis has no MEMORY command
+    monkeypatch.setattr(redis_db, "memory_usage", lambda key: 120)
+    token = f"/ask/{uuid4()}"
+
+    ParamsRepository(redis_db).set_key_value_api_ask_question(answered(token))
+
+    stats = redis_db.hgetall(ASK_RECORD_STATS_KEY)
+    assert stats["records"] == "1"
+    assert stats["memory_bytes"] == "120"
+
+
+def test_answer_is_kept_when_memory_usage_is_refused(redis_db, subscription, monkeypatch):
+    monkeypatch.setattr(redis_db, "memory_usage", refuse_memory_usage)
+    token = f"/ask/{uuid4()}"
+
+    ParamsRepository(redis_db, {"ASK_TTL_DONE_S": 3600}).set_key_value_api_ask_question(
+        answered(token)
+    )
+
+    assert json.loads(redis_db.get(token))["state"] == "Done"
+    assert redis_db.ttl(token) > 0
+    assert published(subscription) == ["Done"]
+    assert redis_db.exists(ASK_RECORD_STATS_KEY) == 0
+
+
+def test_error_is_kept_when_memory_usage_is_refused(redis_db, subscription, monkeypatch):
+    monkeypatch.setattr(redis_db, "memory_usage", refuse_memory_usage)
+    token = f"/ask/{uuid4()}"
+
+    ParamsRepository(redis_db).set_key_value_error_qa_question(
+        RedisPoppedApiAskQuestion(token=token, question_content="A question ?")
+    )
+
+    assert json.loads(redis_db.get(token))["state"] == "ERROR"
+    assert published(subscription) == ["ERROR"]
@@ -0,0 +1,34 @@
+import pytest
+from prometheus_client.core import REGISTRY
+
+pytest.importorskip("langchain_core")
+
+from shared.services.rate_limiter import RateLimitedEmbeddings, RateLimiter
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts: list) -> list:
+        return [[1.0] for _ in texts]
+
+    def embed_query(self, text: str) -> list:
+        return [1.0]
+
+
+def waits() -> float:
+    return REGISTRY.get_sample_value("pfr_rate_limit_wait_seconds_count") or 0.0
+
+
+def test_embeddings_wait_on_the_rate_limiter():
+    rate_limiter = RateLimiter(
+        {"OPENAI_MAX_REQUESTS_PER_MINUTE": 60, "OPENAI_MAX_TOKENS_PER_MINUTE": 1000}
+    )
+    embeddings = RateLimitedEmbeddings(FakeEmbeddings(), rate_limiter)
+    before = waits()
+
+    assert embeddings.embed_query("a" * 400) == [1.0]
+    assert embeddings.embed_documents(["a" * 400, "b" * 400]) == [[1.0], [1.0]]
+
+    assert waits() == before + 2
+    # 300 tokens estimated from the length of the texts, 2 requests
+    assert rate_limiter._tokens == pytest.approx(700, abs=1)
+    assert rate_limiter._requests == pytest.approx(58, abs=0.1)
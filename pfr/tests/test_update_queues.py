@@ -0,0 +1,295 @@
+import json
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from shared.models.article import Article
+from shared.models.post_output_api_ask_question import PostOutputApiAskQuestion
+from shared.repositories.update_queues import (
+    ASK_PRIORITY_BATCH,
+    ASK_PRIORITY_INTERACTIVE,
+    API_ASK_QUESTION_QUEUE,
+    UPDATE_ARTICLE_QUEUE,
+    UPDATER_GROUP,
+    UpdateQueues,
+    attempts_key,
+    dead_letter_key,
+    retry_key,
+    stream_key,
+)
+
+TRANSPORTS = ["list", "stream"]
+
+
+def update_queues(redis_db, transport: str, **config) -> UpdateQueues:
+    return UpdateQueues(
+        redis_db,
+        {"QUEUE_QUESTIONS_TRANSPORT": transport, "QUEUE_STREAM_BLOCK_MS": 0, **config},
+    )
+
+
+def push_questions(queues: UpdateQueues, priority: str, count: int) -> None:
+    for index in range(count):
+        queues.api_lpush_question(
+            PostOutputApiAskQuestion(
+                token=uuid4(), question_content=f"{priority} question {index}"
+            ),
+            priority,
+        )
+
+
+def pop_lanes(queues: UpdateQueues, count: int) -> list:
+    lanes = []
+    for _ in range(count):
+        question = queues.api_pop_question()
+        queues.ack(question)
+        lanes.append(question.question_content.split(" ")[0])
+    return lanes
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_lanes_are_popped_four_to_one(redis_db, transport):
+    queues = update_queues(redis_db, transport)
+    push_questions(queues, ASK_PRIORITY_INTERACTIVE, 12)
+    push_questions(queues, ASK_PRIORITY_BATCH, 12)
+
+    lanes = pop_lanes(queues, 10)
+
+    assert lanes == (["interactive"] * 2 + ["batch"] + ["interactive"] * 2) * 2
+    # The questions of a lane keep their order
+    question = queues.api_pop_question()
+    assert question.question_content == "interactive question 8"
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_idle_lane_gives_its_turns(redis_db, transport):
+    queues = update_queues(redis_db, transport)
+    push_questions(queues, ASK_PRIORITY_BATCH, 5)
+
+    assert pop_lanes(queues, 5) == ["batch"] * 5
+    assert queues.api_pop_question() is None
+
+
+def test_lane_weights_are_configurable(redis_db):
+    queues = update_queues(
+        redis_db, "list", ASK_INTERACTIVE_WEIGHT=1, ASK_BATCH_WEIGHT=1
+    )
+    push_questions(queues, ASK_PRIORITY_INTERACTIVE, 3)
+    push_questions(queues, ASK_PRIORITY_BATCH, 3)
+
+    assert sorted(pop_lanes(queues, 2)) == ["batch", "interactive"]
+
+
+def article(index: int = 0) -> Article:
+    return Article(
+        id=f"oai:arXiv.org:2401.{index:05d}",
+        modified_at=datetime(2024, 1, 1),
+        title="A title",
+        description="An abstract.",
+    )
+
+
+def stream_queues(redis_db, consumer: str, **config) -> UpdateQueues:
+    queues = UpdateQueues(
+        redis_db,
+        {
+            "QUEUE_ARTICLES_TRANSPORT": "stream",
+            "QUEUE_QUESTIONS_TRANSPORT": "stream",
+            "QUEUE_STREAM_BLOCK_MS": 0,
+            **config,
+        },
+    )
+    queues.consumer = consumer
+    return queues
+
+
+def test_acknowledged_task_is_not_pending(redis_db):
+    queues = stream_queues(redis_db, "updater-1")
+    queues.push_task_update_article(article())
+
+    popped = queues.pop_task_update_article()
+    assert redis_db.xpending(stream_key(UPDATE_ARTICLE_QUEUE), UPDATER_GROUP)["pending"] == 1
+
+    queues.ack(popped)
+    assert redis_db.xpending(stream_key(UPDATE_ARTICLE_QUEUE), UPDATER_GROUP)["pending"] == 0
+    assert queues.get_queue_stats()[UPDATE_ARTICLE_QUEUE]["pending"] == 0
+    assert queues.pop_task_update_article() is None
+
+
+def test_task_of_a_stopped_consumer_is_reclaimed(redis_db):
+    stopped = stream_queues(redis_db, "updater-1", QUEUE_STREAM_CLAIM_IDLE_MS=50)
+    stopped.push_task_update_article(article(1))
+    assert stopped.pop_task_update_article().id == "oai:arXiv.org:2401.00001"
+
+    other = stream_queues(redis_db, "updater-2", QUEUE_STREAM_CLAIM_IDLE_MS=50)
+    # Not idle for long enough yet
+    assert other.pop_task_update_article() is None
+
+    time.sleep(0.1)
+    other._claimed_at.clear()
+    reclaimed = other.pop_task_update_article()
+
+    assert reclaimed.id == "oai:arXiv.org:2401.00001"
+    pending = redis_db.xpending_range(
+        stream_key(UPDATE_ARTICLE_QUEUE), UPDATER_GROUP, min="-", max="+", count=10
+    )
+    assert [entry["consumer"] for entry in pending] == ["updater-2"]
+
+    other.ack(reclaimed)
+    assert redis_db.xpending(stream_key(UPDATE_ARTICLE_QUEUE), UPDATER_GROUP)["pending"] == 0
+
+
+def test_acknowledged_task_is_not_reclaimed(redis_db):
+    stopped = stream_queues(redis_db, "asker-1", QUEUE_STREAM_CLAIM_IDLE_MS=50)
+    push_questions(stopped, ASK_PRIORITY_INTERACTIVE, 1)
+    stopped.ack(stopped.api_pop_question())
+
+    time.sleep(0.1)
+    other = stream_queues(redis_db, "asker-2", QUEUE_STREAM_CLAIM_IDLE_MS=50)
+
+    assert other.api_pop_question() is None
+
+
+def retry_queues(redis_db, transport: str, **config) -> UpdateQueues:
+    return UpdateQueues(
+        redis_db,
+        {
+            "QUEUE_ARTICLES_TRANSPORT": transport,
+            "QUEUE_QUESTIONS_TRANSPORT": transport,
+            "QUEUE_STREAM_BLOCK_MS": 0,
+            "QUEUE_MAX_RETRIES": 2,
+            "QUEUE_RETRY_BACKOFF_S": 10,
+            "QUEUE_RETRY_BACKOFF_MAX_S": 15,
+            **config,
+        },
+    )
+
+
+def make_retries_due(redis_db, queues: UpdateQueues, queue: str) -> None:
+    for data in redis_db.zrange(retry_key(queue), 0, -1):
+        redis_db.zadd(retry_key(queue), {data: 0})
+    # Not throttled
+    queues._requeued_at.clear()
+
+
+def queue_pending(redis_db, transport: str) -> int:
+    if transport == "list":
+        return 0
+    return redis_db.xpending(stream_key(UPDATE_ARTICLE_QUEUE), UPDATER_GROUP)["pending"]
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_failed_task_is_retried_after_its_backoff(redis_db, transport):
+    queues = retry_queues(redis_db, transport)
+    queues.push_task_update_article(article(1))
+    popped = queues.pop_task_update_article()
+
+    start = time.time()
+    assert queues.fail(popped, "GraphDB unreachable") is True
+
+    ((data, due),) = redis_db.zrange(retry_key(UPDATE_ARTICLE_QUEUE), 0, -1, withscores=True)
+    assert json.loads(data)["id"] == "oai:arXiv.org:2401.00001"
+    assert start + 10 <= due <= time.time() + 10
+    assert redis_db.hget(attempts_key(UPDATE_ARTICLE_QUEUE), popped.id) == "1"
+    assert queue_pending(redis_db, transport) == 0
+    assert queues.get_queue_stats()[UPDATE_ARTICLE_QUEUE]["retrying"] == 1
+    # Not due yet
+    queues._requeued_at.clear()
+    assert queues.pop_task_update_article() is None
+
+    make_retries_due(redis_db, queues, UPDATE_ARTICLE_QUEUE)
+    retried = queues.pop_task_update_article()
+
+    assert retried.id == popped.id
+    assert queues.attempts(retried) == 1
+    assert redis_db.zcard(retry_key(UPDATE_ARTICLE_QUEUE)) == 0
+
+    # The backoff is doubled, up to its maximum
+    queues.fail(retried, "GraphDB unreachable")
+    ((_, due),) = redis_db.zrange(retry_key(UPDATE_ARTICLE_QUEUE), 0, -1, withscores=True)
+    assert due <= time.time() + 15
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_acknowledged_retry_forgets_its_attempts(redis_db, transport):
+    queues = retry_queues(redis_db, transport)
+    queues.push_task_update_article(article(1))
+    queues.fail(queues.pop_task_update_article(), "GraphDB unreachable")
+    make_retries_due(redis_db, queues, UPDATE_ARTICLE_QUEUE)
+
+    queues.ack(queues.pop_task_update_article())
+
+    assert redis_db.hlen(attempts_key(UPDATE_ARTICLE_QUEUE)) == 0
+    assert queue_pending(redis_db, transport) == 0
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_task_failed_after_its_retries_is_dead_lettered(redis_db, transport):
+    queues = retry_queues(redis_db, transport)
+    queues.push_task_update_article(article(1))
+
+    results = []
+    for attempt in range(3):
+        popped = queues.pop_task_update_article()
+        results.append(queues.fail(popped, f"error {attempt}"))
+        make_retries_due(redis_db, queues, UPDATE_ARTICLE_QUEUE)
+
+    assert results == [True, True, False]
+    assert queues.pop_task_update_article() is None
+    assert redis_db.hlen(attempts_key(UPDATE_ARTICLE_QUEUE)) == 0
+    assert queue_pending(redis_db, transport) == 0
+
+    (dead_letter,) = queues.get_dead_letters(UPDATE_ARTICLE_QUEUE)
+    assert dead_letter["task_id"] == "oai:arXiv.org:2401.00001"
+    assert dead_letter["error"] == "error 2"
+    assert dead_letter["attempts"] == 3
+    assert json.loads(dead_letter["data"])["id"] == "oai:arXiv.org:2401.00001"
+    assert queues.get_queue_stats()[UPDATE_ARTICLE_QUEUE]["dead_letter"] == 1
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_dead_letters_are_replayed_with_their_attempts_reset(redis_db, transport):
+    queues = retry_queues(redis_db, transport, QUEUE_MAX_RETRIES=0)
+    push_questions(queues, ASK_PRIORITY_INTERACTIVE, 2)
+    for _ in range(2):
+        assert queues.fail(queues.api_pop_question(), "OpenAI unreachable") is False
+    # A task which can't be read is kept
+    redis_db.lpush(dead_letter_key(API_ASK_QUESTION_QUEUE), json.dumps({"data": None}))
+
+    assert queues.replay_dead_letters(API_ASK_QUESTION_QUEUE) == 2
+
+    assert len(queues.get_dead_letters(API_ASK_QUESTION_QUEUE)) == 1
+    replayed = [queues.api_pop_question() for _ in range(2)]
+    assert [question.question_content for question in replayed] == [
+        "interactive question 0",
+        "interactive question 1",
+    ]
+    assert all(queues.attempts(question) == 0 for question in replayed)
+
+    assert queues.purge_dead_letters(API_ASK_QUESTION_QUEUE) == 1
+    assert queues.get_dead_letters(API_ASK_QUESTION_QUEUE) == []
+
+
+@pytest.mark.parametrize("transport", TRANSPORTS)
+def test_unreadable_task_is_dead_lettered_at_once(redis_db, transport):
+    queues = retry_queues(redis_db, transport)
+    if transport == "stream":
+        redis_db.xadd(stream_key(UPDATE_ARTICLE_QUEUE), {"data": "{not json"})
+    else:
+        redis_db.lpush(UPDATE_ARTICLE_QUEUE, "{not json")
+
+    assert queues.pop_task_update_article() is None
+
+    (dead_letter,) = queues.get_dead_letters(UPDATE_ARTICLE_QUEUE)
+    assert dead_letter["task_id"] is None
+    assert dead_letter["data"] is None
+    assert dead_letter["raw"] == "{not json"
+    assert queue_pending(redis_db, transport) == 0
+    assert redis_db.zcard(retry_key(UPDATE_ARTICLE_QUEUE)) == 0
+
+    # It would fail again, it is not replayed
+    assert queues.replay_dead_letters(UPDATE_ARTICLE_QUEUE) == 0
+    assert queues.pop_task_update_article() is None
+    assert len(queues.get_dead_letters(UPDATE_ARTICLE_QUEUE)) == 1
@@ -19,66 +19,133 @@ except RuntimeError:
     print("Failed to initialize logger. Exiting...")
     sys.exit(1)
 
-# INIT Database connection
+# METRICS
 #----------------------
+# Served on METRICS_PORT from a thread, while the services are built
 try:
-    from shared.services.get_redis_client import get_redis_client
-    db_client = get_redis_client(config)
+    from shared.services import metrics
+    metrics.start_metrics_server(config)
 except RuntimeError:
     logger.critical(
         exc_info=True,
-        msg="Failed to initialize db client. Exiting..."
+        msg="Failed to initialize metrics server. Exiting..."
     )
     sys.exit(1)
 
+# BOOT REGISTRY
+#----------------------
+# The services are registered with their factory below, then built
+# concurrently by registry.start (BOOT_MODE="parallel"). With
+# BOOT_MODE="lazy", registry.start builds the required ones, and the
+# other ones are built on their first use. They are got from this
+# module as attributes when they are used : boot.vector_store
 try:
-    from shared.services.graphdb_client import GraphDBClient
-    graphdb_client = GraphDBClient(config)
+    from shared.services.boot_registry import BootRegistry
+    registry = BootRegistry(config)
 except RuntimeError:
     logger.critical(
         exc_info=True,
-        msg="Failed to initialize graphdb client. Exiting..."
+        msg="Failed to initialize boot registry. Exiting..."
     )
     sys.exit(1)
 
-try:
+
+def __getattr__(name: str):
+    if name not in registry:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        return registry.get(name)
+    except RuntimeError:
+        logger.critical(
+            exc_info=True,
+            msg=f"Failed to initialize {name}. Exiting..."
+        )
+        sys.exit(1)
+
+
+# INIT Database connection
+#----------------------
+def _db_client():
+    from shared.services.get_redis_client import get_redis_client
+    return get_redis_client(config)
+
+
+def _graphdb_client():
+    from shared.services.graphdb_client import GraphDBClient
+    return GraphDBClient(config)
+
+
+def _vector_store():
     from shared.services.vector_store_client import get_vector_store_client
-    vector_store = get_vector_store_client(config)
-except RuntimeError:
-    logger.critical(
-        exc_info=True,
-        msg="Failed to initialize vector store client. Exiting..."
-    )
-    sys.exit(1)
+    return get_vector_store_client(config)
+
+
+registry.register("db_client", _db_client, "db client", required=True)
+registry.register("graphdb_client", _graphdb_client, "graphdb client")
+registry.register("vector_store", _vector_store, "vector store client")
+
 
 # Repository initialisation
 #----------------------
-try:
+def _params_repository():
     from shared.repositories.params_repository import ParamsRepository
-    params_repository = ParamsRepository(db_client)
-except RuntimeError:
-    logger.critical(
-        exc_info=True,
-        msg="Failed to initialize params repositories. Exiting..."
-    )
-    sys.exit(1)
+    return ParamsRepository(registry.get("db_client"), config)
 
-try:
+
+def _update_article_queue():
     from shared.repositories.update_queues import UpdateQueues
-    update_article_queue = UpdateQueues(db_client)
-except RuntimeError:
-    logger.critical(
-        exc_info=True,
-        msg="Failed to initialize update articles queue. Exiting..."
-    )
-    sys.exit(1)
+    return UpdateQueues(registry.get("db_client"), config)
 
-try:
+
+def _answer_cache_repository():
+    from shared.repositories.answer_cache_repository import AnswerCacheRepository
+    return AnswerCacheRepository(registry.get("db_client"), config)
+
+
+def _article_repository():
     from updater.repositories.articles_repository import ArticleRepository
-    article_repository = ArticleRepository(graphdb_client)
+    return ArticleRepository(registry.get("graphdb_client"))
+
+
+# Required to pop the articles : built before the updater is ready
+# with BOOT_MODE="lazy"
+registry.register(
+    "params_repository", _params_repository, "params repositories",
+    required=True
+)
+registry.register(
+    "update_article_queue", _update_article_queue, "update articles queue",
+    required=True
+)
+registry.register(
+    "answer_cache_repository", _answer_cache_repository,
+    "answer cache repository", required=True
+)
+registry.register(
+    "article_repository", _article_repository, "article repository"
+)
+
+# BULK LOADER
+#----------------------
+if config.get("UPDATER_GRAPH_MODE") == "bulk":
+    def _bulk_loader():
+        from updater.services.ntriples_bulk_loader import NTriplesBulkLoader
+        return NTriplesBulkLoader(config, registry.get("article_repository"))
+
+    registry.register("bulk_loader", _bulk_loader, "the bulk loader")
+else:
+    bulk_loader = None
+
+# BOOT
+#----------------------
+try:
+    registry.start()
+    metrics.set_boot_timings(registry.timings)
+    metrics.register_queue_stats(registry.get("update_article_queue"))
+    metrics.register_redis_pool_stats({"commands": registry.get("db_client")})
 except RuntimeError:
     logger.critical(
         exc_info=True,
-        msg="Failed to initialize article repository. Exiting..."
+        msg="Failed to initialize the services. Exiting..."
     )
     sys.exit(1)
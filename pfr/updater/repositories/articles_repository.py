@@ -1,23 +1,64 @@
 """
-Repository used to query the database
-against the params collection.
+Repository used to write the harvested articles into
+the knowledge graph stored in GraphDB.
 
-The params collection keep dynamic configuration
-elements of the application.
+article_triples builds the triples of an article, written
+by the bulk loader. upsert_articles writes a batch of articles
+with a single update request : an article is skipped when its
+stored modification date is unchanged, otherwise its title,
+dates, authors and subjects links are replaced.
 """
 
+import datetime
 import logging
 from unidecode import unidecode
 from shared.services.graphdb_client import GraphDBClient
+from shared.services.sparql_serializer import SparqlWriter, iri, literal
 
 from shared.models.article import Article
 
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+FABIO = "http://purl.org/spar/fabio/"
+DCTERMS = "https://www.dublincore.org/specifications/dublin-core/dcmi-terms/"
+FOAF = "http://xmlns.com/foaf/0.1/"
+FRBR = "http://purl.org/vocab/frbr/core#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+# Predicates of the article replaced when it is harvested again
+ARTICLE_MUTABLE_PREDICATES = (
+    f"{DCTERMS}title",
+    f"{DCTERMS}date",
+    f"{DCTERMS}modified",
+    f"{FRBR}creator",
+    f"{FRBR}subject",
+)
+
 
 class ArticleRepository:
     """
+    Repository writing the articles into the knowledge graph.
+
+    The triples of an article are built once by the *_triples methods
+    as (subject, predicate, object) tuples of N-Triples terms, serialized
+    with shared.services.sparql_serializer : the literals are escaped and
+    the IRIs validated before any request is sent. They are
+    either sent with SPARQL updates (insert_article, upsert_articles) or
+    written to N-Triples files by the bulk loader (article_triples).
+
+    upsert_articles is the path for harvested articles : an article is
+    only written when its modification date differs from the stored one,
+    and its previous title, dates, authors and subjects links are replaced.
+
+    Attributes
+    ----------
+    graphdb_client: GraphDBClient
+        The client used to send the requests to GraphDB.
+
+    graph: str
+        IRI of the named graph where the triples are written.
     """
 
-    def __init__(self, graphdb_client: GraphDBClient) -> None:
+    def __init__(self, graphdb_client: GraphDBClient, graph: str = "pfr:pfr") -> None:
         self._logger = logging.getLogger(__name__)
 
         if not isinstance(graphdb_client, GraphDBClient):
@@ -29,9 +70,13 @@ class ArticleRepository:
             )
             raise RuntimeError("GraphDB Client Bad Type")
         self.graphdb_client = graphdb_client
+        self.graph = graph
 
     def insert_article(self, article: Article) -> None:
-        """   
+        """
+        Insert the article, its authors, subjects and dates into the
+        knowledge graph with a single INSERT DATA request. An author,
+        subject or date that can not be converted is logged and skipped.
         """
         if not isinstance(article, Article):
             self._logger.error(
@@ -42,97 +87,279 @@ class ArticleRepository:
             )
             raise RuntimeError("Parameter Bad Type")
 
+        triples = self.article_triples(article)
+
         try:
-            data = """
-            PREFIX fabio: <http://purl.org/spar/fabio/>\n
-            PREFIX dcterms: <https://www.dublincore.org/specifications/dublin-core/dcmi-terms/>\n
-            INSERT DATA\n
-            {\n
-            GRAPH <pfr:pfr> {\n
-            """
-            data +=f'<{article.id}> a fabio:work ;\n'
-            data +=f'dcterms:title "{article.title}" .\n'
-            data +="""}\n
-            }
-            """
-            self.graphdb_client.request_update(data=data)
+            self.graphdb_client.request_update(
+                data=SparqlWriter().insert_data(self.graph, triples).render()
+            )
         except Exception as e:
             raise RuntimeError from e
 
+    def upsert_article(self, article: Article) -> bool:
+        """
+        Write an article into the knowledge graph, replacing its
+        previous version. See upsert_articles.
+
+        Returns
+        -------
+        bool
+            False if the stored version was already up to date.
+        """
+        return len(self.upsert_articles([article])) > 0
+
+    def upsert_articles(self, articles: list) -> list:
+        """
+        Write a batch of articles into the knowledge graph in a single
+        update request, replacing their previous versions.
+
+        Note
+        ----
+        The articles whose stored modification date matches are skipped
+        without any write. For the others, the request first deletes their
+        mutable triples (title, dates, modification date, authors and
+        subjects links) then inserts their new triples. The authors and
+        subjects nodes are shared between articles and kept.
+
+        Parameters
+        ----------
+        articles: [Article]
+            The articles to write.
+
+        Returns
+        -------
+        list
+            The articles actually written.
+
+        Raises
+        ------
+        RuntimeError
+            If a parameter is not an article, an article identifier is
+            not a valid IRI or a request failed.
+        """
+        for article in articles:
+            if not isinstance(article, Article):
+                self._logger.error(
+                    "The parameter given for the upsert of articles is not "
+                    "of the right type : %s",
+                    type(article),
+                    exc_info=True
+                )
+                raise RuntimeError("Parameter Bad Type")
+
+        if len(articles) == 0:
+            return []
 
         try:
-            for author in article.creators:
-                person_uri = author.replace(" ", "-")
-                person_uri = unidecode(person_uri)
-                person_uri = person_uri.replace(",", "")
-                person_divided = author.split(", ")
-                
-                data = """
-                PREFIX  foaf: <http://xmlns.com/foaf/0.1/>\n
-                PREFIX  frbr: <http://purl.org/vocab/frbr/core#>\n
-                INSERT DATA\n
-                {\n
-                GRAPH <pfr:pfr> {\n
-                """
-                data +=f"    <pfr:{person_uri}> a foaf:Person ;\n"
-                data +=f'      foaf:givenName "{person_divided[0]}" ;\n'
-                data +=f'      foaf:familyName "{person_divided[1]}" .\n'
-                data +=f'    <{article.id}> frbr:creator <pfr:{person_uri}> .\n'
-                data +=f'    <pfr:{person_uri}> frbr:creatorOf <{article.id}> .\n'
-                data +="""}\n
-                }
-                """
-                self.graphdb_client.request_update(data=data)
+            stored_dates = self.get_modified_dates([article.id for article in articles])
+        except ValueError as e:
+            raise RuntimeError("Article Bad IRI") from e
         except Exception as e:
-            self._logger.error(
-                "Failed to insert an author in the article %s : %s.",
-                article.id,
-                e
-            )
+            raise RuntimeError("Fail Get Articles Modification Dates") from e
+
+        changed_articles = [
+            article
+            for article in articles
+            if stored_dates.get(article.id) != article.modified_at
+        ]
+        if len(changed_articles) == 0:
+            return []
 
         try:
-            for subject in article.subjects:
-                subject = unidecode(subject)
-                encoded_subject = subject.replace(" ", "-")
-                encoded_subject = encoded_subject.replace(",", "-")
-                data = """
-                PREFIX  frbr: <http://purl.org/vocab/frbr/core#>\n
-                PREFIX dcterms: <https://www.dublincore.org/specifications/dublin-core/dcmi-terms/>\n
-                INSERT DATA\n
-                {\n
-                GRAPH <pfr:pfr> {\n
-                """
-                data +=f"    <pfr:{encoded_subject}> a frbr:Concept ;\n"
-                data +=f'      dcterms:title "{subject}" .\n'
-                data +=f'    <{article.id}> frbr:subject <pfr:{encoded_subject}> .\n'
-                data +="""}\n
-                }
-                """
-                self.graphdb_client.request_update(data=data)
+            triples = []
+            for article in changed_articles:
+                triples.extend(self.article_triples(article))
+
+            writer = SparqlWriter()
+            self._delete_mutable_data(writer, changed_articles)
+            writer.next_operation()
+            writer.insert_data(self.graph, triples)
+        except ValueError as e:
+            raise RuntimeError("Article Bad IRI") from e
+
+        try:
+            self.graphdb_client.request_update(data=writer.render())
         except Exception as e:
+            raise RuntimeError("Fail Upsert Articles") from e
+
+        return changed_articles
+
+    def get_modified_dates(self, article_ids: list) -> dict:
+        """
+        Get the modification dates stored in the graph for articles.
+
+        Parameters
+        ----------
+        article_ids: [str]
+            The identifiers of the articles.
+
+        Returns
+        -------
+        dict
+            The modification date of each stored article. An article
+            stored with several or invalid dates is not returned, so it
+            is written again and cleaned.
+        """
+        writer = SparqlWriter()
+        writer.write("SELECT ?article ?modified WHERE {\nVALUES ?article {")
+        for article_id in article_ids:
+            writer.write(" ", iri(article_id))
+        writer.write(
+            " }\nGRAPH ", iri(self.graph),
+            " { ?article ", iri(f"{DCTERMS}modified"), " ?modified }\n}\n",
+        )
+
+        dates = {}
+        duplicates = set()
+        response = self.graphdb_client.request_query(writer.render())
+        for binding in response["results"]["bindings"]:
+            article_id = binding["article"]["value"]
+            if article_id in dates:
+                duplicates.add(article_id)
+            try:
+                dates[article_id] = datetime.datetime.fromisoformat(
+                    binding["modified"]["value"]
+                )
+            except ValueError:
+                duplicates.add(article_id)
+
+        for article_id in duplicates:
+            dates.pop(article_id, None)
+        return dates
+
+    def article_triples(self, article: Article) -> list:
+        """
+        Build every triple insert_article writes for an article.
+        An author, subject or date that can not be converted is
+        logged and skipped.
+
+        Parameters
+        ----------
+        article: Article
+            The article to convert.
+
+        Returns
+        -------
+        list
+            The (subject, predicate, object) tuples of N-Triples terms.
+
+        Raises
+        ------
+        RuntimeError
+            If the article identifier is not a valid IRI.
+        """
+        if not isinstance(article, Article):
             self._logger.error(
-                "Failed to insert a subject in the article %s : %s.",
-                article.id,
-                e
+                "The parameter given for the triples export is not "
+                "of the right type : %s",
+                type(article),
+                exc_info=True
             )
+            raise RuntimeError("Parameter Bad Type")
 
         try:
-            for date in article.dates:
-                date = unidecode(date)
-                data = """
-                PREFIX dcterms: <https://www.dublincore.org/specifications/dublin-core/dcmi-terms/>\n
-                INSERT DATA\n
-                {\n
-                GRAPH <pfr:pfr> {\n
-                """
-                data +=f'    <{article.id}> dcterms:date "{date}" .\n'
-                data +="""}\n
-                }
-                """
-                self.graphdb_client.request_update(data=data)
-        except Exception as e:
-            self._logger.error(
-                "Failed to insert a date in the article %s : %s.",
-                article.id,
-                e
-            )
\ No newline at end of file
+            triples = self.work_triples(article)
+        except ValueError as e:
+            self._logger.error("Failed to convert the article %s : %s.", article.id, e)
+            raise RuntimeError("Article Bad IRI") from e
+
+        for build, values in (
+            (self.author_triples, article.creators),
+            (self.subject_triples, article.subjects),
+            (self.date_triples, article.dates),
+        ):
+            for value in values:
+                try:
+                    triples.extend(build(article, value))
+                except Exception as e:
+                    self._logger.error(
+                        "Failed to convert '%s' of the article %s : %s.",
+                        value,
+                        article.id,
+                        e
+                    )
+
+        return triples
+
+    def work_triples(self, article: Article) -> list:
+        """
+        Triples describing the article itself.
+        """
+        article_iri = iri(article.id)
+
+        return [
+            (article_iri, iri(f"{RDF}type"), iri(f"{FABIO}work")),
+            (article_iri, iri(f"{DCTERMS}title"), literal(article.title)),
+            (
+                article_iri,
+                iri(f"{DCTERMS}modified"),
+                literal(article.modified_at.isoformat(), datatype=f"{XSD}dateTime"),
+            ),
+        ]
+
+    def author_triples(self, article: Article, author: str) -> list:
+        """
+        Triples describing an author and its link to the article.
+        The author is expected as "family name, given name".
+        """
+        person_uri = author.replace(" ", "-")
+        person_uri = unidecode(person_uri)
+        person_uri = person_uri.replace(",", "")
+        person_divided = author.split(", ")
+
+        article_iri = iri(article.id)
+        person_iri = iri(f"pfr:{person_uri}")
+
+        return [
+            (person_iri, iri(f"{RDF}type"), iri(f"{FOAF}Person")),
+            (person_iri, iri(f"{FOAF}givenName"), literal(person_divided[0])),
+            (person_iri, iri(f"{FOAF}familyName"), literal(person_divided[1])),
+            (article_iri, iri(f"{FRBR}creator"), person_iri),
+            (person_iri, iri(f"{FRBR}creatorOf"), article_iri),
+        ]
+
+    def subject_triples(self, article: Article, subject: str) -> list:
+        """
+        Triples describing a subject and its link to the article.
+        """
+        subject = unidecode(subject)
+        encoded_subject = subject.replace(" ", "-")
+        encoded_subject = encoded_subject.replace(",", "-")
+
+        subject_iri = iri(f"pfr:{encoded_subject}")
+
+        return [
+            (subject_iri, iri(f"{RDF}type"), iri(f"{FRBR}Concept")),
+            (subject_iri, iri(f"{DCTERMS}title"), literal(subject)),
+            (iri(article.id), iri(f"{FRBR}subject"), subject_iri),
+        ]
+
+    def date_triples(self, article: Article, date: str) -> list:
+        """
+        Triples linking a date to the article.
+        """
+        date = unidecode(date)
+
+        return [
+            (iri(article.id), iri(f"{DCTERMS}date"), literal(date)),
+        ]
+
+    def _delete_mutable_data(self, writer: SparqlWriter, articles: list) -> None:
+        """
+        Write a SPARQL DELETE operation removing the mutable triples
+        of articles.
+        """
+        graph_iri = iri(self.graph)
+        creator_of_iri = iri(f"{FRBR}creatorOf")
+
+        writer.write("DELETE {\nGRAPH ", graph_iri, " {\n")
+        writer.write("?article ?predicate ?object .\n")
+        writer.write("?person ", creator_of_iri, " ?article .\n")
+        writer.write("}\n}\nWHERE {\nVALUES ?article {")
+        for article in articles:
+            writer.write(" ", iri(article.id))
+        writer.write(" }\nGRAPH ", graph_iri, " {\n")
+        writer.write("{ ?article ?predicate ?object . FILTER(?predicate IN (")
+        writer.write(", ".join(iri(predicate) for predicate in ARTICLE_MUTABLE_PREDICATES))
+        writer.write(")) }\nUNION { ?person ", creator_of_iri, " ?article }\n")
+        writer.write("}\n}\n")
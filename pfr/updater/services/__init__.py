@@ -0,0 +1,6 @@
+"""
+Services are usefull tools that does something
+into the application (database communication,
+mailing...) and are used by the controllers
+to do stuff.
+"""
@@ -0,0 +1,41 @@
+"""
+Keep and validate the parameters for a NTriplesBulkLoader. A pydantic
+model is used to validate the entries on init.
+"""
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class BulkLoaderParameters(BaseModel):
+    """
+    Keep and validate the parameters for a NTriplesBulkLoader. A pydantic
+    model is used to validate the entries on init.
+
+    Parameters
+    ----------
+    path: str
+        Folder where the N-Triples files are written
+
+    file_max_triples: int
+        Number of triples after which the current file is rotated
+
+    submit: bool
+        Upload the rotated files to GraphDB. If False, the files are only
+        staged in the folder, for GraphDB's preload / importrdf tool
+
+    keep_files: bool
+        Keep the files once uploaded to GraphDB
+
+    max_attempts: int
+        Uploads of a file before it is moved to the failed folder
+
+    retry_delay_s: int
+        Seconds between two uploads of a file which failed
+    """
+
+    path: str = Field(min_length=1, max_length=255, alias="BULK_PATH")
+    file_max_triples: int = Field(gt=0, alias="BULK_FILE_MAX_TRIPLES")
+    submit: bool = Field(alias="BULK_SUBMIT")
+    keep_files: bool = Field(alias="BULK_KEEP_FILES")
+    max_attempts: int = Field(default=3, gt=0, alias="BULK_MAX_ATTEMPTS")
+    retry_delay_s: int = Field(default=60, ge=0, alias="BULK_RETRY_DELAY_S")
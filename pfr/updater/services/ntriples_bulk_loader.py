@@ -0,0 +1,253 @@
+"""
+Write the articles triples into rotating gzip N-Triples files and
+load them into GraphDB with its RDF upload endpoint.
+"""
+import gzip
+import logging
+import os
+import time
+from os.path import basename, isdir, join
+
+from pydantic import ValidationError
+
+from shared.models.article import Article
+from shared.services.sparql_serializer import SparqlWriter
+from updater.repositories.articles_repository import ArticleRepository
+from updater.services.bulk_loader_parameters import BulkLoaderParameters
+
+
+class NTriplesBulkLoader:
+    """
+    Bulk loader of the knowledge graph, used for the initial backfills.
+
+    Note
+    ----
+    The triples are the ones ArticleRepository.insert_article writes.
+    They are appended to a gzip N-Triples file. Once the file holds
+    BULK_FILE_MAX_TRIPLES triples (or when flush is called), it is
+    closed and uploaded in a single request into the repository graph.
+    When BULK_SUBMIT is False, the file stays in BULK_PATH and can be
+    loaded later with GraphDB's importrdf tool.
+
+    A file whose upload failed is uploaded again by the next flush, at
+    most every BULK_RETRY_DELAY_S seconds. After BULK_MAX_ATTEMPTS
+    uploads, it is moved to the failed folder of BULK_PATH. With
+    BULK_KEEP_FILES False, the files staged by a previous run are
+    uploaded the same way.
+
+    Attributes
+    ----------
+    _parameters : BulkLoaderParameters
+        The parameters of the loader.
+
+    _logger : Logger
+        The service logger.
+
+    metrics_upload_time : float
+        Duration in seconds of the last upload.
+    """
+
+    def __init__(self, app_config: dict, article_repository: ArticleRepository) -> None:
+        """This function is used to ensure the presence and coherence
+        of configuration parameters needed by the service.
+
+        Parameters
+        ----------
+        app_config
+            The configuration dictionary of the application.
+
+        article_repository
+            The repository building the triples of the articles.
+
+        Exceptions
+        -------
+        RuntimeError
+            Something went wrong during setup process.
+        """
+        self._logger = logging.getLogger(__name__)
+
+        if not isinstance(app_config, dict):
+            self._logger.critical(
+                exc_info=True,
+                msg="The configuration given to the service is not of dict type."
+            )
+            raise RuntimeError("Bad Config Type")
+
+        if not isinstance(article_repository, ArticleRepository):
+            self._logger.critical(
+                exc_info=True,
+                msg="The article repository given to the service is not of the right type."
+            )
+            raise RuntimeError("Bad Article Repository Type")
+
+        try:
+            self._parameters = BulkLoaderParameters(**app_config)
+        except ValidationError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"Faulty parameter into the bulk loader's configuration : {e}."
+            )
+            raise RuntimeError("Bad Config Parameter") from e
+
+        try:
+            if not isdir(self._parameters.path):
+                os.makedirs(self._parameters.path)
+        except OSError as e:
+            self._logger.critical(
+                exc_info=True,
+                msg=f"An error occured when creating the bulk folder : {e}."
+            )
+            raise RuntimeError("Missing Bulk Folder") from e
+
+        self.article_repository = article_repository
+        self.metrics_upload_time = 0.0
+        self._file = None
+        self._file_path = None
+        self._file_triples = 0
+        # Staged file not loaded yet -> (uploads, time of the last one)
+        self._failed_files = {}
+
+        # Without BULK_KEEP_FILES, a staged file is one never loaded
+        if self._parameters.submit and not self._parameters.keep_files:
+            for name in sorted(os.listdir(self._parameters.path)):
+                if name.endswith(".nt.gz"):
+                    self._failed_files[join(self._parameters.path, name)] = (0, None)
+            if self._failed_files:
+                self._logger.info(
+                    "%s staged N-Triples files of a previous run will be loaded.",
+                    len(self._failed_files),
+                )
+
+    def add_article(self, article: Article) -> None:
+        """
+        Append the triples of an article to the current file, and
+        rotate the file when it is full.
+
+        Parameters
+        ----------
+        article: Article
+            The article to load.
+        """
+        triples = self.article_repository.article_triples(article)
+
+        if self._file is None:
+            self._open_file()
+
+        self._file.write(SparqlWriter().triples(triples).render().encode("utf-8"))
+        self._file_triples += len(triples)
+
+        if self._file_triples >= self._parameters.file_max_triples:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Close the current file, if any, and submit it to GraphDB, then
+        submit again the files whose upload failed.
+        """
+        if self._file is not None:
+            self._file.close()
+            staged_path = self._file_path[:-len(".part")]
+            os.replace(self._file_path, staged_path)
+            self._logger.info(
+                "N-Triples file %s closed with %s triples.", staged_path, self._file_triples
+            )
+            self._file = None
+            self._file_path = None
+            self._file_triples = 0
+
+            if self._parameters.submit and not self.submit_file(staged_path):
+                self._failed_files[staged_path] = (1, time.monotonic())
+
+        if self._parameters.submit:
+            self._retry_failed_files()
+
+    @property
+    def failed_path(self) -> str:
+        return join(self._parameters.path, "failed")
+
+    def _retry_failed_files(self) -> None:
+        now = time.monotonic()
+        for path, (attempts, attempted_at) in list(self._failed_files.items()):
+            if attempted_at is not None and now - attempted_at < self._parameters.retry_delay_s:
+                continue
+
+            if self.submit_file(path):
+                del self._failed_files[path]
+                continue
+
+            attempts += 1
+            if attempts < self._parameters.max_attempts:
+                self._failed_files[path] = (attempts, now)
+                continue
+
+            del self._failed_files[path]
+            try:
+                if not isdir(self.failed_path):
+                    os.makedirs(self.failed_path)
+                os.replace(path, join(self.failed_path, basename(path)))
+            except OSError as e:
+                self._logger.error(
+                    "Failed to move the N-Triples file %s to %s : %s.",
+                    path,
+                    self.failed_path,
+                    e,
+                )
+                continue
+            self._logger.error(
+                "N-Triples file %s not loaded after %s uploads, moved to %s.",
+                path,
+                attempts,
+                self.failed_path,
+            )
+
+    def submit_file(self, path: str) -> bool:
+        """
+        Upload a gzip N-Triples file into the repository graph.
+
+        Parameters
+        ----------
+        path: str
+            The path of the file.
+
+        Returns
+        -------
+        bool
+            True if the file was loaded. On failure, the file is kept
+            for a later retry.
+        """
+        start = time.perf_counter()
+        try:
+            with gzip.open(path, "rb") as file:
+                self.article_repository.graphdb_client.request_upload(
+                    data=file.read(),
+                    content_type="application/n-triples",
+                    context=self.article_repository.graph,
+                )
+        except Exception as e:
+            self._logger.error(
+                "Failed to upload the N-Triples file %s, it is kept for a later load : %s.",
+                path,
+                e,
+                exc_info=True
+            )
+            return False
+
+        self.metrics_upload_time = time.perf_counter() - start
+        self._logger.info(
+            "N-Triples file %s loaded in GraphDB in %.2f s.", path, self.metrics_upload_time
+        )
+
+        if not self._parameters.keep_files:
+            os.remove(path)
+        return True
+
+    def _open_file(self) -> None:
+        """
+        Open a new gzip file. It keeps a .part suffix until it is closed,
+        so a staged file is always complete.
+        """
+        self._file_path = join(
+            self._parameters.path, f"articles-{time.time_ns()}.nt.gz.part"
+        )
+        self._file = gzip.open(self._file_path, "wb")
+        self._file_triples = 0